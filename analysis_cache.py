@@ -0,0 +1,113 @@
+# analysis_cache.py
+import hashlib
+import json
+import os
+import threading
+
+from psycopg2.extras import Json
+
+
+def hash_document(file_bytes):
+    """Returns the SHA-256 hex digest of a document's raw bytes."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class AnalysisCache:
+    """
+    A persistent, content-addressed cache of AI contract analyses, stored in PostgreSQL.
+
+    Entries are keyed by the hash of the PDF bytes plus contract type, prompt version and model,
+    so re-uploading the same document skips both PDF parsing and the Anthropic API call: every entry
+    keeps the extracted text next to the analysis, for the new contract record and the similarity index.
+    Entries older than `max_age_days` are dropped, and the least recently used ones are evicted
+    once the cache exceeds `max_entries` or `max_bytes`.
+    """
+    def __init__(self, db, max_entries=5000, max_bytes=256 * 1024 * 1024, max_age_days=180):
+        self.db = db
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(document_hash, contract_type, prompt_version, model_name):
+        """Combines the document hash with everything else that determines the analysis output."""
+        material = "\x1f".join([document_hash, contract_type, prompt_version, model_name])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key):
+        """
+        Returns (analysis_result, contract_text) cached for a key, or None on a miss.
+        The text is None for entries stored before extracted text was cached.
+        """
+        row = self.db.execute_query(
+            "UPDATE contract_analysis_cache SET hit_count = hit_count + 1, last_hit_at = NOW() "
+            "WHERE cache_key = %s AND created_at > NOW() - make_interval(days => %s) RETURNING analysis_result, contract_text;",
+            (cache_key, self.max_age_days), fetch='one'
+        )
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (row[0], row[1]) if row else None
+
+    def put(self, cache_key, document_hash, contract_type, prompt_version, model_name, analysis_result, contract_text=None):
+        """Stores an analysis result with the text it was made from and evicts stale or excess entries."""
+        size_bytes = len(json.dumps(analysis_result).encode("utf-8")) + len((contract_text or "").encode("utf-8"))
+        self.db.execute_query(
+            "INSERT INTO contract_analysis_cache (cache_key, document_hash, contract_type, prompt_version, model_name, analysis_result, contract_text, size_bytes) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (cache_key) DO UPDATE SET analysis_result = EXCLUDED.analysis_result, contract_text = EXCLUDED.contract_text, "
+            "size_bytes = EXCLUDED.size_bytes, created_at = NOW(), last_hit_at = NOW();",
+            (cache_key, document_hash, contract_type, prompt_version, model_name, Json(analysis_result), contract_text, size_bytes)
+        )
+        self.evict()
+
+    def evict(self):
+        """Removes expired entries, then the least recently used ones beyond the entry and size limits."""
+        expired = self.db.execute_query(
+            "WITH evicted AS (DELETE FROM contract_analysis_cache WHERE created_at <= NOW() - make_interval(days => %s) RETURNING 1) "
+            "SELECT COUNT(*) FROM evicted;",
+            (self.max_age_days,), fetch='one'
+        )
+        overflow = self.db.execute_query(
+            "WITH ranked AS ("
+            "  SELECT cache_key, ROW_NUMBER() OVER w AS rank, SUM(size_bytes) OVER w AS running_bytes"
+            "  FROM contract_analysis_cache WINDOW w AS (ORDER BY last_hit_at DESC)"
+            "), evicted AS ("
+            "  DELETE FROM contract_analysis_cache WHERE cache_key IN (SELECT cache_key FROM ranked WHERE rank > %s OR running_bytes > %s) RETURNING 1"
+            ") SELECT COUNT(*) FROM evicted;",
+            (self.max_entries, self.max_bytes), fetch='one'
+        )
+        evicted = (expired[0] if expired else 0) + (overflow[0] if overflow else 0)
+        with self._lock:
+            self.evictions += evicted
+        return evicted
+
+    def stats(self):
+        """Returns hit/miss counters for this process together with the cache's current size."""
+        row = self.db.execute_query("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM contract_analysis_cache;", fetch='one')
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": row[0] if row else 0,
+                "size_bytes": int(row[1]) if row else 0,
+            }
+
+
+def create_analysis_cache_from_env(db):
+    """Builds the analysis cache with limits taken from ANALYSIS_CACHE_* environment variables."""
+    return AnalysisCache(
+        db,
+        max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000")),
+        max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        max_age_days=int(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "180")),
+    )
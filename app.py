@@ -2,13 +2,16 @@
 import streamlit as st
 import pandas as pd
 import os
-import json
-import anthropic
-import PyPDF2
-from io import BytesIO
-from database import DatabaseManager
-from prompts import get_contract_analysis_prompt, get_tco_pricing_prompt
+import threading
+import time
+from database import CONTRACT_SORTS, KPI_ROLLUP_GRAINS, PARTNER_PORTFOLIO_SORTS, DatabaseManager
+from job_queue import JOB_BATCH_INGESTION, JOB_CONTRACT_ANALYSIS, JOB_RFX_ASSESSMENT, JOB_TCO_RECOMMENDATION, JobQueue
+from metrics import configure_metrics_from_env
+from partner_kpis import read_kpi_csv
+from streaming_json import stream_timing_summary
 from dotenv import load_dotenv
+# The Anthropic SDK, PyPDF2 and the analysis modules are imported by the pages that use them, so a cold
+# start only pays for what the dashboard needs.
 
 # --- Load Environment Variables ---
 load_dotenv()
@@ -62,34 +65,315 @@ st.markdown("""
 
 
 # --- INITIALIZATION ---
+@st.cache_resource
+def init_metrics():
+    return configure_metrics_from_env()
+
 @st.cache_resource
 def init_db_manager():
     return DatabaseManager()
 
 @st.cache_resource
 def init_anthropic_client():
+    import anthropic
     api_key = os.getenv('ANTHROPIC_API_KEY')
     if not api_key:
         st.error("⚠️ ANTHROPIC_API_KEY not found! Check your .env file.")
         st.stop()
     return anthropic.Anthropic(api_key=api_key)
 
+@st.cache_resource
+def init_analysis_cache():
+    from analysis_cache import create_analysis_cache_from_env
+    return create_analysis_cache_from_env(db)
+
+@st.cache_resource
+def init_similarity_index():
+    from similarity import create_similarity_index_from_env
+    return create_similarity_index_from_env(db)
+
+@st.cache_resource
+def init_extraction_engine():
+    from pdf_extraction import create_extraction_engine_from_env
+    return create_extraction_engine_from_env()
+
+@st.cache_resource
+def init_job_queue():
+    return JobQueue(db)
+
+@st.cache_resource
+def init_batch_threads():
+    """{source path: thread} of the batch ingestions this process runs in the background."""
+    return {}
+
+metrics = init_metrics()
 db = init_db_manager()
-client = init_anthropic_client()
+db.initialize_database()  # migrates once per process; a no-op on every later rerun
+job_queue = init_job_queue()
 
 # --- UTILITY & SETUP FUNCTIONS ---
 def extract_text_from_pdf(file_bytes):
     try:
-        reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        return "".join(page.extract_text() for page in reader.pages)
+        max_chars = os.getenv('PDF_MAX_CHARS')
+        return init_extraction_engine().extract_text(file_bytes, max_chars=int(max_chars) if max_chars else None)
     except Exception as e:
         st.error(f"Error reading PDF file: {e}")
         return None
 
-def setup_database():
-    if 'db_initialized' not in st.session_state:
-        db.initialize_database()
-        st.session_state.db_initialized = True
+def claude_model():
+    from contract_analysis import DEFAULT_MODEL
+    return os.getenv('ANTHROPIC_MODEL', DEFAULT_MODEL)
+
+def get_contract_ingestor():
+    from ingestion import ContractIngestor
+    init_extraction_engine()  # created here, in the script thread, before any background batch uses it
+    return ContractIngestor(db, init_anthropic_client(), claude_model(), init_analysis_cache(), init_similarity_index(), extract_text=extract_text_from_pdf)
+
+def get_rfx_ingestor():
+    from rfx_assessment import RFxIngestor
+    return RFxIngestor(db, init_anthropic_client(), claude_model(), extract_text=extract_text_from_pdf)
+
+def show_reuse_info(reuse_info):
+    if reuse_info:
+        st.info(
+            f"♻️ Near-duplicate of contract #{reuse_info['matched_contract_id']} "
+            f"(similarity {reuse_info['similarity']:.0%}, threshold {reuse_info['threshold']:.0%}). "
+            f"Reused {reuse_info['reused_fraction']:.0%} of the analysis; "
+            f"{reuse_info['sections_reanalyzed']} of {reuse_info['sections_total']} sections were re-analyzed."
+        )
+
+def track_job(job_id, job_type):
+    st.session_state.setdefault('pending_jobs', {})[job_id] = job_type
+
+@st.fragment(run_every="2s")
+def render_pending_jobs(job_type):
+    """Polls this session's queued jobs of one type and picks up their results once a worker finishes them."""
+    pending = [job_id for job_id, pending_type in st.session_state.get('pending_jobs', {}).items() if pending_type == job_type]
+    finished = False
+    for job_id in pending:
+        job = job_queue.get_job(job_id)
+        if job is None or job['status'] in ('queued', 'running'):
+            st.caption(f"⏳ Job #{job_id} is {job['status'] if job else 'unknown'}... results are saved even if you leave this page.")
+            continue
+        del st.session_state.pending_jobs[job_id]
+        finished = True
+        if job['status'] == 'failed':
+            st.session_state.job_error = f"Job #{job_id} failed: {job['error']}"
+        elif job_type == JOB_CONTRACT_ANALYSIS:
+            st.session_state.analysis_result = job['result']['analysis_result']
+            st.session_state.job_notice = f"Contract '{job['payload']['title']}' (ID: {job['result']['contract_id']}) analyzed and saved!"
+        elif job_type == JOB_TCO_RECOMMENDATION:
+            st.session_state.tco_recommendation = job['result']['recommendation']
+        elif job_type == JOB_RFX_ASSESSMENT:
+            st.session_state.rfx_id = job['result']['rfx_id']
+            st.session_state.job_notice = f"RFx '{job['payload']['title']}' (ID: {job['result']['rfx_id']}) assessed and saved! " + describe_rfx_stats(job['result']['stats'])
+    if finished:
+        st.rerun()
+
+@st.fragment(run_every="2s")
+def render_batch_progress():
+    """Progress of the batches this session started in the background; they keep running when the page is left."""
+    from ingestion import batch_progress
+    for batch_id in st.session_state.get('batch_ids', []):
+        counts = batch_progress(db, batch_id)
+        finished = counts['done'] + counts['failed']
+        st.progress(finished / max(counts['total'], 1),
+                    text=f"Batch {batch_id}: {counts['done']}/{counts['total']} ingested, {counts['failed']} failed, {counts['pending'] + counts['processing']} to go")
+
+def start_batch_ingestion(source, contract_type, concurrency):
+    """Runs a batch in a background thread of this process, at most one per source; returns its batch id or None."""
+    from ingestion import BatchIngestionPipeline
+    threads = init_batch_threads()
+    if source in threads and threads[source].is_alive():
+        return None
+    pipeline = BatchIngestionPipeline(db, get_contract_ingestor(), concurrency=concurrency)
+    batch_id = pipeline.start_batch(source, contract_type)
+    threads[source] = threading.Thread(target=pipeline.run, args=(batch_id,), name=f"batch-ingestion-{batch_id}", daemon=True)
+    threads[source].start()
+    return batch_id
+
+def show_job_messages():
+    if 'job_notice' in st.session_state:
+        st.success(st.session_state.pop('job_notice'))
+    if 'job_error' in st.session_state:
+        st.error(st.session_state.pop('job_error'))
+
+def render_recent_jobs(job_type, describe):
+    """Lists recent background jobs from the database, so results survive a browser refresh."""
+    jobs = job_queue.recent_jobs(job_type, limit=10)
+    if not jobs:
+        st.caption("No background jobs yet.")
+        return None
+    st.dataframe(pd.DataFrame([{
+        "Job": job['job_id'], "Request": describe(job['payload']), "Status": job['status'],
+        "Queued": job['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+        "Finished": job['finished_at'].strftime('%Y-%m-%d %H:%M:%S') if job['finished_at'] else "",
+    } for job in jobs]), use_container_width=True, hide_index=True)
+    finished = [job for job in jobs if job['status'] == 'succeeded']
+    if not finished:
+        return None
+    selected = st.selectbox("Show result of job", [job['job_id'] for job in finished], key=f"recent_job_{job_type}")
+    if st.button("Show Result", key=f"show_job_{job_type}"):
+        return next(job for job in finished if job['job_id'] == selected)['result']
+    return None
+
+class LiveResultView:
+    """Stream listener that re-renders a partially received JSON result into a placeholder as fields complete."""
+    def __init__(self, placeholder, render):
+        self.placeholder = placeholder
+        self.render = render
+        self.partial = {}
+        self.timing = None
+
+    def on_item(self, path, value):
+        if len(path) == 1:
+            self.partial[path[0]] = value
+        elif isinstance(path[1], int):
+            self.partial.setdefault(path[0], []).append(value)
+        else:
+            self.partial.setdefault(path[0], {})[path[1]] = value
+        with self.placeholder.container():
+            self.render(self.partial)
+
+    def on_finished(self, timing):
+        self.timing = timing
+
+def show_stream_timing(view, call_site):
+    if view is None or view.timing is None or view.timing['time_to_first_finding_s'] is None:
+        return
+    summary = stream_timing_summary(call_site)
+    st.caption(
+        f"⏱️ First finding after {view.timing['time_to_first_finding_s']:.1f}s, complete after {view.timing['total_s']:.1f}s"
+        + (f" · session average {summary['avg_time_to_first_finding_s']:.1f}s vs {summary['avg_total_s']:.1f}s over {summary['calls']} calls" if summary else "")
+    )
+
+def show_prompt_usage(since):
+    """Token report of the LLM call this action just made: input tokens and what preprocessing removed."""
+    call = metrics.last_llm_call(since)
+    if call is None:
+        return
+    total = call['input_tokens'] + call['cache_read_tokens'] + call['cache_write_tokens']
+    st.caption(f"🧮 {total:,} input tokens"
+               + (f" · {call['tokens_saved']:,} saved by removing page boilerplate" if call['tokens_saved'] else "")
+               + f" · {call['output_tokens']:,} output tokens · ${call['cost_usd']:.4f}")
+
+def render_analysis_result(result):
+    st.subheader("AI Risk Analysis")
+    for risk in result.get('risk_analysis', []):
+        st.error(f"**{risk['risk_level']} Risk:** {risk['clause_category']}")
+        st.info(f"**Summary:** {risk['summary']}")
+
+    if result.get('key_terms'):
+        st.subheader("Extracted Key Commercial Terms")
+        key_terms_df = pd.DataFrame(result['key_terms'].items(), columns=['Term', 'Value'])
+        st.table(key_terms_df)
+
+def render_tco_recommendation(recommendation):
+    if 'recommended_model' in recommendation:
+        st.success(f"**Recommended Model:** {recommendation.get('recommended_model')}")
+    if 'tco_insight' in recommendation:
+        st.info(f"**TCO Insight:** {recommendation.get('tco_insight')}")
+    if 'pricing_strategy' in recommendation:
+        st.write("**Pricing Strategy:**"); st.write(recommendation.get('pricing_strategy'))
+    if recommendation.get('value_propositions'):
+        st.write("**Key Value Propositions:**")
+        for prop in recommendation.get('value_propositions', []): st.markdown(f"- {prop}")
+
+def render_contract_listing_controls():
+    """Renders filters, sorting and pagination for the contract table and returns the current page."""
+    from ingestion import CONTRACT_TYPES
+    with st.expander("Filter & Sort"):
+        filter_cols = st.columns(3)
+        counterparty = filter_cols[0].selectbox("Counterparty", ["All"] + db.get_counterparties())
+        contract_type = filter_cols[1].selectbox("Type", ["All"] + CONTRACT_TYPES)
+        status = filter_cols[2].selectbox("Status", ["All", "Active", "Expired", "Terminated"])
+        filter_cols = st.columns(3)
+        risk_scores = filter_cols[0].multiselect("Risk Score", ["High", "Medium", "Low"])
+        expiry_range = filter_cols[1].date_input("Expiry between", value=(), help="Pick a start and an end date")
+        sort = filter_cols[2].selectbox("Sort by", list(CONTRACT_SORTS))
+        page_size = st.select_slider("Rows per page", [25, 50, 100, 250], value=50)
+
+    filters = {
+        "counterparty": None if counterparty == "All" else counterparty,
+        "contract_type": None if contract_type == "All" else contract_type,
+        "status": None if status == "All" else status,
+        "risk_scores": risk_scores,
+        "expires_from": expiry_range[0] if len(expiry_range) > 0 else None,
+        "expires_to": expiry_range[1] if len(expiry_range) > 1 else None,
+    }
+    # A new filter, sort order or page size starts again at the first page.
+    listing_key = (tuple(sorted((k, str(v)) for k, v in filters.items())), sort, page_size)
+    if st.session_state.get('contract_listing_key') != listing_key:
+        st.session_state.contract_listing_key = listing_key
+        st.session_state.contract_page_cursors = [None]
+    cursors = st.session_state.contract_page_cursors
+
+    df_page, next_cursor = db.get_contracts_page(filters, sort, after=cursors[-1], page_size=page_size)
+    nav_cols = st.columns([1, 1, 4])
+    if nav_cols[0].button("◀ Previous", disabled=len(cursors) == 1, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    if nav_cols[1].button("Next ▶", disabled=next_cursor is None, use_container_width=True):
+        cursors.append(next_cursor)
+        st.rerun()
+    nav_cols[2].caption(f"Page {len(cursors)} · {len(df_page)} contracts shown")
+    return df_page
+
+def render_contract_search():
+    """Full-text search over contract titles, key terms and extracted text, with highlighted snippets."""
+    query_col, term_col = st.columns([3, 2])
+    text = query_col.text_input("Search contracts", placeholder="e.g. German law Net 60", key="contract_search")
+    term_value = term_col.text_input("Find similar key terms", placeholder="e.g. Net 60", key="key_term_search")
+    if text.strip():
+        started = time.perf_counter()
+        results = db.search_contracts(text)
+        st.caption(f"{len(results)} matching contracts in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for row in results.itertuples(index=False):
+            with st.container(border=True):
+                st.markdown(f"**{row[1]}** · {row[2]} · {row[3]} · rank {row[5]}")
+                if row[6]:
+                    st.markdown(f"…{row[6]}…")
+                if row[7]:
+                    st.caption(row[7])
+    if term_value.strip():
+        started = time.perf_counter()
+        matches = db.search_key_terms(term_value)
+        st.caption(f"{len(matches)} similar key terms in {(time.perf_counter() - started) * 1000:.0f} ms")
+        if not matches.empty:
+            st.dataframe(matches, hide_index=True, use_container_width=True)
+
+def render_tco_scenarios(result):
+    percentiles = result.percentiles()
+    st.caption(f"{result.scenarios:,} scenarios ({result.method.replace('_', ' ')}) evaluated in {result.elapsed_s * 1000:.0f} ms.")
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("Base-Case TCO", f"€ {result.base_case['total_tco']:,.0f}")
+    metric_cols[1].metric("TCO P10 / P90", f"€ {percentiles['total_tco']['p10'] / 1000:,.0f}k / {percentiles['total_tco']['p90'] / 1000:,.0f}k")
+    metric_cols[2].metric("Median TCO", f"€ {percentiles['total_tco']['p50']:,.0f}")
+    metric_cols[3].metric("Median NPV", f"€ {percentiles['npv']['p50']:,.0f}")
+
+    chart_cols = st.columns(2)
+    with chart_cols[0]:
+        st.markdown("**TCO distribution**")
+        counts, edges = result.histogram("total_tco")
+        st.bar_chart(pd.DataFrame({"Scenarios": counts}, index=[f"€{(lo + hi) / 2 / 1000:,.0f}k" for lo, hi in zip(edges[:-1], edges[1:])]))
+    with chart_cols[1]:
+        st.markdown("**Sensitivity of NPV (tornado)**")
+        if result.sensitivities:
+            tornado = pd.DataFrame({
+                "At low input": [row['at_low'] - row['base'] for row in result.sensitivities],
+                "At high input": [row['at_high'] - row['base'] for row in result.sensitivities],
+            }, index=[row['label'] for row in result.sensitivities])
+            st.bar_chart(tornado, horizontal=True, stack=False)
+    st.dataframe(pd.DataFrame(percentiles).T, use_container_width=True)
+
+    save_cols = st.columns([3, 1])
+    analysis_name = save_cols[0].text_input("Analysis name", value=f"{st.session_state.get('tco_company') or 'TCO'} scenarios", label_visibility="collapsed")
+    if save_cols[1].button("Save Analysis", use_container_width=True):
+        tco_id = db.save_tco_analysis(analysis_name, result.to_record(), st.session_state.get('tco_company'))
+        if tco_id:
+            st.success(f"Saved as analysis #{tco_id}.")
+    with st.expander("Saved Scenario Analyses"):
+        st.dataframe(db.get_tco_analyses(), use_container_width=True, hide_index=True)
 
 # --- PAGE RENDERERS ---
 
@@ -98,10 +382,17 @@ def render_main_dashboard():
     st.title("Commercial Manager Dashboard")
     st.write(f"Welcome back, Abdülkerim. Here's your daily overview.")
 
+    # All widgets' data is fetched up front and concurrently, so the page waits for the slowest query only.
+    page_data = db.fetch_page_data({
+        "expiring_contracts": db.get_expiring_contracts,
+        "kpi_summary": db.get_kpi_summary,
+        "queue_stats": job_queue.stats,
+    })
+
     col1, col2, col3 = st.columns(3)
     with col1:
         st.info("Contracts Requiring Attention", icon="📄")
-        expiring_contracts = db.get_expiring_contracts()
+        expiring_contracts = page_data["expiring_contracts"]
         if not expiring_contracts.empty:
             for index, row in expiring_contracts.iterrows():
                 st.write(f"- **{row['contract_title']}** expires on {row['expiration_date'].strftime('%Y-%m-%d')}")
@@ -115,12 +406,21 @@ def render_main_dashboard():
 
     with col3:
         st.success("Quarterly KPIs", icon="🏆")
-        kpi_data = db.get_kpi_summary()
+        kpi_data = page_data["kpi_summary"]
         win_rate_data = kpi_data.get('win_rate', {'value': 0, 'change': 0})
         margin_data = kpi_data.get('avg_margin', {'value': 0, 'change': 0})
-        st.metric("Win Rate", f"{win_rate_data['value']}%", f"{win_rate_data['change']}%")
-        st.metric("Avg. Deal Margin", f"{margin_data['value']}%", f"{margin_data['change']}%")
+        st.metric("Win Rate", f"{win_rate_data['value']}%", f"{win_rate_data['change']} pts")
+        st.metric("Avg. Deal Margin", f"{margin_data['value']}%", f"{margin_data['change']} pts")
         
+    st.markdown("---")
+    st.subheader("Background Analysis Queue")
+    queue_stats = page_data["queue_stats"]
+    m_col1, m_col2, m_col3, m_col4 = st.columns(4)
+    m_col1.metric("Queue Depth", queue_stats['queued'], f"{queue_stats['running']} running", delta_color="off")
+    m_col2.metric("Job Latency p50 / p95 (1h)", f"{queue_stats['latency_p50_s'] or 0:.1f}s / {queue_stats['latency_p95_s'] or 0:.1f}s")
+    m_col3.metric("Avg. Queue Wait (1h)", f"{queue_stats['avg_queue_wait_s'] or 0:.1f}s", f"{queue_stats['failed_recently']} failed", delta_color="off")
+    m_col4.metric("Worker Utilization", f"{queue_stats['worker_utilization']:.0%}", f"{queue_stats['active_workers']} workers · {queue_stats['worker_threads']} threads", delta_color="off")
+
     st.markdown("---")
     st.subheader("Quick Actions")
     q_col1, q_col2, q_col3, q_col4 = st.columns(4)
@@ -129,7 +429,11 @@ def render_main_dashboard():
     if q_col3.button("View Partner Portal", use_container_width=True): st.session_state.page = "Partner & Reseller Portal"; st.rerun()
     if q_col4.button("Assess an RFx", use_container_width=True): st.session_state.page = "RFx Response Automation"; st.rerun()
 
+    st.caption(f"Dashboard data: {len(page_data)} datasets loaded concurrently in {page_data.elapsed_s * 1000:.0f} ms "
+               f"({page_data.sequential_s * 1000:.0f} ms of query time)")
+
 def render_contract_page():
+    from ingestion import CONTRACT_TYPES, resolve_source
     st.markdown("### 📄 AI Contract Lifecycle Management")
     st.write("Upload a contract to perform AI-driven risk analysis and automatically save key terms to the database.")
 
@@ -137,43 +441,93 @@ def render_contract_page():
         st.subheader("New Contract Analysis")
         with st.form("contract_analysis_form"):
             contract_title = st.text_input("Contract Title*", placeholder="e.g., MSA with FutureNet Mobile")
-            contract_type = st.selectbox("Contract Type*", ["Reseller Agreement", "MSA", "NDA", "Partnership Agreement"])
+            contract_type = st.selectbox("Contract Type*", CONTRACT_TYPES)
             uploaded_file = st.file_uploader("Upload Contract PDF*", type=['pdf'], label_visibility="collapsed")
+            stream_results = st.checkbox("Stream results as they arrive", value=True, help="Shows each risk finding as soon as the AI has written it")
             submitted = st.form_submit_button("Analyze Contract & Save", type="primary", use_container_width=True)
 
             if submitted and uploaded_file and contract_title:
-                with st.spinner("Reading PDF & performing AI analysis..."):
-                    contract_text = extract_text_from_pdf(uploaded_file.getvalue())
-                    if contract_text:
-                        prompt = get_contract_analysis_prompt(contract_text, contract_type)
+                if job_queue.has_active_workers():
+                    job_id = job_queue.enqueue_contract_analysis(uploaded_file.getvalue(), contract_title, contract_type)
+                    if job_id:
+                        track_job(job_id, JOB_CONTRACT_ANALYSIS)
+                        st.info(f"Queued analysis of '{contract_title}' as job #{job_id}. You can keep working; the result is saved when it finishes.")
+                else:
+                    live_view = LiveResultView(st.empty(), render_analysis_result) if stream_results else None
+                    started_at = time.time()
+                    with st.spinner("Reading PDF & performing AI analysis..."):
                         try:
-                            message = client.messages.create(model="claude-3-sonnet-20240229", max_tokens=2048, messages=[{"role": "user", "content": prompt}]).content[0].text
-                            analysis_result = json.loads(message)
-                            contract_id = db.save_contract_and_analysis(contract_title, contract_type, analysis_result)
-                            st.success(f"Contract '{contract_title}' (ID: {contract_id}) analyzed and saved!")
-                            st.session_state.analysis_result = analysis_result
+                            outcome = get_contract_ingestor().ingest(uploaded_file.getvalue(), contract_title, contract_type, stream_listener=live_view)
+                            if live_view:
+                                live_view.placeholder.empty()  # the final result is shown in the results panel below
+                            st.success(f"Contract '{contract_title}' (ID: {outcome['contract_id']}) analyzed and saved!" + (" ⚡ Reused cached analysis." if outcome['from_cache'] else ""))
+                            show_reuse_info(outcome['reuse_info'])
+                            show_stream_timing(live_view, "contract_analysis")
+                            show_prompt_usage(started_at)
+                            st.session_state.analysis_result = outcome['analysis_result']
                         except Exception as e:
                             st.error(f"An error occurred: {e}")
             elif submitted:
                 st.warning("Please provide a title and upload a PDF.")
     
+    show_job_messages()
+    render_pending_jobs(JOB_CONTRACT_ANALYSIS)
+    with st.expander("Background Analysis Jobs"):
+        if not job_queue.has_active_workers():
+            st.caption("No background workers are running, so analyses run inline. Start them with `python worker.py`.")
+        job_result = render_recent_jobs(JOB_CONTRACT_ANALYSIS, lambda payload: f"{payload['title']} ({payload['contract_type']})")
+        if job_result:
+            st.session_state.analysis_result = job_result['analysis_result']
+
+    with st.expander("Batch Ingestion (folder or archive of PDFs)"):
+        ingestion_root = os.getenv('INGESTION_ROOT')
+        if not ingestion_root:
+            st.caption("Set `INGESTION_ROOT` to the server directory the app may read batches from. Until then, use `python ingestion.py PATH`.")
+        else:
+            st.caption(f"Loads every PDF in a directory or .zip/.tar archive under `{ingestion_root}`, in the background. "
+                       "Interrupted batches resume where they stopped. The same pipeline runs headless via `python ingestion.py PATH`.")
+            batch_source = st.text_input("Directory or archive path", placeholder="legacy_contracts.zip", help=f"Relative to {ingestion_root}")
+            batch_cols = st.columns(2)
+            batch_type = batch_cols[0].selectbox("Default Contract Type", CONTRACT_TYPES, help="Used when the file name does not reveal the type")
+            batch_concurrency = batch_cols[1].slider("Concurrency", 1, 16, 4)
+            if st.button("Start Batch Ingestion", use_container_width=True):
+                try:
+                    source = resolve_source(batch_source, ingestion_root)
+                except ValueError as e:
+                    st.warning(str(e))
+                else:
+                    if job_queue.has_active_workers():
+                        job_id = job_queue.enqueue_batch_ingestion(source, batch_type, batch_concurrency)
+                        if job_id:
+                            st.info(f"Queued ingestion of '{batch_source}' as job #{job_id}; a worker runs it in the background.")
+                    else:
+                        batch_id = start_batch_ingestion(source, batch_type, batch_concurrency)
+                        if batch_id is None:
+                            st.warning(f"'{batch_source}' is already being ingested.")
+                        else:
+                            st.session_state.setdefault('batch_ids', []).append(batch_id)
+                            st.info(f"Started batch {batch_id} in the background. It keeps running if you leave this page.")
+            render_batch_progress()
+            job_result = render_recent_jobs(JOB_BATCH_INGESTION, lambda payload: payload['source'])
+            if job_result:
+                st.success(f"Batch {job_result['batch_id']}: {job_result['done']}/{job_result['total']} contracts ingested, "
+                           f"{job_result['failed']} failed, {job_result['docs_per_s']} docs/s.")
+
     if 'analysis_result' in st.session_state:
         with st.expander("View Last AI Analysis Results", expanded=True):
-            result = st.session_state.analysis_result
-            st.subheader("AI Risk Analysis")
-            for risk in result.get('risk_analysis', []):
-                st.error(f"**{risk['risk_level']} Risk:** {risk['clause_category']}")
-                st.info(f"**Summary:** {risk['summary']}")
-            
-            st.subheader("Extracted Key Commercial Terms")
-            key_terms_df = pd.DataFrame(result.get('key_terms', {}).items(), columns=['Term', 'Value'])
-            st.table(key_terms_df)
+            render_analysis_result(st.session_state.analysis_result)
+
+    cache_stats = init_analysis_cache().stats()
+    st.caption(f"Analysis cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · {cache_stats['entries']} stored analyses")
+
+    st.subheader("Contract Search")
+    render_contract_search()
 
     st.subheader("Contract Database")
     if st.button("Refresh Contract List"):
         st.rerun()
 
-    df_contracts = db.get_contracts()
+    df_contracts = render_contract_listing_controls()
     if not df_contracts.empty:
         df_contracts_with_action = df_contracts.copy()
         df_contracts_with_action['Analyze TCO'] = [False] * len(df_contracts_with_action)
@@ -194,9 +548,12 @@ def render_contract_page():
             st.rerun()
 
 def render_tco_page():
+    from tco_analysis import format_tco_components, request_tco_recommendation
+    from tco_engine import MAX_GRID_SCENARIOS, Range, TCOScenarioEngine, grid_size
     st.markdown("### 📊 TCO & Pricing Optimization Tool")
     if 'company_for_tco' in st.session_state:
         st.info(f"Preparing TCO analysis for: **{st.session_state.company_for_tco}**")
+        st.session_state.tco_company = st.session_state.company_for_tco
         del st.session_state.company_for_tco
 
     with st.container(border=True):
@@ -220,48 +577,251 @@ def render_tco_page():
                 st.metric("5-Year Total Cost of Ownership", f"€ {total_tco:,.0f}")
                 st.session_state.total_tco = total_tco
 
+    with st.container(border=True):
+        st.subheader("Scenario & Sensitivity Analysis")
+        st.caption("Varies the calculator inputs, contract length, discount rate and cost escalation, and evaluates thousands of combinations at once.")
+        scenario_cols = st.columns(3)
+        acquisition_spread = scenario_cols[0].slider("Acquisition cost uncertainty (± %)", 0, 50, 15) / 100
+        operations_spread = scenario_cols[0].slider("Operational cost uncertainty (± %)", 0, 50, 20) / 100
+        years_range = scenario_cols[1].slider("Contract length (years)", 1, 10, (3, 7))
+        discount_range = scenario_cols[1].slider("Discount rate (%)", 0.0, 20.0, (4.0, 12.0), step=0.5)
+        escalation_range = scenario_cols[2].slider("Annual cost escalation (%)", 0.0, 15.0, (0.0, 6.0), step=0.5)
+        distribution = scenario_cols[2].selectbox("Distribution", ["triangular", "uniform", "normal"])
+        method = st.radio("Method", ["Monte Carlo", "Grid"], horizontal=True)
+        if method == "Monte Carlo":
+            scenario_count = st.select_slider("Scenarios", [10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000], value=100_000)
+        else:
+            grid_points = st.slider("Grid points per input", 2, 9, 5)
+
+        def spread(value, fraction):
+            return Range(value * (1 - fraction), value, value * (1 + fraction), distribution)
+
+        def bounded(low, high, base):
+            return Range(low, min(max(base, low), high), high, distribution)
+
+        engine = TCOScenarioEngine(
+            spread(c1, acquisition_spread), spread(c2, acquisition_spread),
+            spread(c3, operations_spread), spread(c4, operations_spread), spread(c5, operations_spread),
+            years=bounded(*years_range, 5), discount_rate=bounded(discount_range[0] / 100, discount_range[1] / 100, sum(discount_range) / 200),
+            escalation=bounded(escalation_range[0] / 100, escalation_range[1] / 100, sum(escalation_range) / 200),
+        )
+        too_large = False
+        if method == "Grid":
+            scenario_total = grid_size(engine.inputs, grid_points)
+            too_large = scenario_total > MAX_GRID_SCENARIOS
+            st.caption(f"The grid has {scenario_total:,} scenarios." + (f" ⚠️ Above the limit of {MAX_GRID_SCENARIOS:,}; use fewer points." if too_large else ""))
+        if st.button("Run Scenario Analysis", disabled=too_large, use_container_width=True):
+            st.session_state.tco_scenarios = engine.monte_carlo(scenario_count) if method == "Monte Carlo" else engine.grid(grid_points)
+
+        if 'tco_scenarios' in st.session_state:
+            render_tco_scenarios(st.session_state.tco_scenarios)
+
     with st.container(border=True):
         st.subheader("AI Commercial Model Recommendation")
         if 'total_tco' in st.session_state:
             st.success(f"Using calculated 5-Year TCO of **€{st.session_state.total_tco:,.0f}** for analysis.")
         
         segment = st.selectbox("Customer Segment", ["Tier 1 Operator", "Enterprise", "MVNO"])
+        stream_results = st.checkbox("Stream the recommendation as it arrives", value=True, key="tco_stream")
         if st.button("Get AI Recommendation", key="tco_ai", use_container_width=True):
             if 'total_tco' in st.session_state:
-                with st.spinner("AI is generating a strategic recommendation..."):
-                    tco_components = f"Acquisition: €{c1+c2}, Annual Ops: €{c3+c4+c5}, 5-Year TCO: €{st.session_state.total_tco:,.0f}"
-                    prompt = get_tco_pricing_prompt(segment, tco_components, "")
-                    try:
-                        message = client.messages.create(model="claude-3-sonnet-20240229", max_tokens=1024, messages=[{"role": "user", "content": prompt}]).content[0].text
-                        recommendation = json.loads(message)
-                        with st.expander("View AI Recommendation", expanded=True):
-                            st.success(f"**Recommended Model:** {recommendation.get('recommended_model')}")
-                            st.info(f"**TCO Insight:** {recommendation.get('tco_insight')}")
-                            st.write("**Pricing Strategy:**"); st.write(recommendation.get('pricing_strategy'))
-                            st.write("**Key Value Propositions:**")
-                            for prop in recommendation.get('value_propositions', []): st.markdown(f"- {prop}")
-                    except Exception as e:
-                        st.error(f"AI Analysis Error: {e}")
+                tco_components = format_tco_components(c1 + c2, c3 + c4 + c5, st.session_state.total_tco)
+                company_name = st.session_state.get('tco_company')
+                if job_queue.has_active_workers():
+                    job_id = job_queue.enqueue_tco_recommendation(segment, tco_components, st.session_state.total_tco, company_name)
+                    if job_id:
+                        track_job(job_id, JOB_TCO_RECOMMENDATION)
+                        st.info(f"Queued recommendation request as job #{job_id}.")
+                else:
+                    live_view = LiveResultView(st.empty(), render_tco_recommendation) if stream_results else None
+                    started_at = time.time()
+                    with st.spinner("AI is generating a strategic recommendation..."):
+                        try:
+                            recommendation = request_tco_recommendation(init_anthropic_client(), segment, tco_components, claude_model(), stream_listener=live_view)
+                            if live_view:
+                                live_view.placeholder.empty()
+                            db.save_tco_recommendation(segment, tco_components, st.session_state.total_tco, recommendation, company_name)
+                            show_stream_timing(live_view, "tco_recommendation")
+                            show_prompt_usage(started_at)
+                            st.session_state.tco_recommendation = recommendation
+                        except Exception as e:
+                            st.error(f"AI Analysis Error: {e}")
             else:
                 st.warning("Please calculate TCO first.")
 
+        show_job_messages()
+        render_pending_jobs(JOB_TCO_RECOMMENDATION)
+        if 'tco_recommendation' in st.session_state:
+            recommendation = st.session_state.tco_recommendation
+            with st.expander("View AI Recommendation", expanded=True):
+                render_tco_recommendation(recommendation)
+
+        with st.expander("Background Recommendation Jobs"):
+            job_result = render_recent_jobs(JOB_TCO_RECOMMENDATION, lambda payload: f"{payload['segment']} · €{payload['total_tco']:,.0f}")
+            if job_result:
+                st.session_state.tco_recommendation = job_result['recommendation']
+                st.rerun()
+
 def render_partner_page():
     st.markdown("### 🤝 Partner & Reseller Portal")
+
     with st.container(border=True):
-        st.subheader("Performance Dashboard: *InnovateTel GmbH*")
-        df_performance = db.get_partner_performance(partner_company_id=1)
-        st.dataframe(df_performance, use_container_width=True, hide_index=True)
+        st.subheader("Partner Portfolio")
+        sort = st.radio("Rank by", list(PARTNER_PORTFOLIO_SORTS), horizontal=True)
+        df_portfolio = db.get_partner_portfolio(sort=sort)
+        if df_portfolio.empty:
+            st.info("No partner KPIs yet. Load them from a CSV below or with `python partner_kpis.py kpis.csv`.")
+        else:
+            st.caption(f"Quarter {df_portfolio['Quarter'].iloc[0]}. Attainment is the average of actual / target over the KPIs with a target "
+                       "(capped at 200% per KPI); the trend is its change from the previous quarter.")
+            st.dataframe(df_portfolio.drop(columns=['Company ID', 'Quarter']), use_container_width=True, hide_index=True)
+
+    partners = db.get_partners()
+    if partners:
+        with st.container(border=True):
+            partner_ids = [company_id for company_id, _ in partners]
+            names = dict(partners)
+            current = st.session_state.get('partner_company_id')
+            if current not in partner_ids:
+                current = int(df_portfolio['Company ID'].iloc[0]) if not df_portfolio.empty else partner_ids[0]
+            partner_company_id = st.selectbox("Partner", partner_ids, index=partner_ids.index(current), format_func=names.get)
+            st.session_state.partner_company_id = partner_company_id
+            st.subheader(f"Performance Dashboard: *{names[partner_company_id]}*")
+            df_performance = db.get_partner_performance(partner_company_id)
+            st.dataframe(df_performance, use_container_width=True, hide_index=True)
+
+            grain = st.radio("Granularity", list(KPI_ROLLUP_GRAINS), horizontal=True)
+            df_history = db.get_partner_kpi_history(partner_company_id, grain)
+            if not df_history.empty:
+                kpi = st.selectbox("KPI", df_history['KPI'].unique().tolist())
+                df_kpi = df_history[df_history['KPI'] == kpi].set_index('Period')[['Actual', 'Target']].astype(float)
+                st.line_chart(df_kpi.dropna(axis=1, how='all'))
+
+    with st.expander("Load KPI Data (CSV)"):
+        st.caption("One row per partner, KPI and period: `partner,kpi,period,actual,target`. Periods are dates or months (2025-03); "
+                   "a value for the same partner, KPI and period replaces the earlier one.")
+        kpi_file = st.file_uploader("KPI CSV", type=['csv'], label_visibility="collapsed")
+        if st.button("Load KPIs", use_container_width=True) and kpi_file:
+            try:
+                facts = read_kpi_csv(kpi_file.getvalue().decode("utf-8-sig"))
+                loaded = db.save_partner_kpis(facts)
+                if loaded is not None:
+                    st.success(f"Loaded {loaded:,} KPI values for {len({fact[0] for fact in facts}):,} partners.")
+            except ValueError as e:
+                st.error(f"Could not read the CSV: {e}")
+
+def describe_rfx_stats(stats):
+    return (f"{stats['requirements']:,} requirements: {stats['prefiltered']:,} scored by rules, {stats['sent_to_llm']:,} assessed by AI "
+            f"in {stats['llm_calls']} calls ({stats['requirements_per_s']} requirements/s)."
+            + (f" {stats['unassessed']:,} could not be assessed." if stats['unassessed'] else ""))
 
 def render_rfx_page():
     st.markdown("### ⚙️ RFx Response Automation System")
+    st.write("Upload an RFx to split it into requirements, assess each one's risk and inform the bid/no-bid decision.")
+
+    with st.container(border=True):
+        st.subheader("New RFx Assessment")
+        with st.form("rfx_assessment_form"):
+            rfx_title = st.text_input("RFx Title*", placeholder="e.g., FutureNet VoNR RFP")
+            customer = st.text_input("Issuing Customer", placeholder="e.g., FutureNet Mobile")
+            uploaded_file = st.file_uploader("Upload RFx Document*", type=['pdf', 'txt', 'csv'], help="PDF or text with numbered requirements, or a CSV compliance matrix")
+            submitted = st.form_submit_button("Assess Requirements & Save", type="primary", use_container_width=True)
+
+            if submitted and uploaded_file and rfx_title:
+                if job_queue.has_active_workers():
+                    job_id = job_queue.enqueue_rfx_assessment(uploaded_file.getvalue(), uploaded_file.name, rfx_title, customer or None)
+                    if job_id:
+                        track_job(job_id, JOB_RFX_ASSESSMENT)
+                        st.info(f"Queued assessment of '{rfx_title}' as job #{job_id}. You can keep working; the result is saved when it finishes.")
+                else:
+                    started_at = time.time()
+                    with st.spinner("Reading RFx & assessing requirements..."):
+                        try:
+                            outcome = get_rfx_ingestor().ingest(uploaded_file.getvalue(), uploaded_file.name, rfx_title, customer or None)
+                            st.success(f"RFx '{rfx_title}' (ID: {outcome['rfx_id']}) assessed and saved! " + describe_rfx_stats(outcome['stats']))
+                            show_prompt_usage(started_at)
+                            st.session_state.rfx_id = outcome['rfx_id']
+                        except Exception as e:
+                            st.error(f"An error occurred: {e}")
+            elif submitted:
+                st.warning("Please provide a title and upload a document.")
+
+    show_job_messages()
+    render_pending_jobs(JOB_RFX_ASSESSMENT)
+    with st.expander("Background Assessment Jobs"):
+        if not job_queue.has_active_workers():
+            st.caption("No background workers are running, so assessments run inline. Start them with `python worker.py`.")
+        job_result = render_recent_jobs(JOB_RFX_ASSESSMENT, lambda payload: f"{payload['title']} ({payload['filename']})")
+        if job_result:
+            st.session_state.rfx_id = job_result['rfx_id']
+
+    df_rfx = db.get_rfx_documents()
+    if df_rfx.empty:
+        st.info("No RFx documents yet. Upload one above.")
+        return
     with st.container(border=True):
-        st.subheader("Preliminary Risk Assessment: *FutureNet VoNR RFP*")
-        df_rfx_risks = db.get_rfx_requirements(rfx_id=1)
+        rfx_ids = df_rfx['ID'].tolist()
+        current = st.session_state.get('rfx_id')
+        rfx_id = st.selectbox("RFx Document", rfx_ids, index=rfx_ids.index(current) if current in rfx_ids else 0,
+                              format_func=lambda i: f"#{i} {df_rfx.loc[df_rfx['ID'] == i, 'Title'].iloc[0]}")
+        st.session_state.rfx_id = rfx_id
+        rfx = df_rfx[df_rfx['ID'] == rfx_id].iloc[0]
+        st.subheader(f"Preliminary Risk Assessment: *{rfx['Title']}*")
+        m_col1, m_col2, m_col3, m_col4 = st.columns(4)
+        m_col1.metric("Requirements", f"{int(rfx['Requirements']):,}")
+        m_col2.metric("High Risk", f"{int(rfx['High']):,}")
+        m_col3.metric("Medium Risk", f"{int(rfx['Medium']):,}")
+        m_col4.metric("Low Risk", f"{int(rfx['Low']):,}", f"{int(rfx['Not Assessed']):,} not assessed" if rfx['Not Assessed'] else None, delta_color="off")
+        risk_levels = st.multiselect("Risk Levels", ["High", "Medium", "Low", "Not assessed"], default=["High", "Medium", "Low", "Not assessed"])
+        df_rfx_risks = db.get_rfx_requirements(rfx_id, risk_levels=risk_levels or None)
         st.dataframe(df_rfx_risks, use_container_width=True, hide_index=True)
 
+def render_metrics_page():
+    st.markdown("### 📈 Performance Metrics")
+    st.caption(f"Recorded by this app process since {pd.Timestamp(metrics.started_at, unit='s'):%Y-%m-%d %H:%M} UTC. "
+               f"Queries slower than {metrics.slow_query_seconds * 1000:.0f} ms are logged. "
+               "Set METRICS_PORT to scrape the same data with Prometheus.")
+    if st.button("Reset Metrics"):
+        metrics.reset()
+
+    with st.container(border=True):
+        st.subheader("Page Renders")
+        st.dataframe(pd.DataFrame(metrics.page_summary()), use_container_width=True, hide_index=True)
+    with st.container(border=True):
+        st.subheader("LLM Calls")
+        llm_calls = pd.DataFrame(metrics.llm_summary())
+        if not llm_calls.empty:
+            input_tokens = llm_calls[["input_tokens", "cache_read_tokens", "cache_write_tokens"]].sum().sum()
+            m_col1, m_col2, m_col3, m_col4, m_col5 = st.columns(5)
+            m_col1.metric("Calls", int(llm_calls["calls"].sum()))
+            m_col2.metric("Tokens (in / out)", f"{input_tokens:,} / {llm_calls['output_tokens'].sum():,}")
+            m_col3.metric("Read from Cache", f"{llm_calls['cache_read_tokens'].sum() / max(input_tokens, 1):.0%}")
+            m_col4.metric("Saved by Preprocessing", f"{llm_calls['tokens_saved'].sum():,}")
+            m_col5.metric("Estimated Cost", f"${llm_calls['cost_usd'].sum():,.4f}")
+        st.dataframe(llm_calls, use_container_width=True, hide_index=True)
+        st.markdown("**Recent Calls**")
+        recent_calls = pd.DataFrame(list(metrics.recent_llm_calls)[::-1])
+        if not recent_calls.empty:
+            recent_calls["at"] = pd.to_datetime(recent_calls["at"], unit="s")
+        st.dataframe(recent_calls, use_container_width=True, hide_index=True)
+    with st.container(border=True):
+        st.subheader("Database Queries")
+        st.dataframe(pd.DataFrame(metrics.query_summary()), use_container_width=True, hide_index=True)
+        st.markdown("**Slow Queries**")
+        slow_queries = pd.DataFrame(list(metrics.slow_queries)[::-1])
+        if not slow_queries.empty:
+            slow_queries["at"] = pd.to_datetime(slow_queries["at"], unit="s")
+        st.dataframe(slow_queries, use_container_width=True, hide_index=True)
+    with st.expander("Prometheus Export"):
+        prometheus_text = metrics.prometheus_text()
+        st.download_button("Download metrics.txt", prometheus_text, file_name="metrics.txt", mime="text/plain")
+        st.code(prometheus_text[:20000], language="text")
+
 # --- MAIN APP LAYOUT & ROUTING ---
 if 'page' not in st.session_state:
     st.session_state.page = "Dashboard"
+if db.query_cache:
+    db.query_cache.begin_render()
 
 with st.sidebar:
     st.title("krmhstrk Assistant")
@@ -273,17 +833,36 @@ with st.sidebar:
         "TCO & Pricing Optimization": "📊", "Partner & Reseller Portal": "🤝",
         "RFx Response Automation": "⚙️"
     }
+    if metrics.enabled:
+        page_options["Performance Metrics"] = "📈"
     for page, icon in page_options.items():
         if st.button(f"{icon} {page}", use_container_width=True):
             st.session_state.page = page
             st.rerun()
 
-setup_database()
+    st.markdown("---")
+    with st.expander("DB Connection Pool"):
+        pool_stats = db.pool_stats()
+        st.caption(f"In use: {pool_stats['in_use']}/{pool_stats['max_size']} · Idle: {pool_stats['idle']} · Waiting: {pool_stats['waiting']}")
+        st.caption(f"Avg. wait: {pool_stats['avg_wait_ms']} ms · Max wait: {pool_stats['max_wait_ms']} ms · Reconnects: {pool_stats['reconnects']}")
+    query_cache_panel = st.empty()  # filled after the page has rendered
 
 page_function = {
     "Dashboard": render_main_dashboard, "Contract Lifecycle Management": render_contract_page,
     "TCO & Pricing Optimization": render_tco_page, "Partner & Reseller Portal": render_partner_page,
-    "RFx Response Automation": render_rfx_page
+    "RFx Response Automation": render_rfx_page, "Performance Metrics": render_metrics_page
 }.get(st.session_state.page, render_main_dashboard)
 
-page_function()
+with metrics.time_page(st.session_state.page):
+    page_function()
+
+if db.query_cache:
+    with query_cache_panel.container():
+        with st.expander("Query Cache"):
+            render_stats, cache_stats = db.query_cache.render_stats(), db.query_cache_stats()
+            st.caption(f"This page: {render_stats['hits']} hits · {render_stats['misses']} misses · saved {render_stats['time_saved_s'] * 1000:.1f} ms")
+            st.caption(
+                f"Overall: {cache_stats['hit_rate'] or 0:.0%} hit rate · saved {cache_stats['time_saved_s']:.2f}s · "
+                f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024:.0f} KiB)"
+                + ("" if cache_stats['listening'] else " · ⚠️ change listener offline, not caching")
+            )
@@ -0,0 +1,67 @@
+# benchmarks/bench_batch_ingestion.py
+"""
+Measures batch ingestion throughput offline against the local Anthropic stand-in.
+
+Generates distinct synthetic contract PDFs, then ingests them at several concurrency levels.
+Needs a reachable PostgreSQL database (DB_* environment variables); the analyses are written to it.
+
+Usage: python -m benchmarks.bench_batch_ingestion [--documents 40] [--pages 20] [--latency 0.5] [--concurrency 1 4 16]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import anthropic
+
+from benchmarks.synthetic_pdf import generate_contract_pdf
+from database import DatabaseManager
+from ingestion import BatchIngestionPipeline, ContractIngestor
+from mock_llm_server import MockLLMServer
+from pdf_extraction import PDFExtractionEngine
+
+
+def run(documents, pages, latency, concurrency_levels):
+    server = MockLLMServer(port=0, latency=latency, jitter=latency / 10).start_in_background()
+    client = anthropic.Anthropic(api_key="mock-key", base_url=server.base_url)
+    db = DatabaseManager()
+    db.initialize_database()
+    engine = PDFExtractionEngine()
+    # No analysis cache or similarity index: every document pays for extraction and a full API round-trip.
+    ingestor = ContractIngestor(db, client, extract_text=engine.extract_text)
+    results = []
+    try:
+        for concurrency in concurrency_levels:
+            with tempfile.TemporaryDirectory() as directory:
+                for i in range(documents):
+                    seed = concurrency * 100_000 + i
+                    with open(os.path.join(directory, f"MSA_with_Bench_Client_{seed}.pdf"), "wb") as f:
+                        f.write(generate_contract_pdf(pages, seed=seed))
+                pipeline = BatchIngestionPipeline(db, ingestor, concurrency=concurrency, max_attempts=1)
+                summary = pipeline.run(pipeline.start_batch(directory, "MSA", resume=False))
+            row = {"concurrency": concurrency, "documents": documents, "pages": pages, "llm_latency_s": latency,
+                   "elapsed_s": summary["elapsed_s"], "docs_per_s": summary["docs_per_s"], "failed": summary["failed"]}
+            results.append(row)
+            print(f"concurrency {concurrency:>3}: {row['docs_per_s']:.2f} docs/s ({row['elapsed_s']}s, {row['failed']} failed)")
+    finally:
+        engine.shutdown()
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean mock API latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.documents, args.pages, args.latency, args.concurrency)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "batch_ingestion", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_contract_search.py
+"""
+Measures full-text contract search latency on a synthetic corpus.
+
+Loads `--contracts` synthetic contracts (text plus key terms) with save_contracts_bulk, then times
+search_contracts and search_key_terms for a set of typical queries. Needs a reachable PostgreSQL
+database (DB_* environment variables); the corpus is deleted afterwards unless --keep is given.
+
+Usage: python -m benchmarks.bench_contract_search [--contracts 100000] [--repeat 5] [--keep]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+
+from benchmarks.synthetic_pdf import generate_contract_text
+from database import DatabaseManager
+
+BENCH_PREFIX = "BenchSearch"
+QUERIES = ["German law Net 60", "Switzerland exclusive territory", "liability gross negligence", "GDPR", "Nordics reseller Net 90"]
+TERM_QUERIES = [("Net 60", "Payment Terms"), ("laws of Germany", None)]
+
+
+def synthetic_contract(i):
+    text = "\n".join(line for page in generate_contract_text(1, lines_per_page=30, seed=i) for line in page)
+    net = re.search(r"Net (\d+) days", text)
+    law = re.search(r"governed by the laws of ([^.]+)\.", text)
+    analysis = {"risk_analysis": [], "key_terms": {
+        "Payment Terms": f"Net {net.group(1)}" if net else "Not Found",
+        "Governing Law & Jurisdiction": f"laws of {law.group(1)}" if law else "Not Found",
+    }}
+    return (f"MSA {i} with {BENCH_PREFIX} Client {i % 500}", "MSA", analysis, text)
+
+
+def load_corpus(db, count, batch_size=2000):
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        db.save_contracts_bulk([synthetic_contract(i) for i in range(start, min(start + batch_size, count))])
+    db.execute_query("ANALYZE contracts; ANALYZE contract_key_terms;")
+    return time.perf_counter() - started
+
+
+def cleanup(db):
+    db.execute_query(
+        "DELETE FROM contract_key_terms WHERE contract_id IN (SELECT c.contract_id FROM contracts c JOIN companies co ON c.company_id = co.company_id "
+        "WHERE co.company_name LIKE %s);", (f"{BENCH_PREFIX}%",))
+    db.execute_query("DELETE FROM contracts WHERE company_id IN (SELECT company_id FROM companies WHERE company_name LIKE %s);", (f"{BENCH_PREFIX}%",))
+    db.execute_query("DELETE FROM companies WHERE company_name LIKE %s;", (f"{BENCH_PREFIX}%",))
+
+
+def time_query(run, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), max(timings), result
+
+
+def run(count, repeat, keep):
+    db = DatabaseManager()
+    db.initialize_database()
+    results = []
+    try:
+        load_s = load_corpus(db, count)
+        print(f"loaded {count:,} contracts in {load_s:.1f}s ({count / load_s:,.0f} contracts/s)")
+        for query in QUERIES:
+            median_s, max_s, df = time_query(lambda: db.search_contracts(query, limit=20), repeat)
+            results.append({"api": "search_contracts", "query": query, "results": len(df), "median_ms": round(median_s * 1000, 1), "max_ms": round(max_s * 1000, 1)})
+            print(f"search_contracts {query!r:<36} {len(df):>3} results  median {median_s * 1000:7.1f} ms  max {max_s * 1000:7.1f} ms")
+        for value, term_name in TERM_QUERIES:
+            median_s, max_s, df = time_query(lambda: db.search_key_terms(value, term_name), repeat)
+            results.append({"api": "search_key_terms", "query": value, "term": term_name, "results": len(df),
+                            "median_ms": round(median_s * 1000, 1), "max_ms": round(max_s * 1000, 1)})
+            print(f"search_key_terms {value!r:<36} {len(df):>3} results  median {median_s * 1000:7.1f} ms  max {max_s * 1000:7.1f} ms")
+    finally:
+        if not keep:
+            cleanup(db)
+        db.pool.close()
+    return {"contracts": count, "load_s": round(load_s, 2), "trigram": db.has_trigram_search(), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic corpus in the database")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    summary = run(args.contracts, args.repeat, args.keep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "contract_search", **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_contract_writes.py
+"""
+Measures contract persistence throughput: the previous per-statement save (one commit per statement)
+against the single-transaction save_contract_and_analysis and the bulk save_contracts_bulk variants.
+
+Needs a reachable PostgreSQL database (DB_* environment variables). The benchmark contracts are
+deleted again afterwards.
+
+Usage: python -m benchmarks.bench_contract_writes [--contracts 500] [--terms 4] [--batch-size 250]
+"""
+import argparse
+import json
+import time
+
+from database import DatabaseManager, company_name_from_title, overall_risk_score
+
+BENCH_PREFIX = "BenchWrites"
+
+
+def synthetic_analysis(i, terms):
+    return {
+        "risk_analysis": [{"clause_category": "Termination Provisions", "risk_level": ("Low", "Medium", "High")[i % 3], "summary": "Synthetic."}],
+        "key_terms": {f"Term {t}": f"Value {i}-{t}" for t in range(terms)},
+    }
+
+
+def legacy_save(db, title, contract_type, analysis_result):
+    """The per-statement save this benchmark compares against: every statement commits on its own."""
+    company_name = company_name_from_title(title)
+    row = db.execute_query("SELECT company_id FROM companies WHERE company_name = %s", (company_name,), fetch='one')
+    company_id = row[0] if row else db.execute_query(
+        "INSERT INTO companies (company_name, type) VALUES (%s, 'Client') RETURNING company_id;", (company_name,), fetch='one')[0]
+    contract_id = db.execute_query(
+        "INSERT INTO contracts (company_id, contract_title, contract_type, status, risk_score_display) VALUES (%s, %s, %s, 'Active', %s) RETURNING contract_id;",
+        (company_id, title, contract_type, overall_risk_score(analysis_result)), fetch='one')[0]
+    for term, value in analysis_result.get('key_terms', {}).items():
+        db.execute_query("INSERT INTO contract_key_terms (contract_id, term_name, term_value) VALUES (%s, %s, %s);", (contract_id, term, str(value)))
+    return contract_id
+
+
+def cleanup(db):
+    db.execute_query(
+        "DELETE FROM contract_key_terms WHERE contract_id IN (SELECT c.contract_id FROM contracts c JOIN companies co ON c.company_id = co.company_id "
+        "WHERE co.company_name LIKE %s);", (f"{BENCH_PREFIX}%",))
+    db.execute_query("DELETE FROM contracts WHERE company_id IN (SELECT company_id FROM companies WHERE company_name LIKE %s);", (f"{BENCH_PREFIX}%",))
+    db.execute_query("DELETE FROM companies WHERE company_name LIKE %s;", (f"{BENCH_PREFIX}%",))
+
+
+def run(num_contracts, terms, batch_size):
+    db = DatabaseManager()
+    db.initialize_database()
+    contracts = [(f"MSA with {BENCH_PREFIX} Client {i % 50}", "MSA", synthetic_analysis(i, terms)) for i in range(num_contracts)]
+    rows = num_contracts * (1 + terms)
+
+    def batched(save_batch):
+        for start in range(0, len(contracts), batch_size):
+            save_batch(contracts[start:start + batch_size])
+
+    variants = [
+        ("per_statement", lambda: [legacy_save(db, *contract) for contract in contracts]),
+        ("single_transaction", lambda: [db.save_contract_and_analysis(*contract) for contract in contracts]),
+        ("bulk_multi_row", lambda: batched(lambda batch: db.save_contracts_bulk(batch, use_copy=False))),
+        ("bulk_copy", lambda: batched(lambda batch: db.save_contracts_bulk(batch, use_copy=True))),
+    ]
+    results = []
+    try:
+        for name, save_all in variants:
+            cleanup(db)
+            started = time.perf_counter()
+            save_all()
+            elapsed = time.perf_counter() - started
+            row = {"variant": name, "contracts": num_contracts, "rows": rows, "batch_size": batch_size if name.startswith("bulk") else 1,
+                   "elapsed_s": round(elapsed, 3), "rows_per_s": round(rows / elapsed, 1)}
+            results.append(row)
+            print(f"{name:<20} {row['rows_per_s']:>10.1f} rows/s ({row['elapsed_s']}s for {rows} rows)")
+    finally:
+        cleanup(db)
+        db.pool.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=500)
+    parser.add_argument("--terms", type=int, default=4, help="key terms per contract")
+    parser.add_argument("--batch-size", type=int, default=250, help="contracts per save_contracts_bulk call")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.contracts, args.terms, args.batch_size)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "contract_writes", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_dashboard_loading.py
+"""
+Measures how long the dashboard waits for its data: the previous one-after-the-other loading of its
+widgets' datasets against DatabaseManager.fetch_page_data, which loads them concurrently.
+
+The query cache is disabled so every load reaches the database. A local database answers in well under a
+millisecond, which hides what concurrency saves against a remote one; --rtt-ms adds a simulated network
+round-trip to every query. Needs a reachable PostgreSQL database (DB_* environment variables).
+
+Usage: python -m benchmarks.bench_dashboard_loading [--rtt-ms 0 2 10] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+from database import DatabaseManager  # noqa: E402
+from job_queue import JobQueue  # noqa: E402
+
+
+def with_round_trip(db, rtt_s):
+    """Delays every query of `db` by a network round-trip."""
+    execute_query = DatabaseManager.execute_query.__get__(db)
+
+    def delayed(query, params=None, fetch=None):
+        time.sleep(rtt_s)
+        return execute_query(query, params, fetch)
+    db.execute_query = delayed if rtt_s else execute_query
+
+
+def dashboard_datasets(db, job_queue):
+    """The datasets render_main_dashboard loads."""
+    return {"expiring_contracts": db.get_expiring_contracts, "kpi_summary": db.get_kpi_summary, "queue_stats": job_queue.stats}
+
+
+def sequential(datasets):
+    return {name: load() for name, load in datasets.items()}
+
+
+def median_ms(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def run(rtts_ms, repeat):
+    db = DatabaseManager()
+    db.initialize_database()
+    datasets = dashboard_datasets(db, JobQueue(db))
+    results = []
+    try:
+        for rtt_ms in rtts_ms:
+            with_round_trip(db, rtt_ms / 1000)
+            sequential(datasets), db.fetch_page_data(datasets)  # warm the pool's connections
+            before = median_ms(repeat, lambda: sequential(datasets))
+            after = median_ms(repeat, lambda: db.fetch_page_data(datasets))
+            results.append({"rtt_ms": rtt_ms, "sequential_ms": before, "concurrent_ms": after, "speedup": round(before / after, 2),
+                            "workers": db.reader.max_workers})
+            print(f"rtt {rtt_ms:>5.1f} ms: sequential {before:8.2f} ms  concurrent {after:8.2f} ms  ({before / after:.1f}x)")
+    finally:
+        db.reader.shutdown()
+        db.pool.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 2, 10])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.rtt_ms, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "dashboard_loading", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# benchmarks/bench_database_methods.py
+"""
+Times every DatabaseManager method against the current database contents, typically filled with
+`python -m benchmarks.synthetic_data`. The query cache is disabled so every call reaches PostgreSQL.
+
+Write benchmarks save "BenchMethods ..." rows and delete them again. Methods that recreate or reseed
+the schema are not run; any other public method without a case here is reported as not covered.
+
+Usage: python -m benchmarks.bench_database_methods [--repeat 5] [--only get_contracts_page search_contracts]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+from database import DatabaseManager  # noqa: E402
+from tco_engine import Range, TCOScenarioEngine  # noqa: E402
+
+BENCH_PREFIX = "BenchMethods"
+NOT_RUN = {"reset_schema", "execute_query", "transaction"}
+
+
+def synthetic_analysis(i):
+    return {"risk_analysis": [{"clause_category": "Termination Provisions", "risk_level": ("Low", "Medium", "High")[i % 3], "summary": "Synthetic."}],
+            "key_terms": {"Payment Terms": f"Net {30 + i % 4 * 15}", "Governing Law & Jurisdiction": "laws of Germany"}}
+
+
+def synthetic_requirements(count):
+    return [{"ref": f"REQ-{i}", "section": "Technical Requirements", "text": f"The solution shall support {i} concurrent sessions.",
+             "risk_level": ("Low", "Medium", "High")[i % 3], "category": "Technical", "rationale": "Synthetic.", "assessed_by": "llm"}
+            for i in range(count)]
+
+
+def synthetic_kpi_facts(count):
+    """`count` monthly facts for ten partners and two KPIs, ending last month; reloading them exercises the upsert path."""
+    month = date.today().replace(day=1)
+    months = []
+    for _ in range(count // 20 + 1):
+        month = (month - timedelta(days=1)).replace(day=1)
+        months.append(month)
+    return [(f"{BENCH_PREFIX} Partner {n % 10}", ("Revenue (EUR)", "Deals Won")[n // 10 % 2], months[n // 20], 1000.0 + n, 1200.0)
+            for n in range(count)]
+
+
+def sample_ids(db):
+    """A partner company and an RFx document with data, and the contract in the middle of the listing."""
+    partner = db.execute_query("SELECT p.company_id FROM partners p JOIN partner_kpi_quarterly r ON r.partner_id = p.partner_id "
+                               "ORDER BY p.partner_id DESC LIMIT 1;", fetch='one')
+    rfx = db.execute_query("SELECT rfx_id FROM rfx_requirements ORDER BY req_id DESC LIMIT 1;", fetch='one')
+    middle = db.execute_query("SELECT contract_id FROM contracts ORDER BY contract_id DESC OFFSET (SELECT COUNT(*) / 2 FROM contracts) LIMIT 1;", fetch='one')
+    return (partner[0] if partner else 1), (rfx[0] if rfx else 1), (middle[0] if middle else 0)
+
+
+def cases(db):
+    """{case name: (method name, callable)}; several cases may exercise one method with different arguments."""
+    partner_company_id, rfx_id, middle_id = sample_ids(db)
+    record = TCOScenarioEngine(Range(120_000, 150_000, 200_000), 45_000, 60_000, 30_000, 80_000).monte_carlo(1_000, seed=1).to_record()
+    counter = iter(range(10**9))
+    return {
+        "initialize_database": ("initialize_database", db.initialize_database),
+        "migrate:up_to_date": ("migrate", db.migrate),
+        "get_contracts": ("get_contracts", db.get_contracts),
+        "get_contracts_page:first": ("get_contracts_page", lambda: db.get_contracts_page()),
+        "get_contracts_page:middle": ("get_contracts_page", lambda: db.get_contracts_page(after=(middle_id, middle_id))),
+        "get_contracts_page:filtered": ("get_contracts_page", lambda: db.get_contracts_page({"risk_scores": ["High"], "contract_type": "MSA"})),
+        "get_contracts_page:by_expiry": ("get_contracts_page", lambda: db.get_contracts_page(sort="Expiry date (soonest first)")),
+        "get_counterparties": ("get_counterparties", db.get_counterparties),
+        "get_expiring_contracts": ("get_expiring_contracts", db.get_expiring_contracts),
+        "get_kpi_summary": ("get_kpi_summary", db.get_kpi_summary),
+        "get_partners": ("get_partners", db.get_partners),
+        "get_partner_portfolio:attainment": ("get_partner_portfolio", lambda: db.get_partner_portfolio()),
+        "get_partner_portfolio:trend": ("get_partner_portfolio", lambda: db.get_partner_portfolio(sort="Trend")),
+        "get_partner_performance": ("get_partner_performance", lambda: db.get_partner_performance(partner_company_id)),
+        "get_partner_kpi_history:monthly": ("get_partner_kpi_history", lambda: db.get_partner_kpi_history(partner_company_id)),
+        "get_rfx_documents": ("get_rfx_documents", db.get_rfx_documents),
+        "get_rfx_requirements": ("get_rfx_requirements", lambda: db.get_rfx_requirements(rfx_id)),
+        "get_rfx_requirements:high": ("get_rfx_requirements", lambda: db.get_rfx_requirements(rfx_id, risk_levels=["High"])),
+        "get_tco_analyses": ("get_tco_analyses", db.get_tco_analyses),
+        "search_contracts": ("search_contracts", lambda: db.search_contracts("German law Net 60")),
+        "search_key_terms": ("search_key_terms", lambda: db.search_key_terms("Net 60", "Payment Terms")),
+        "has_trigram_search": ("has_trigram_search", db.has_trigram_search),
+        "fetch_page_data:dashboard": ("fetch_page_data", lambda: db.fetch_page_data({"expiring": db.get_expiring_contracts, "kpis": db.get_kpi_summary})),
+        "save_contract_and_analysis": ("save_contract_and_analysis", lambda: db.save_contract_and_analysis(
+            f"MSA with {BENCH_PREFIX} Client", "MSA", synthetic_analysis(next(counter)), "Synthetic contract text governed by German law.")),
+        "save_contracts_bulk:100": ("save_contracts_bulk", lambda: db.save_contracts_bulk(
+            [(f"MSA with {BENCH_PREFIX} Client {i % 10}", "MSA", synthetic_analysis(i)) for i in range(100)])),
+        "save_tco_recommendation": ("save_tco_recommendation", lambda: db.save_tco_recommendation(
+            "Enterprise", "Acquisition: €1", 1.0, {"recommended_model": "Hybrid Model"}, company_name=f"{BENCH_PREFIX} Client")),
+        "save_rfx_document:1000": ("save_rfx_document", lambda: db.save_rfx_document(f"{BENCH_PREFIX} RFx", synthetic_requirements(1000),
+                                                                                   company_name=f"{BENCH_PREFIX} Client")),
+        "save_partner_kpis:1000": ("save_partner_kpis", lambda: db.save_partner_kpis(synthetic_kpi_facts(1000))),
+        "save_tco_analysis": ("save_tco_analysis", lambda: db.save_tco_analysis(f"{BENCH_PREFIX} analysis", record)),
+        "invalidate_cache": ("invalidate_cache", db.invalidate_cache),
+        "query_cache_stats": ("query_cache_stats", db.query_cache_stats),
+        "pool_stats": ("pool_stats", db.pool_stats),
+    }
+
+
+def cleanup(db):
+    companies = "SELECT company_id FROM companies WHERE company_name LIKE %s"
+    pattern = (f"{BENCH_PREFIX}%",)
+    db.execute_query("DELETE FROM rfx_requirements r USING rfx_documents d WHERE r.rfx_id = d.rfx_id AND d.rfx_title LIKE %s;", pattern)
+    db.execute_query("DELETE FROM rfx_documents WHERE rfx_title LIKE %s;", pattern)
+    for table in ("partner_kpi_facts", "partner_kpi_monthly", "partner_kpi_quarterly"):
+        db.execute_query(f"DELETE FROM {table} r USING partners p WHERE r.partner_id = p.partner_id AND p.company_id IN ({companies});", pattern)
+    db.execute_query(f"DELETE FROM partners WHERE company_id IN ({companies});", pattern)
+    db.execute_query(f"DELETE FROM contract_key_terms k USING contracts c WHERE k.contract_id = c.contract_id AND c.company_id IN ({companies});", pattern)
+    db.execute_query(f"DELETE FROM contracts WHERE company_id IN ({companies});", pattern)
+    db.execute_query("DELETE FROM companies WHERE company_name LIKE %s;", pattern)
+    db.execute_query("DELETE FROM tco_recommendations WHERE company_name LIKE %s;", pattern)
+    db.execute_query("DELETE FROM tco_analyses WHERE analysis_name LIKE %s;", pattern)
+
+
+def result_size(value):
+    return len(value) if hasattr(value, "__len__") else None
+
+
+def run(repeat, only=None):
+    db = DatabaseManager()
+    db.initialize_database()
+    table = cases(db)
+    covered = {method for method, _ in table.values()}
+    public = {name for name in dir(DatabaseManager) if not name.startswith("_") and callable(getattr(DatabaseManager, name))}
+    missing = sorted(public - covered - NOT_RUN)
+    contracts = db.execute_query("SELECT COUNT(*) FROM contracts;", fetch='one')[0]
+    print(f"{contracts:,} contracts in the database")
+    results = []
+    try:
+        for name, (method, call) in table.items():
+            if only and name not in only and method not in only:
+                continue
+            call()  # warm up
+            timings, value = [], None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                value = call()
+                timings.append(time.perf_counter() - started)
+            if isinstance(value, tuple) and len(value) == 2 and hasattr(value[0], "__len__"):
+                value = value[0]  # get_contracts_page returns (page, next_cursor)
+            row = {"case": name, "method": method, "median_ms": round(statistics.median(timings) * 1000, 2),
+                   "max_ms": round(max(timings) * 1000, 2), "rows": result_size(value)}
+            results.append(row)
+            print(f"{name:<32} median {row['median_ms']:>9.2f} ms  max {row['max_ms']:>9.2f} ms  rows {row['rows'] if row['rows'] is not None else '-'}")
+    finally:
+        cleanup(db)
+        db.pool.close()
+    if missing:
+        print(f"not covered: {', '.join(missing)}")
+    return {"contracts": contracts, "repeat": repeat, "not_covered": missing, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="case or method names to run")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    summary = run(args.repeat, args.only)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "database_methods", **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
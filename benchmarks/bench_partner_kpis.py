@@ -0,0 +1,109 @@
+# benchmarks/bench_partner_kpis.py
+"""
+Measures the partner KPI store: bulk-loading monthly facts (with the rollup refresh), and ranking the
+partner portfolio for a quarter from the quarterly rollup against the same ranking computed from the
+raw facts.
+
+Needs a reachable PostgreSQL database (DB_* environment variables). Partners are named "BenchKPI ..."
+and deleted again afterwards.
+
+Usage: python -m benchmarks.bench_partner_kpis [--partners 500] [--months 24] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from datetime import date
+
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+from benchmarks.synthetic_data import partner_kpi_facts  # noqa: E402
+from database import KPI_ATTAINMENT, DatabaseManager  # noqa: E402
+
+BENCH_PREFIX = "BenchKPI"
+# The portfolio ranking of get_partner_portfolio, with the quarterly sums aggregated from the facts on the fly.
+RAW_PORTFOLIO_QUERY = (
+    "WITH r AS (SELECT partner_id, kpi_id, date_trunc('quarter', period_date)::date AS period_start, SUM(target_value) AS target_sum, "
+    "SUM(actual_value) FILTER (WHERE target_value IS NOT NULL) AS targeted_actual_sum FROM partner_kpi_facts "
+    "WHERE period_date >= (%s::date - INTERVAL '3 months') AND period_date < (%s::date + INTERVAL '3 months') GROUP BY 1, 2, 3), "
+    f"attainment AS (SELECT r.partner_id, r.period_start, AVG({KPI_ATTAINMENT}) AS attainment FROM r JOIN kpi_definitions d ON d.kpi_id = r.kpi_id "
+    "WHERE r.target_sum IS NOT NULL GROUP BY 1, 2) "
+    "SELECT RANK() OVER (ORDER BY cur.attainment DESC), co.company_name, cur.attainment, cur.attainment - prev.attainment "
+    "FROM attainment cur LEFT JOIN attainment prev ON prev.partner_id = cur.partner_id AND prev.period_start = (%s::date - INTERVAL '3 months')::date "
+    "JOIN partners p ON p.partner_id = cur.partner_id JOIN companies co ON co.company_id = p.company_id "
+    "WHERE cur.period_start = %s ORDER BY 1, co.company_name;"
+)
+
+
+def cleanup(db):
+    companies = "SELECT company_id FROM companies WHERE company_name LIKE %s"
+    pattern = (f"{BENCH_PREFIX}%",)
+    for table in ("partner_kpi_facts", "partner_kpi_monthly", "partner_kpi_quarterly"):
+        db.execute_query(f"DELETE FROM {table} r USING partners p WHERE r.partner_id = p.partner_id AND p.company_id IN ({companies});", pattern)
+    db.execute_query(f"DELETE FROM partners WHERE company_id IN ({companies});", pattern)
+    db.execute_query("DELETE FROM companies WHERE company_name LIKE %s;", pattern)
+
+
+def median_ms(call, repeat):
+    call()  # warm up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def run(partners, months, repeat=5):
+    db = DatabaseManager()
+    db.initialize_database()
+    facts = partner_kpi_facts(random.Random(7), [f"{BENCH_PREFIX} Partner {i:05d}" for i in range(partners)], months, date.today())
+    results = []
+    try:
+        started = time.perf_counter()
+        db.save_partner_kpis(facts)
+        elapsed = time.perf_counter() - started
+        results.append({"case": "bulk_load", "facts": len(facts), "elapsed_s": round(elapsed, 2), "rows_per_s": round(len(facts) / elapsed)})
+        last_period = max(fact[2] for fact in facts)
+        latest_month = [fact for fact in facts if fact[2] == last_period]
+        started = time.perf_counter()
+        db.save_partner_kpis(latest_month)  # a monthly delivery: one month for every partner, replacing the loaded values
+        elapsed = time.perf_counter() - started
+        results.append({"case": "monthly_reload", "facts": len(latest_month), "elapsed_s": round(elapsed, 2), "rows_per_s": round(len(latest_month) / elapsed)})
+        db.execute_query("ANALYZE partner_kpi_facts; ANALYZE partner_kpi_quarterly;")
+
+        quarter = db.get_partner_portfolio()['Quarter'].iloc[0]
+        quarter_start = date(int(quarter[:4]), (int(quarter[-1]) - 1) * 3 + 1, 1)
+        ranked = db.execute_query("SELECT COUNT(DISTINCT partner_id) FROM partner_kpi_quarterly WHERE period_start = %s;", (quarter_start,), fetch='one')[0]
+        results.append({"case": "portfolio_from_rollup", "partners": ranked,
+                        "median_ms": median_ms(lambda: db.get_partner_portfolio(quarter=quarter_start), repeat)})
+        results.append({"case": "portfolio_from_facts", "partners": ranked,
+                        "median_ms": median_ms(lambda: db.execute_query(RAW_PORTFOLIO_QUERY, (quarter_start,) * 4, fetch='all'), repeat)})
+    finally:
+        cleanup(db)
+        db.pool.close()
+    for row in results:
+        if "rows_per_s" in row:
+            print(f"{row['case']:<24} {row['facts']:>9,} facts  {row['elapsed_s']:>7.2f}s  {row['rows_per_s']:>9,} rows/s")
+        else:
+            print(f"{row['case']:<24} {row['partners']:>9,} partners  median {row['median_ms']:>9.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--partners", type=int, default=500)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.partners, args.months, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "partner_kpis", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
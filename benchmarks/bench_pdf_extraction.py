@@ -0,0 +1,75 @@
+# benchmarks/bench_pdf_extraction.py
+"""
+Compares the legacy single-threaded `extract_text_from_pdf` with the PDFExtractionEngine on large generated PDFs.
+
+Usage: python -m benchmarks.bench_pdf_extraction [--pages 50 200 500] [--workers N] [--json results.json]
+"""
+import argparse
+import json
+import time
+from io import BytesIO
+
+import PyPDF2
+
+from benchmarks.synthetic_pdf import generate_contract_pdf
+from pdf_extraction import PageTextCache, PDFExtractionEngine
+
+
+def legacy_extract(file_bytes):
+    """The original app.py implementation, kept verbatim as the baseline."""
+    reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+    return "".join(page.extract_text() for page in reader.pages)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(page_counts, workers=None, repeat=3, budget_chars=200_000):
+    results = []
+    engine = PDFExtractionEngine(workers=workers, cache=PageTextCache(max_chars=0))  # cache disabled: measure raw extraction
+    cached_engine = PDFExtractionEngine(workers=workers)
+    try:
+        engine.extract_text(generate_contract_pdf(engine.parallel_threshold + 1))  # warm up the process pool
+        for pages in page_counts:
+            pdf = generate_contract_pdf(pages)
+            cached_engine.extract_text(pdf)
+            row = {
+                "pages": pages,
+                "size_kb": round(len(pdf) / 1024, 1),
+                "workers": engine.workers,
+                "legacy_s": timed(lambda: legacy_extract(pdf), repeat),
+                "engine_s": timed(lambda: engine.extract_text(pdf), repeat),
+                "engine_budget_s": timed(lambda: engine.extract_text(pdf, max_chars=budget_chars), repeat),
+                "engine_cached_s": timed(lambda: cached_engine.extract_text(pdf), repeat),
+            }
+            row["speedup"] = round(row["legacy_s"] / row["engine_s"], 2)
+            results.append(row)
+            print(f"{pages:>5} pages  legacy {row['legacy_s']:.3f}s  engine {row['engine_s']:.3f}s ({row['speedup']}x)  "
+                  f"budget {row['engine_budget_s']:.3f}s  cached {row['engine_cached_s']:.4f}s")
+    finally:
+        engine.shutdown()
+        cached_engine.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.pages, args.workers, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "pdf_extraction", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_prompt_tokens.py
+"""
+Measures the input tokens and cost of contract analysis requests offline, against the local Anthropic
+stand-in: the instructions and raw extracted text sent as one user message, against analyze_text, which
+strips page boilerplate and sends the instructions as a system prefix.
+
+Token counts are the stand-in's (about four characters per token), so absolute numbers are approximate;
+the ratios between the two variants are what matters.
+
+Usage: python -m benchmarks.bench_prompt_tokens [--documents 20] [--pages 10]
+"""
+import argparse
+import json
+
+import anthropic
+
+from benchmarks.synthetic_pdf import generate_contract_pdf
+from contract_analysis import analyze_text
+from metrics import METRICS, model_prices
+from mock_llm_server import MockLLMServer
+from pdf_extraction import PDFExtractionEngine
+from prompts import get_contract_analysis_prompt
+
+MODEL = "claude-3-5-sonnet-20241022"
+
+
+def summarize(variant, calls):
+    input_price, _ = model_prices(MODEL)
+    totals = {field: sum(call[field] for call in calls)
+              for field in ("input_tokens", "cache_read_tokens", "cache_write_tokens", "output_tokens", "tokens_saved", "cost_usd")}
+    sent = totals["input_tokens"] + totals["cache_read_tokens"] + totals["cache_write_tokens"]
+    return {"variant": variant, "calls": len(calls), "input_tokens_sent": sent, **totals,
+            "cache_read_ratio": round(totals["cache_read_tokens"] / sent, 3) if sent else 0.0,
+            "cost_usd": round(totals["cost_usd"], 4), "input_price_per_mtok": input_price}
+
+
+def run(documents, pages):
+    server = MockLLMServer(port=0, latency=0.0, jitter=0.0).start_in_background()
+    client = anthropic.Anthropic(api_key="mock-key", base_url=server.base_url)
+    engine = PDFExtractionEngine()
+    METRICS.enabled = True
+    try:
+        texts = [engine.extract_text(generate_contract_pdf(pages, seed=seed)) for seed in range(documents)]
+        raw_calls, prepared_calls = [], []
+        for text in texts:
+            with METRICS.llm_call("bench_raw_prompt", MODEL) as call:
+                call.message = client.messages.create(model=MODEL, max_tokens=2048, messages=[
+                    {"role": "user", "content": get_contract_analysis_prompt(text, "MSA")}])
+            raw_calls.append(METRICS.last_llm_call())
+            analyze_text(client, text, "MSA", MODEL)
+            prepared_calls.append(METRICS.last_llm_call())
+    finally:
+        engine.shutdown()
+        server.shutdown()
+    results = [summarize("raw", raw_calls), summarize("preprocessed", prepared_calls)]
+    for row in results:
+        print(f"{row['variant']:<20} {row['input_tokens_sent']:>9,} input tokens  "
+              f"{row['tokens_saved']:>7,} saved  ${row['cost_usd']:.4f}")
+    before, after = results
+    print(f"input tokens sent: {1 - after['input_tokens_sent'] / before['input_tokens_sent']:.1%} fewer, "
+          f"cost: {1 - after['cost_usd'] / before['cost_usd']:.1%} lower")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.documents, args.pages)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "prompt_tokens", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
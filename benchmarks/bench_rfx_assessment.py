@@ -0,0 +1,112 @@
+# benchmarks/bench_rfx_assessment.py
+"""
+Measures RFx risk assessment throughput offline against the local Anthropic stand-in: one LLM call per
+requirement line, against the rule prefilter plus batched, concurrent calls of assess_requirements.
+
+The synthetic RFx mixes routine lines (submission formalities, company information) with commercial,
+legal and technical requirements, a few of them repeated word for word, like a real telecom RFP.
+The stand-in's latency grows with the output tokens, so a batch reply takes longer than a single one.
+
+Usage: python -m benchmarks.bench_rfx_assessment [--requirements 2000] [--latency 0.5] [--output-token-latency 0.002]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import anthropic
+
+from benchmarks.synthetic_data import REQUIREMENT_TEMPLATES
+from metrics import METRICS
+from mock_llm_server import MockLLMServer
+from rfx_assessment import RFxAssessmentConfig, assess_requirements, assess_with_llm_async, parse_requirements
+
+MODEL = "claude-3-5-sonnet-20241022"
+ROUTINE_TEMPLATES = [
+    "Proposals shall be submitted electronically through the tender portal in PDF format.",
+    "The bidder shall provide a company profile and an organisational chart.",
+    "Questions shall be submitted by e-mail no later than {n} days before the deadline.",
+    "The bidder shall provide three customer references for comparable deployments.",
+    "Bidders may propose optional features in a separate annex, which shall be priced separately.",
+    "User manuals shall be provided in English in electronic format.",
+]
+SCOPES = ["core network", "radio access network", "IMS platform", "OSS/BSS stack", "transport network", "data centre"]
+SECTIONS = ["Instructions to Bidders", "Company Information", "Technical Requirements", "Service Levels", "Commercial Terms", "Legal Terms"]
+
+
+def generate_rfx_text(requirements, seed=0):
+    """A numbered RFx of `requirements` lines in six sections, about a third of them routine."""
+    rng = random.Random(seed)
+    lines, per_section = [], -(-requirements // len(SECTIONS))
+    for number, section in enumerate(SECTIONS, start=1):
+        lines.append(f"{number}. {section}")
+        for item in range(1, per_section + 1):
+            if len(lines) - number >= requirements:
+                break
+            template = rng.choice(ROUTINE_TEMPLATES if rng.random() < 0.35 else REQUIREMENT_TEMPLATES)
+            text = template.format(n=rng.randint(1, 400), sla=rng.choice([99.9, 99.99, 99.999]), weeks=rng.randint(4, 52),
+                                   net=rng.choice([30, 45, 60, 90]), years=rng.randint(2, 7))
+            scope = f" This applies to phase {rng.randint(1, 12)} of the {rng.choice(SCOPES)} rollout." if rng.random() < 0.8 else ""
+            lines.append(f"{number}.{item} {text}{scope}")
+    return "\n".join(lines)
+
+
+def llm_totals():
+    calls = METRICS.llm_summary()
+    return {"input_tokens": sum(call["input_tokens"] + call["cache_read_tokens"] + call["cache_write_tokens"] for call in calls),
+            "output_tokens": sum(call["output_tokens"] for call in calls), "cost_usd": round(sum(call["cost_usd"] for call in calls), 4)}
+
+
+def run(requirements, latency, output_token_latency, concurrency=4):
+    server = MockLLMServer(port=0, latency=latency, jitter=0.0, output_token_latency=output_token_latency).start_in_background()
+    client = anthropic.Anthropic(api_key="mock-key", base_url=server.base_url)
+    METRICS.enabled = True
+    parsed = parse_requirements(generate_rfx_text(requirements))
+    results = []
+    try:
+        # Baseline: every requirement line in its own call, no prefilter and no deduplication.
+        METRICS.reset()
+        config = RFxAssessmentConfig(batch_size=1, concurrency=concurrency)
+
+        async def per_line():
+            async with anthropic.AsyncAnthropic(api_key="mock-key", base_url=server.base_url, max_retries=0) as async_client:
+                return await assess_with_llm_async(async_client, [(i, item["text"]) for i, item in enumerate(parsed, start=1)], MODEL, config)
+        started = time.perf_counter()
+        _, calls = asyncio.run(per_line())
+        elapsed = time.perf_counter() - started
+        results.append({"variant": "one_call_per_line", "requirements": len(parsed), "llm_calls": calls, "elapsed_s": round(elapsed, 2),
+                        "requirements_per_s": round(len(parsed) / elapsed, 1), **llm_totals()})
+
+        METRICS.reset()
+        stats = assess_requirements(client, [dict(item) for item in parsed], MODEL, RFxAssessmentConfig(concurrency=concurrency))
+        results.append({"variant": "prefilter_batched", "requirements": stats["requirements"], "llm_calls": stats["llm_calls"],
+                        "elapsed_s": stats["elapsed_s"], "requirements_per_s": stats["requirements_per_s"],
+                        "prefiltered": stats["prefiltered"], "sent_to_llm": stats["sent_to_llm"], **llm_totals()})
+    finally:
+        server.shutdown()
+    for row in results:
+        print(f"{row['variant']:<20} {row['requirements']:>6} requirements  {row['llm_calls']:>6} calls  {row['elapsed_s']:>8.2f}s  "
+              f"{row['requirements_per_s']:>8.1f} req/s  {row['input_tokens']:>9,} in / {row['output_tokens']:>8,} out  ${row['cost_usd']:.4f}")
+    before, after = results
+    print(f"{after['requirements_per_s'] / before['requirements_per_s']:.1f}x the throughput, "
+          f"{1 - after['cost_usd'] / before['cost_usd']:.1%} lower cost")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requirements", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.5, help="stand-in latency per call in seconds")
+    parser.add_argument("--output-token-latency", type=float, default=0.002, help="stand-in latency per output token in seconds")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.requirements, args.latency, args.output_token_latency, args.concurrency)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "rfx_assessment", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
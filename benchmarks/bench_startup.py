@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+"""
+Measures cold start: the time from a new Python process to the first rendered dashboard, and which heavy
+modules that first render loaded. Every sample renders app.py with Streamlit's AppTest in a fresh
+interpreter, so imports, the connection pool and the schema check are paid again each time. A second
+render in the same process is the warm rerun every later interaction pays.
+
+Needs a reachable PostgreSQL database (DB_* environment variables); no API key, as the dashboard makes no LLM calls.
+
+Usage: python -m benchmarks.bench_startup [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("anthropic", "PyPDF2", "pandas", "numpy")
+# Runs in the fresh interpreter and prints one JSON line.
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file("app.py", default_timeout=120)
+app.run()
+rendered = time.perf_counter()
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+app.run()
+rerun = time.perf_counter()
+print(json.dumps({{"streamlit_import_s": imported - started, "first_render_s": rendered - imported, "rerun_s": rerun - rendered,
+                  "loaded": loaded, "errors": [str(error.value) for error in app.exception]}}))
+"""
+
+
+def sample():
+    """One cold start in a new interpreter; returns its timings in seconds."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result["errors"]:
+        raise RuntimeError(f"The dashboard failed to render: {result['errors'][0]}")
+    # Time to the first dashboard: everything up to the first render, including interpreter start-up.
+    result["time_to_dashboard_s"] = elapsed - result["rerun_s"]
+    return result
+
+
+def median_ms(samples, key):
+    return round(statistics.median(s[key] for s in samples) * 1000, 1)
+
+
+def run(repeat=5):
+    samples = [sample() for _ in range(repeat)]
+    results = [
+        {"case": "time_to_dashboard", "median_ms": median_ms(samples, "time_to_dashboard_s")},
+        {"case": "streamlit_import", "median_ms": median_ms(samples, "streamlit_import_s")},
+        {"case": "first_render", "median_ms": median_ms(samples, "first_render_s")},
+        {"case": "warm_rerun", "median_ms": median_ms(samples, "rerun_s")},
+    ]
+    for row in results:
+        print(f"{row['case']:<20} median {row['median_ms']:>9.1f} ms")
+    loaded = samples[0]["loaded"]
+    print(f"loaded by the first render: {', '.join(loaded) or 'none'} (of {', '.join(HEAVY_MODULES)})")
+    return {"repeat": repeat, "loaded_modules": loaded, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    summary = run(args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "startup", **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
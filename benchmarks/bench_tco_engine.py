@@ -0,0 +1,92 @@
+# benchmarks/bench_tco_engine.py
+"""
+Measures the TCO scenario engine: Monte Carlo runs and full grids at increasing sizes, plus the tornado pass,
+against a plain Python loop over the same scenarios. Runs without a database.
+
+Usage: python -m benchmarks.bench_tco_engine [--scenarios 10000 100000 1000000] [--grid-points 5 7] [--repeat 3]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from tco_engine import Range, TCOScenarioEngine
+
+INTERACTIVE_BUDGET_S = 0.25
+
+
+def example_engine():
+    return TCOScenarioEngine(
+        Range(120_000, 150_000, 200_000), Range(35_000, 45_000, 60_000),
+        Range(50_000, 60_000, 80_000), Range(25_000, 30_000, 36_000), Range(70_000, 80_000, 100_000),
+        years=Range(3, 5, 7), discount_rate=Range(0.04, 0.08, 0.12), escalation=Range(0.0, 0.03, 0.06),
+    )
+
+
+def python_loop(columns, count):
+    """The scalar equivalent of the engine's vectorized pass, one scenario at a time."""
+    totals = []
+    for i in range(count):
+        acquisition = columns["licensing"][i] + columns["migration"][i]
+        annual = columns["cloud"][i] + columns["maintenance"][i] + columns["personnel"][i]
+        total = npv = acquisition
+        for year in range(1, int(round(columns["years"][i])) + 1):
+            cost = annual * (1 + columns["escalation"][i]) ** (year - 1)
+            total += cost
+            npv += cost / (1 + columns["discount_rate"][i]) ** year
+        totals.append(total)
+    return totals
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(scenario_sizes, grid_points, repeat):
+    engine = example_engine()
+    results = []
+    for scenarios in scenario_sizes:
+        elapsed, result = best_of(repeat, lambda: engine.monte_carlo(scenarios, seed=7))
+        results.append({"method": "monte_carlo", "scenarios": scenarios, "elapsed_s": round(elapsed, 4),
+                        "scenarios_per_s": round(scenarios / elapsed), "interactive": elapsed <= INTERACTIVE_BUDGET_S})
+        print(f"monte carlo {scenarios:>9,}: {elapsed * 1000:8.1f} ms ({scenarios / elapsed:,.0f} scenarios/s)")
+    for points in grid_points:
+        elapsed, result = best_of(repeat, lambda: engine.grid(points))
+        results.append({"method": "grid", "points": points, "scenarios": result.scenarios, "elapsed_s": round(elapsed, 4),
+                        "scenarios_per_s": round(result.scenarios / elapsed), "interactive": elapsed <= INTERACTIVE_BUDGET_S})
+        print(f"grid {points} points  {result.scenarios:>9,}: {elapsed * 1000:8.1f} ms ({result.scenarios / elapsed:,.0f} scenarios/s)")
+    elapsed, _ = best_of(repeat, engine.sensitivities)
+    results.append({"method": "tornado", "scenarios": 2 * len(engine.inputs), "elapsed_s": round(elapsed, 6)})
+    print(f"tornado pass:          {elapsed * 1000:8.3f} ms")
+
+    # Baseline: a pure Python loop over a sample of the same Monte Carlo inputs.
+    sample = min(20_000, max(scenario_sizes))
+    rng = np.random.default_rng(7)
+    columns = {name: value.sample(rng, sample).tolist() for name, value in engine.inputs.items()}
+    elapsed, _ = best_of(1, lambda: python_loop(columns, sample))
+    results.append({"method": "python_loop", "scenarios": sample, "elapsed_s": round(elapsed, 4), "scenarios_per_s": round(sample / elapsed)})
+    print(f"python loop {sample:>9,}: {elapsed * 1000:8.1f} ms ({sample / elapsed:,.0f} scenarios/s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--grid-points", type=int, nargs="+", default=[5, 7])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.scenarios, args.grid_points, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "tco_engine", "interactive_budget_s": INTERACTIVE_BUDGET_S, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/run_suite.py
+"""
+Runs the benchmark suite offline and writes one machine-readable result file, optionally comparing it
+with an earlier run to flag regressions.
+
+Every benchmark runs in-process with the sizes of the chosen profile: "quick" takes a few minutes,
+"full" uses the default sizes of each benchmark. The LLM is the local stand-in (mock_llm_server.py), so
+no API key or network is needed; the database benchmarks need PostgreSQL (DB_* environment variables).
+Metrics are flattened to {"benchmark", "case", "metric", "value", "better"} rows, which is what
+--compare matches between runs.
+
+Usage: python -m benchmarks.run_suite [--profile quick] [--only tco_engine database_methods] [--generate small]
+                                      [--output results.json] [--compare baseline.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ["QUERY_CACHE_ENABLED"] = "false"
+
+PROFILES = {
+    "quick": {
+        "pdf_extraction": {"page_counts": [50, 200], "repeat": 2},
+        "batch_ingestion": {"documents": 12, "pages": 10, "latency": 0.2, "concurrency_levels": [1, 4]},
+        "contract_writes": {"num_contracts": 200, "terms": 4, "batch_size": 100},
+        "database_methods": {"repeat": 3},
+        "contract_search": {"count": 5_000, "repeat": 3, "keep": False},
+        "dashboard_loading": {"rtts_ms": [0, 2], "repeat": 10},
+        "tco_engine": {"scenario_sizes": [10_000, 100_000], "grid_points": [5], "repeat": 2},
+        "prompt_tokens": {"documents": 10, "pages": 10},
+        "rfx_assessment": {"requirements": 300, "latency": 0.2, "output_token_latency": 0.002},
+        "partner_kpis": {"partners": 100, "months": 12, "repeat": 3},
+        "startup": {"repeat": 3},
+    },
+    "full": {
+        "pdf_extraction": {"page_counts": [50, 200, 500], "repeat": 3},
+        "batch_ingestion": {"documents": 40, "pages": 20, "latency": 0.5, "concurrency_levels": [1, 4, 16]},
+        "contract_writes": {"num_contracts": 500, "terms": 4, "batch_size": 250},
+        "database_methods": {"repeat": 5},
+        "contract_search": {"count": 100_000, "repeat": 5, "keep": False},
+        "dashboard_loading": {"rtts_ms": [0, 2, 10], "repeat": 20},
+        "tco_engine": {"scenario_sizes": [10_000, 100_000, 1_000_000], "grid_points": [5, 7], "repeat": 3},
+        "prompt_tokens": {"documents": 40, "pages": 20},
+        "rfx_assessment": {"requirements": 2000, "latency": 0.5, "output_token_latency": 0.002},
+        "partner_kpis": {"partners": 500, "months": 24, "repeat": 5},
+        "startup": {"repeat": 5},
+    },
+}
+
+
+def run_benchmark(name, params):
+    """Runs one benchmark and returns its flattened metric rows."""
+    if name == "pdf_extraction":
+        from benchmarks import bench_pdf_extraction
+        return [row for result in bench_pdf_extraction.run(**params) for row in (
+            metric(name, f"pages={result['pages']}", "legacy_s", result["legacy_s"], "lower"),
+            metric(name, f"pages={result['pages']}", "engine_s", result["engine_s"], "lower"),
+            metric(name, f"pages={result['pages']}", "engine_cached_s", result["engine_cached_s"], "lower"))]
+    if name == "batch_ingestion":
+        from benchmarks import bench_batch_ingestion
+        return [metric(name, f"concurrency={result['concurrency']}", "docs_per_s", result["docs_per_s"], "higher")
+                for result in bench_batch_ingestion.run(**params)]
+    if name == "contract_writes":
+        from benchmarks import bench_contract_writes
+        return [metric(name, result["variant"], "rows_per_s", result["rows_per_s"], "higher") for result in bench_contract_writes.run(**params)]
+    if name == "database_methods":
+        from benchmarks import bench_database_methods
+        return [metric(name, result["case"], "median_ms", result["median_ms"], "lower")
+                for result in bench_database_methods.run(**params)["results"]]
+    if name == "contract_search":
+        from benchmarks import bench_contract_search
+        return [metric(name, f"{result['api']}:{result['query']}", "median_ms", result["median_ms"], "lower")
+                for result in bench_contract_search.run(**params)["results"]]
+    if name == "dashboard_loading":
+        from benchmarks import bench_dashboard_loading
+        return [row for result in bench_dashboard_loading.run(**params) for row in (
+            metric(name, f"rtt={result['rtt_ms']}ms", "sequential_ms", result["sequential_ms"], "lower"),
+            metric(name, f"rtt={result['rtt_ms']}ms", "concurrent_ms", result["concurrent_ms"], "lower"))]
+    if name == "tco_engine":
+        from benchmarks import bench_tco_engine
+        return [metric(name, f"{result['method']}:{result['scenarios']}", "elapsed_s", result["elapsed_s"], "lower")
+                for result in bench_tco_engine.run(**params)]
+    if name == "prompt_tokens":
+        from benchmarks import bench_prompt_tokens
+        return [row for result in bench_prompt_tokens.run(**params) for row in (
+            metric(name, result["variant"], "input_tokens_sent", result["input_tokens_sent"], "lower"),
+            metric(name, result["variant"], "cost_usd", result["cost_usd"], "lower"))]
+    if name == "rfx_assessment":
+        from benchmarks import bench_rfx_assessment
+        return [row for result in bench_rfx_assessment.run(**params) for row in (
+            metric(name, result["variant"], "requirements_per_s", result["requirements_per_s"], "higher"),
+            metric(name, result["variant"], "cost_usd", result["cost_usd"], "lower"))]
+    if name == "partner_kpis":
+        from benchmarks import bench_partner_kpis
+        return [metric(name, result["case"], "rows_per_s", result["rows_per_s"], "higher") if "rows_per_s" in result
+                else metric(name, result["case"], "median_ms", result["median_ms"], "lower")
+                for result in bench_partner_kpis.run(**params)]
+    if name == "startup":
+        from benchmarks import bench_startup
+        return [metric(name, result["case"], "median_ms", result["median_ms"], "lower") for result in bench_startup.run(**params)["results"]]
+    raise ValueError(f"Unknown benchmark: {name}")
+
+
+def metric(benchmark, case, name, value, better):
+    return {"benchmark": benchmark, "case": case, "metric": name, "value": value, "better": better}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def compare(metrics, baseline, tolerance):
+    """Rows of (metric, before, after, change) plus the regressions beyond `tolerance` (a fraction)."""
+    previous = {(row["benchmark"], row["case"], row["metric"]): row["value"] for row in baseline["metrics"]}
+    rows, regressions = [], []
+    for row in metrics:
+        before = previous.get((row["benchmark"], row["case"], row["metric"]))
+        if not before or row["value"] is None:
+            continue
+        change = (row["value"] - before) / before
+        worse = change > tolerance if row["better"] == "lower" else change < -tolerance
+        rows.append((row, before, change, worse))
+        if worse:
+            regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=PROFILES, default="quick")
+    parser.add_argument("--only", nargs="+", choices=list(PROFILES["quick"]), help="benchmarks to run (default: all)")
+    parser.add_argument("--generate", choices=["small", "medium", "full"], help="fill the database with synthetic data first")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="an earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    report = {"profile": args.profile, "environment": environment(), "benchmarks": {}, "metrics": []}
+    if args.generate:
+        from benchmarks import synthetic_data
+        from database import DatabaseManager
+        db = DatabaseManager()
+        db.initialize_database()
+        report["synthetic_data"] = synthetic_data.generate(db, args.generate)
+        db.pool.close()
+
+    for name, params in PROFILES[args.profile].items():
+        if args.only and name not in args.only:
+            continue
+        print(f"\n== {name} ==")
+        started = time.perf_counter()
+        try:
+            rows = run_benchmark(name, params)
+            report["benchmarks"][name] = {"params": params, "elapsed_s": round(time.perf_counter() - started, 1), "status": "ok"}
+            report["metrics"] += rows
+        except Exception as error:  # keep going: one broken benchmark should not lose the others' results
+            report["benchmarks"][name] = {"params": params, "status": "error", "error": repr(error)}
+            print(f"{name} failed: {error!r}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nwrote {len(report['metrics'])} metrics to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report["metrics"], baseline, args.tolerance)
+        print(f"\ncompared with {args.compare} ({baseline['environment'].get('commit')}):")
+        for row, before, change, worse in rows:
+            print(f"{'REGRESSION' if worse else '':<11}{row['benchmark']:<18} {row['case']:<40} {row['metric']:<16} "
+                  f"{before:>12} -> {row['value']:<12} {change:+.1%}")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# benchmarks/synthetic_data.py
+"""
+Fills the application schema with deterministic synthetic data at realistic volumes, for benchmarks.
+
+Scales (companies / contracts / key terms per contract / partners / RFx documents x requirements); every
+partner gets two years of monthly KPI facts:
+  small   1,000 / 20,000 / 10 / 200 / 200 x 50
+  medium  5,000 / 200,000 / 10 / 1,000 / 1,000 x 100
+  full    10,000 / 1,000,000 / 10 / 2,000 / 2,000 x 100   (10M key terms)
+
+Rows are written with COPY in chunks of --chunk contracts, one transaction each. Every synthetic company
+is named "Synth ...", so --drop removes the data again without touching anything else. --reset recreates
+the whole schema first (destroying all data): point DB_NAME at a dedicated benchmark database for that.
+
+Usage: python -m benchmarks.synthetic_data [--scale small] [--seed 7] [--text-fraction 0.05] [--reset | --drop]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.synthetic_pdf import generate_contract_text
+from database import DatabaseManager, key_terms_text
+from ingestion import CONTRACT_TYPES
+
+SYNTH_PREFIX = "Synth"
+SCALES = {
+    "small": {"companies": 1_000, "contracts": 20_000, "terms": 10, "partners": 200, "rfx": 200, "requirements": 50},
+    "medium": {"companies": 5_000, "contracts": 200_000, "terms": 10, "partners": 1_000, "rfx": 1_000, "requirements": 100},
+    "full": {"companies": 10_000, "contracts": 1_000_000, "terms": 10, "partners": 2_000, "rfx": 2_000, "requirements": 100},
+}
+STATUSES = ["Active"] * 6 + ["Expired", "Terminated", "In Negotiation"]
+RISK_LEVELS = ["Low", "Medium", "High"]
+TERM_VALUES = {
+    "Renewal Term": lambda rng: f"renews automatically for {rng.randint(1, 3)} year(s)",
+    "Notice Period for Non-Renewal": lambda rng: f"{rng.choice([30, 60, 90, 180])} days written notice",
+    "Payment Terms": lambda rng: f"Net {rng.choice([30, 45, 60, 90])}",
+    "Governing Law & Jurisdiction": lambda rng: f"laws of {rng.choice(['Germany', 'England and Wales', 'Switzerland', 'the State of New York'])}",
+    "Liability Cap": lambda rng: f"{rng.randint(1, 3)}x annual fees",
+    "Service Level": lambda rng: f"{rng.choice([99.5, 99.9, 99.95, 99.99])}% monthly availability",
+    "Territory": lambda rng: rng.choice(["Germany", "Austria", "Switzerland", "Benelux", "Nordics", "Iberia"]),
+    "Exclusivity": lambda rng: rng.choice(["Exclusive", "Non-exclusive"]),
+    "Price Escalation": lambda rng: f"CPI + {rng.randint(0, 3)}% per year",
+    "Minimum Commitment": lambda rng: f"EUR {rng.randint(5, 500) * 1000:,} per year",
+}
+KPI_MONTHS = 24
+# Monthly partner KPIs: (name, low, high, target factor or None). Revenue and margin follow a per-partner trend.
+PARTNER_KPIS = [("New Customers", 0, 8, 1.0), ("Certified Engineers", 2, 25, 1.1), ("Customer Satisfaction (%)", 70, 98, None),
+                ("Pipeline Value (EUR)", 200_000, 3_000_000, 1.0), ("Renewal Rate (%)", 60, 98, None)]
+REQUIREMENT_TEMPLATES = [
+    "The solution shall support {n} concurrent VoNR sessions per site.",
+    "The supplier shall guarantee {sla}% service availability with service credits.",
+    "Unlimited liability shall apply to data protection breaches.",
+    "All source code shall be placed in escrow for the contract term.",
+    "Delivery of phase {n} shall be completed within {weeks} weeks of contract signature.",
+    "The supplier shall accept payment terms of Net {net} days.",
+    "Pricing shall remain fixed for {years} years without indexation.",
+    "The supplier shall indemnify the customer against all third-party IP claims.",
+]
+
+
+def company_names(count):
+    return [f"{SYNTH_PREFIX} Company {i:05d}" for i in range(count)]
+
+
+def contract_rows(rng, contract_ids, companies, terms, text_fraction, today):
+    """(contract rows, key term rows) for one chunk of contracts."""
+    term_names = list(TERM_VALUES)[:terms]
+    contracts, key_terms = [], []
+    for contract_id in contract_ids:
+        company_name, company_id = companies[rng.randrange(len(companies))]
+        contract_type = rng.choice(CONTRACT_TYPES)
+        analysis = {"key_terms": {name: TERM_VALUES[name](rng) for name in term_names}}
+        text = None
+        if rng.random() < text_fraction:
+            text = "\n".join(line for page in generate_contract_text(1, lines_per_page=30, seed=contract_id) for line in page)
+        contracts.append((contract_id, company_id, f"{contract_type} {contract_id} with {company_name}", contract_type, rng.choice(STATUSES),
+                          today + timedelta(days=rng.randint(-365, 1460)) if rng.random() < 0.9 else None,
+                          rng.choices(RISK_LEVELS, weights=(5, 3, 2))[0], text, key_terms_text(analysis)))
+        key_terms.extend((contract_id, name, value) for name, value in analysis["key_terms"].items())
+    return contracts, key_terms
+
+
+def partner_kpi_facts(rng, partner_names, months, today):
+    """(partner, kpi_name, period_date, actual, target) facts for the `months` months before `today`."""
+    periods = []
+    month = today.replace(day=1)
+    for _ in range(months):
+        month = (month - timedelta(days=1)).replace(day=1)
+        periods.append(month)
+    periods.reverse()
+    facts = []
+    for name in partner_names:
+        revenue, growth, win_rate = rng.uniform(20_000, 400_000), rng.uniform(-0.02, 0.04), rng.uniform(0.3, 0.8)
+        levels = {kpi: rng.uniform(low, high) for kpi, low, high, _ in PARTNER_KPIS}
+        for i, period in enumerate(periods):
+            actual_revenue = revenue * (1 + growth) ** i * rng.uniform(0.85, 1.15)
+            decided = rng.randint(2, 12)
+            won = sum(rng.random() < win_rate for _ in range(decided))
+            facts += [(name, "Revenue (EUR)", period, round(actual_revenue, 2), round(revenue * 1.03 ** (i // 12 + 1), 2)),
+                      (name, "Gross Margin (EUR)", period, round(actual_revenue * rng.uniform(0.15, 0.4), 2), None),
+                      (name, "Deals Won", period, won, round(decided * 0.6)), (name, "Deals Lost", period, decided - won, None)]
+            for kpi, low, high, target_factor in PARTNER_KPIS:
+                actual = min(max(levels[kpi] * rng.uniform(0.9, 1.1), low), high)
+                target = levels[kpi] * target_factor if target_factor else (95 if kpi.endswith("(%)") else None)
+                facts.append((name, kpi, period, round(actual, 2), round(target, 2) if target is not None else None))
+    return facts
+
+
+def generate(db, scale, seed=7, text_fraction=0.05, chunk=50_000):
+    """Writes one scale's worth of synthetic rows; returns row counts and timings."""
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    today = date.today()
+    started = time.perf_counter()
+    counts = {}
+
+    with db.transaction() as uow:
+        rows = uow.insert_many(
+            "INSERT INTO companies (company_name, type) VALUES %s "
+            "ON CONFLICT (company_name) DO UPDATE SET type = EXCLUDED.type RETURNING company_name, company_id;",
+            [(name, "Partner" if i < sizes["partners"] else "Client") for i, name in enumerate(company_names(sizes["companies"]))],
+            fetch=True,
+        )
+    companies = sorted(rows, key=lambda row: row[0])
+    counts["companies"] = len(companies)
+
+    counts["contracts"] = counts["contract_key_terms"] = 0
+    for start in range(0, sizes["contracts"], chunk):
+        size = min(chunk, sizes["contracts"] - start)
+        with db.transaction() as uow:
+            contract_ids = [row[0] for row in uow.execute(
+                "SELECT nextval(pg_get_serial_sequence('contracts', 'contract_id')) FROM generate_series(1, %s);", (size,), fetch='all')]
+            contracts, key_terms = contract_rows(rng, contract_ids, companies, sizes["terms"], text_fraction, today)
+            uow.copy_rows("contracts", ("contract_id", "company_id", "contract_title", "contract_type", "status", "expiration_date",
+                                        "risk_score_display", "contract_text", "key_terms_text"), contracts)
+            uow.copy_rows("contract_key_terms", ("contract_id", "term_name", "term_value"), key_terms)
+        counts["contracts"] += len(contracts)
+        counts["contract_key_terms"] += len(key_terms)
+        print(f"  contracts {counts['contracts']:>10,} / {sizes['contracts']:,}  ({time.perf_counter() - started:.0f}s)")
+
+    partner_names = [name for name, _ in companies[:sizes["partners"]]]
+    counts["partner_kpi_facts"] = 0
+    for start in range(0, len(partner_names), 250):
+        counts["partner_kpi_facts"] += db.save_partner_kpis(partner_kpi_facts(rng, partner_names[start:start + 250], KPI_MONTHS, today)) or 0
+    counts["partners"] = len(partner_names)
+
+    with db.transaction() as uow:
+        rfx_ids = [row[0] for row in uow.insert_many(
+            "INSERT INTO rfx_documents (rfx_title, company_id, status) VALUES %s RETURNING rfx_id;",
+            [(f"{SYNTH_PREFIX} RFP {i:05d}", companies[rng.randrange(len(companies))][1], rng.choice(["Draft", "In Progress", "Submitted"]))
+             for i in range(sizes["rfx"])], fetch=True)]
+        requirements = [
+            (rfx_id, rng.choice(REQUIREMENT_TEMPLATES).format(n=rng.randint(1, 5000), sla=rng.choice([99.9, 99.99, 99.999]),
+                                                             weeks=rng.randint(4, 52), net=rng.choice([30, 60, 90, 120]), years=rng.randint(2, 7)),
+             rng.choices(RISK_LEVELS, weights=(5, 3, 2))[0])
+            for rfx_id in rfx_ids for _ in range(sizes["requirements"])
+        ]
+        uow.copy_rows("rfx_requirements", ("rfx_id", "requirement_text", "risk_level"), requirements)
+        counts["rfx_documents"], counts["rfx_requirements"] = len(rfx_ids), len(requirements)
+
+    db.execute_query("ANALYZE;")
+    db.invalidate_cache()
+    return {"scale": scale, "seed": seed, "text_fraction": text_fraction, "rows": counts, "elapsed_s": round(time.perf_counter() - started, 1)}
+
+
+def drop(db):
+    """Deletes every synthetic row (everything belonging to a "Synth ..." company)."""
+    synthetic = "SELECT company_id FROM companies WHERE company_name LIKE %s"
+    pattern = (f"{SYNTH_PREFIX} %",)
+    statements = [
+        f"DELETE FROM contract_key_terms k USING contracts c WHERE k.contract_id = c.contract_id AND c.company_id IN ({synthetic});",
+        f"DELETE FROM contracts WHERE company_id IN ({synthetic});",
+        f"DELETE FROM partner_performance pp USING partners p WHERE pp.partner_id = p.partner_id AND p.company_id IN ({synthetic});",
+        *(f"DELETE FROM {table} r USING partners p WHERE r.partner_id = p.partner_id AND p.company_id IN ({synthetic});"
+          for table in ("partner_kpi_facts", "partner_kpi_monthly", "partner_kpi_quarterly")),
+        f"DELETE FROM partners WHERE company_id IN ({synthetic});",
+        f"DELETE FROM rfx_requirements r USING rfx_documents d WHERE r.rfx_id = d.rfx_id AND d.company_id IN ({synthetic});",
+        f"DELETE FROM rfx_documents WHERE company_id IN ({synthetic});",
+        "DELETE FROM companies WHERE company_name LIKE %s;",
+    ]
+    with db.transaction() as uow:
+        for statement in statements:
+            uow.execute(statement, pattern)
+    db.invalidate_cache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--text-fraction", type=float, default=0.05, help="share of contracts stored with a page of contract text")
+    parser.add_argument("--chunk", type=int, default=50_000, help="contracts per COPY transaction")
+    parser.add_argument("--reset", action="store_true", help="recreate the schema first, deleting ALL data in the database")
+    parser.add_argument("--drop", action="store_true", help="only delete previously generated synthetic data")
+    parser.add_argument("--json", help="write the row counts and timing to this file")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    if args.drop:
+        drop(db)
+        print("synthetic data removed")
+        return
+    if args.reset:
+        db.reset_schema()
+    db.initialize_database()
+    summary = generate(db, args.scale, args.seed, args.text_fraction, args.chunk)
+    print(f"generated {summary['scale']} data in {summary['elapsed_s']}s: "
+          + ", ".join(f"{count:,} {table}" for table, count in summary["rows"].items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "synthetic_data", **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
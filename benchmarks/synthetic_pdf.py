@@ -0,0 +1,78 @@
+# benchmarks/synthetic_pdf.py
+import random
+
+CLAUSE_TEMPLATES = [
+    "{n}. Service Levels\nProvider shall ensure network availability of {sla}% measured monthly. Service credits of {credit}% of the monthly fee apply per 0.1% shortfall.",
+    "{n}. Limitation of Liability\nEach party's aggregate liability is capped at {cap} times the annual fees paid, excluding gross negligence and wilful misconduct.",
+    "{n}. Intellectual Property\nAll software, documentation and improvements remain the property of the Licensor. Customer receives a non-exclusive licence.",
+    "{n}. Data Protection\nThe parties shall comply with the GDPR. Personal data shall be processed only on documented instructions of the Controller.",
+    "{n}. Term and Termination\nThis Agreement renews automatically for {renewal} year(s) unless terminated with {notice} days written notice.",
+    "{n}. Payment Terms\nInvoices are payable Net {net} days from receipt. Late payments accrue interest at {interest}% per annum.",
+    "{n}. Exclusivity\nReseller shall have exclusive rights in the territory of {territory} for the Products listed in Schedule {schedule}.",
+    "{n}. Governing Law\nThis Agreement is governed by the laws of {law}. Courts of {venue} have exclusive jurisdiction.",
+]
+TERRITORIES = ["Germany", "Austria", "Switzerland", "Benelux", "Nordics", "Iberia"]
+LAWS = [("Germany", "Munich"), ("England and Wales", "London"), ("the State of New York", "New York"), ("Switzerland", "Zurich")]
+
+
+def generate_contract_text(num_pages, lines_per_page=48, seed=0):
+    """Generates deterministic, contract-like text as a list of pages, each a list of lines."""
+    rng = random.Random(seed)
+    pages, lines, clause = [], [], 1
+    while len(pages) < num_pages:
+        law, venue = rng.choice(LAWS)
+        text = rng.choice(CLAUSE_TEMPLATES).format(
+            n=clause, sla=rng.choice([99.5, 99.9, 99.95, 99.99]), credit=rng.randint(1, 10), cap=rng.randint(1, 3),
+            renewal=rng.randint(1, 3), notice=rng.choice([30, 60, 90, 180]), net=rng.choice([30, 45, 60, 90]),
+            interest=rng.randint(2, 9), territory=rng.choice(TERRITORIES), schedule=rng.randint(1, 9), law=law, venue=venue,
+        )
+        clause += 1
+        for paragraph in text.split("\n"):
+            words, line = paragraph.split(), ""
+            for word in words:
+                if len(line) + len(word) + 1 > 90:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = f"{line} {word}".strip()
+            lines.append(line)
+        while len(lines) >= lines_per_page:
+            pages.append(lines[:lines_per_page])
+            lines = lines[lines_per_page:]
+    return pages[:num_pages]
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def generate_contract_pdf(num_pages, lines_per_page=48, seed=0):
+    """Builds a minimal, valid multi-page PDF (Helvetica text only) with synthetic contract clauses and returns its bytes."""
+    pages = generate_contract_text(num_pages, lines_per_page, seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for page_number, lines in enumerate(pages, start=1):
+        footer = f"Confidential - Master Services Agreement - Page {page_number} of {len(pages)}"
+        body = "\n".join(f"({_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 800 Td\n{body}\nET\nBT /F1 8 Tf 50 30 Td ({_escape(footer)}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
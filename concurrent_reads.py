@@ -0,0 +1,104 @@
+# concurrent_reads.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+class PageData(dict):
+    """The datasets of one page load by name, with per-dataset timings and the overall wall time."""
+    def __init__(self, results, timings, elapsed_s):
+        super().__init__(results)
+        self.timings = timings
+        self.elapsed_s = elapsed_s
+
+    @property
+    def sequential_s(self):
+        """What loading the same datasets one after the other would have taken (the sum of their timings)."""
+        return sum(self.timings.values())
+
+    def summary(self):
+        return {
+            "datasets": len(self), "elapsed_ms": round(self.elapsed_s * 1000, 1), "sequential_ms": round(self.sequential_s * 1000, 1),
+            "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()},
+        }
+
+
+class ConcurrentReader:
+    """
+    Fetches the datasets a page needs at the same time, each on its own pooled connection, so a page with
+    several widgets waits for its slowest query rather than for the sum of all of them.
+
+    Datasets are zero-argument callables, usually bound DatabaseManager read methods; these check out their
+    own connection per query, so they are safe to run in parallel. Worker threads inherit the Streamlit
+    script context of the caller (for st.error from failed queries) and its query cache render counters.
+    """
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="page-data")
+            return self._executor
+
+    def fetch(self, datasets, query_cache=None):
+        """
+        Runs every callable in `datasets` ({name: callable}) and returns a PageData with their results.
+        Failures surface when results are collected, in `datasets` order: the first failed dataset's exception
+        is re-raised while later ones may still be running (or, when loading sequentially, are not started).
+        """
+        started = time.perf_counter()
+        if self.max_workers <= 1 or len(datasets) <= 1:
+            results, timings = {}, {}
+            for name, load in datasets.items():
+                results[name], timings[name] = _timed(load)
+            return PageData(results, timings, time.perf_counter() - started)
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        counters = query_cache.render_counters() if query_cache else None
+
+        def run(load):
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+            if query_cache:
+                query_cache.attach_render(counters)
+            try:
+                return _timed(load)
+            finally:
+                if ctx is not None:
+                    add_script_run_ctx(threading.current_thread(), None)
+                if query_cache:
+                    query_cache.attach_render(None)
+
+        executor = self._get_executor()
+        futures = {name: executor.submit(run, load) for name, load in datasets.items()}
+        results, timings = {}, {}
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+        return PageData(results, timings, time.perf_counter() - started)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def _timed(load):
+    started = time.perf_counter()
+    value = load()
+    return value, time.perf_counter() - started
+
+
+def create_concurrent_reader_from_env(pool_max_size):
+    """
+    Builds the page data reader from DB_CONCURRENT_READS (default: up to 4, leaving one pooled connection
+    for other work). DB_CONCURRENT_READS=1 loads datasets sequentially.
+    """
+    default = max(1, min(4, pool_max_size - 1))
+    return ConcurrentReader(max_workers=int(os.getenv("DB_CONCURRENT_READS", str(default))))
@@ -0,0 +1,204 @@
+# contract_analysis.py
+import asyncio
+import json
+import os
+import random
+
+import anthropic
+
+from contract_text import section_fingerprint, split_into_sections, strip_page_boilerplate
+from metrics import METRICS
+from prompt_budget import create_prompt_budget_from_env, estimate_tokens
+from prompts import CONTRACT_ANALYSIS_INSTRUCTIONS, get_contract_analysis_messages
+from streaming_json import stream_json_completion
+
+DEFAULT_MODEL = "claude-3-sonnet-20240229"
+RISK_LEVEL_ORDER = {"Low": 0, "Medium": 1, "High": 2}
+RETRYABLE_ERRORS = (anthropic.RateLimitError, anthropic.InternalServerError, anthropic.APIConnectionError)
+
+
+def request_analysis(client, contract_text, contract_type, model=DEFAULT_MODEL, max_tokens=2048, stream_listener=None, budget=None, tokens_saved=0):
+    """
+    Sends one contract analysis prompt to the Anthropic API and parses the JSON reply.
+    With a `stream_listener`, the reply is streamed and each risk finding and key term is passed to
+    `stream_listener.on_item(path, value)` as soon as it is complete.
+    Raises TokenBudgetExceeded, without calling the API, when the prompt is over the `budget`.
+    """
+    budget = budget or create_prompt_budget_from_env()
+    request = budget.prepare(*get_contract_analysis_messages(contract_text, contract_type), client, model, tokens_saved)
+    if stream_listener is not None:
+        message, _ = stream_json_completion(client, model, max_tokens, request, stream_listener, "contract_analysis", finding_keys=("risk_analysis",))
+    else:
+        with METRICS.llm_call("contract_analysis", model, tokens_saved) as call:
+            call.message = client.messages.create(model=model, max_tokens=max_tokens, **request.api_kwargs())
+        message = call.message.content[0].text
+    return json.loads(message)
+
+
+class ChunkingConfig:
+    """
+    Settings for chunked (map-reduce) analysis of long contracts, read from ANALYSIS_* environment variables,
+    and the prompt token budget every analysis request is checked against (PROMPT_* variables).
+    """
+    def __init__(self, chunk_chars=None, threshold_chars=None, concurrency=None, max_retries=None, max_tokens=2048, budget=None):
+        self.chunk_chars = chunk_chars or int(os.getenv("ANALYSIS_CHUNK_CHARS", "40000"))
+        self.threshold_chars = threshold_chars or int(os.getenv("ANALYSIS_CHUNK_THRESHOLD_CHARS", "60000"))
+        self.concurrency = concurrency or int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("ANALYSIS_MAX_RETRIES", "5"))
+        self.max_tokens = max_tokens
+        self.budget = budget or create_prompt_budget_from_env()
+
+
+def chunk_contract_text(contract_text, chunk_chars):
+    """Packs consecutive clause/section pieces into chunks of at most `chunk_chars` characters."""
+    chunks, current = [], []
+    size = 0
+    for section in split_into_sections(contract_text, max_chars=chunk_chars):
+        if current and size + len(section) + 2 > chunk_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(section)
+        size += len(section) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def retry_delay(error, attempt):
+    """Honours the server's retry-after header when present, otherwise backs off exponentially with jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), 60.0)
+    except ValueError:
+        pass
+    return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+async def _analyze_chunk(async_client, chunk, excerpt, contract_type, model, semaphore, config, tokens_saved=0):
+    # Chunk requests are counted by estimate: the budget's optional API counting is synchronous.
+    request = config.budget.prepare(*get_contract_analysis_messages(chunk, contract_type, excerpt=excerpt), tokens_saved=tokens_saved)
+    for attempt in range(config.max_retries + 1):
+        async with semaphore:
+            try:
+                with METRICS.llm_call("contract_analysis_chunk", model, tokens_saved) as call:
+                    call.message = await async_client.messages.create(model=model, max_tokens=config.max_tokens, **request.api_kwargs())
+                return json.loads(call.message.content[0].text)
+            except RETRYABLE_ERRORS as error:
+                if attempt == config.max_retries:
+                    raise
+                delay = retry_delay(error, attempt)
+        await asyncio.sleep(delay)  # sleep outside the semaphore so other chunks keep the slot busy
+
+
+async def analyze_contract_chunked_async(async_client, contract_text, contract_type, model=DEFAULT_MODEL, config=None, tokens_saved=0):
+    """
+    Analyzes a long contract chunk by chunk with bounded concurrency and merges the results in document order.
+    `tokens_saved` by preprocessing the whole text is attributed to the chunks in proportion to their length.
+    """
+    config = config or ChunkingConfig()
+    chunks = chunk_contract_text(contract_text, config.chunk_chars)
+    semaphore = asyncio.Semaphore(config.concurrency)
+    total_chars = sum(len(chunk) for chunk in chunks) or 1
+    results = await asyncio.gather(*[
+        _analyze_chunk(async_client, chunk, (index, len(chunks)), contract_type, model, semaphore, config, round(tokens_saved * len(chunk) / total_chars))
+        for index, chunk in enumerate(chunks, start=1)
+    ])
+    return merge_analysis_results(results)
+
+
+def analyze_contract_chunked(client, contract_text, contract_type, model=DEFAULT_MODEL, config=None, tokens_saved=0):
+    """Synchronous entry point for chunked analysis; builds an async client with the same credentials as `client`."""
+    async def run():
+        async with anthropic.AsyncAnthropic(api_key=client.api_key, base_url=client.base_url, max_retries=0) as async_client:
+            return await analyze_contract_chunked_async(async_client, contract_text, contract_type, model, config, tokens_saved)
+    return asyncio.run(run())
+
+
+def analyze_text(client, contract_text, contract_type, model=DEFAULT_MODEL, config=None, stream_listener=None):
+    """
+    Analyzes text in a single call, or with chunked map-reduce once it exceeds the configured threshold or
+    would not fit the prompt token budget. The text is stripped of page boilerplate (running headers and
+    footers, page numbers, redundant whitespace) first.
+    Chunked analyses are not streamed; their merged result is only available at the end.
+    """
+    config = config or ChunkingConfig()
+    prepared_text = strip_page_boilerplate(contract_text)
+    tokens_saved = max(0, estimate_tokens(contract_text) - estimate_tokens(prepared_text))
+    if len(prepared_text) > config.threshold_chars or not config.budget.allows(CONTRACT_ANALYSIS_INSTRUCTIONS, prepared_text):
+        return analyze_contract_chunked(client, prepared_text, contract_type, model, config, tokens_saved)
+    return request_analysis(client, prepared_text, contract_type, model, config.max_tokens, stream_listener, config.budget, tokens_saved)
+
+
+def merge_analysis_results(results):
+    """
+    Deterministically merges several analysis results into one with the same JSON shape.
+    Risk findings are deduplicated to one per `clause_category`, keeping the highest `risk_level`
+    (the earliest finding wins ties). For key terms, the first value that is not "Not Found" wins,
+    so results should be passed in order of precedence.
+    """
+    risks_by_category = {}
+    for result in results:
+        for risk in (result or {}).get('risk_analysis', []):
+            category = str(risk.get('clause_category', 'General')).strip()
+            key = category.lower()
+            current = risks_by_category.get(key)
+            if current is None or RISK_LEVEL_ORDER.get(risk.get('risk_level'), 0) > RISK_LEVEL_ORDER.get(current.get('risk_level'), 0):
+                risks_by_category[key] = {**risk, 'clause_category': category}
+
+    key_terms = {}
+    for result in results:
+        for term, value in (result or {}).get('key_terms', {}).items():
+            if term not in key_terms or (_is_not_found(key_terms[term]) and not _is_not_found(value)):
+                key_terms[term] = value
+
+    return {'risk_analysis': list(risks_by_category.values()), 'key_terms': key_terms}
+
+
+def overlay_analysis_result(delta_result, base_result):
+    """
+    Applies the analysis of re-analyzed sections on top of a reused analysis.
+    A finding in `delta_result` replaces the reused finding for its `clause_category` outright, even when it
+    lowers the risk; categories the delta does not mention keep their reused finding. Key terms found in the
+    delta win, and the reused value is kept where the delta reports "Not Found".
+    """
+    delta_categories = {str(risk.get('clause_category', 'General')).strip().lower()
+                        for risk in (delta_result or {}).get('risk_analysis', [])}
+    kept = [risk for risk in (base_result or {}).get('risk_analysis', [])
+            if str(risk.get('clause_category', 'General')).strip().lower() not in delta_categories]
+    return merge_analysis_results([delta_result, {**(base_result or {}), 'risk_analysis': kept}])
+
+
+def _is_not_found(value):
+    return value is None or str(value).strip().lower() in ("", "not found", "n/a")
+
+
+def analyze_contract(client, contract_text, contract_type, model=DEFAULT_MODEL, similarity_index=None, config=None, stream_listener=None):
+    """
+    Analyzes contract text, reusing the stored analysis of a near-duplicate contract when one is indexed.
+    On a match only the sections that differ from the matched contract are sent to the API, and their
+    findings replace the reused ones for the clause categories they cover. Returns (analysis_result, reuse_info), where
+    reuse_info is None when no prior contract was reused.
+    """
+    match = similarity_index.find_match(contract_type, contract_text) if similarity_index else None
+    if match is None:
+        return analyze_text(client, contract_text, contract_type, model, config, stream_listener), None
+
+    known_sections = set(match['section_hashes'])
+    sections = split_into_sections(contract_text)
+    changed = [section for section in sections if section_fingerprint(section) not in known_sections]
+    total_chars = sum(len(section) for section in sections) or 1
+    reuse_info = {
+        'matched_contract_id': match['contract_id'],
+        'similarity': round(match['similarity'], 3),
+        'threshold': similarity_index.threshold,
+        'sections_total': len(sections),
+        'sections_reanalyzed': len(changed),
+        'reused_fraction': round(1 - sum(len(section) for section in changed) / total_chars, 3),
+    }
+    if not changed:
+        return match['analysis_result'], reuse_info
+
+    delta_result = analyze_text(client, "\n\n".join(changed), contract_type, model, config, stream_listener)
+    return overlay_analysis_result(delta_result, match['analysis_result']), reuse_info
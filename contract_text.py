@@ -0,0 +1,140 @@
+# contract_text.py
+import hashlib
+import re
+from collections import defaultdict
+
+# Lines that open a new clause or section, e.g. "12. Liability", "12.3 Caps", "ARTICLE IV", "Schedule 2 - Pricing".
+SECTION_HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|ANNEX|Annex|EXHIBIT|Exhibit|APPENDIX|Appendix)\s+[\dIVXLC]+[A-Za-z]?\b"
+    r"|\d{1,3}(?:\.\d{1,3})*\.?\s+[A-Z]"
+    r")"
+)
+
+# Lines holding nothing but a page number, e.g. "12", "- 12 -", "Page 12", "Page 12 of 40", "12/40". Only lines
+# labelled "Page" are dropped wherever they occur; bare numbers must also run in sequence across pages.
+PAGE_NUMBER_PATTERN = re.compile(r"^(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(?:\s*(?:of|/)\s*\d{1,4})?$", re.IGNORECASE)
+_INLINE_WHITESPACE = re.compile(r"[ \t\f\v\u00a0]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_whitespace(text):
+    """Collapses runs of whitespace into single spaces."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def split_into_sections(text, max_chars=6000):
+    """
+    Splits contract text into clause/section-sized pieces on heading boundaries.
+    Sections longer than `max_chars` are further split on paragraph, then line boundaries;
+    text without recognizable headings is grouped into paragraphs of up to `max_chars`.
+    """
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if SECTION_HEADING_PATTERN.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+
+    pieces = []
+    for section in sections:
+        pieces.extend(_split_oversized(section, max_chars))
+    return [piece for piece in pieces if piece.strip()]
+
+
+def _split_oversized(section, max_chars):
+    if len(section) <= max_chars:
+        return [section]
+    separator = "\n\n" if "\n\n" in section else "\n"
+    parts = section.split(separator) if separator in section else [section[i:i + max_chars] for i in range(0, len(section), max_chars)]
+    pieces, current = [], ""
+    for part in parts:
+        if current and len(current) + len(separator) + len(part) > max_chars:
+            pieces.append(current)
+            current = ""
+        if len(part) > max_chars:
+            pieces.extend(_split_oversized(part, max_chars) if separator == "\n\n" else [part[i:i + max_chars] for i in range(0, len(part), max_chars)])
+            continue
+        current = f"{current}{separator}{part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def section_fingerprint(section):
+    """Returns a stable hash of a section's text, insensitive to case and whitespace."""
+    return hashlib.sha1(normalize_whitespace(section).lower().encode("utf-8")).hexdigest()
+
+
+def strip_page_boilerplate(text, min_repeats=3, min_gap_lines=10, max_line_chars=150):
+    """
+    Prepares extracted contract text for a prompt: squeezes whitespace within lines and runs of blank lines,
+    drops page-number lines, and keeps only the first occurrence of running headers and footers. A bare number
+    counts as a page number only when it continues an increasing sequence (see _page_number_lines), so numeric
+    table cells and quantities on lines of their own are kept. A line counts
+    as a running header/footer when it recurs at least `min_repeats` times at a roughly regular interval of
+    `min_gap_lines` or more (about once per page, unlike lines repeated within a clause or table); lines
+    mentioning "page" are compared without their digits, so "Page 3 of 40" footers match each other.
+    """
+    lines = [_INLINE_WHITESPACE.sub(" ", line).strip() for line in text.splitlines()]
+    positions = defaultdict(list)
+    for number, line in enumerate(lines):
+        if line and len(line) <= max_line_chars:
+            positions[_boilerplate_key(line)].append(number)
+    boilerplate = set()
+    for key, found in positions.items():
+        gaps = [b - a for a, b in zip(found, found[1:])]
+        if len(found) >= min_repeats and min(gaps) >= min_gap_lines and max(gaps) <= 2 * min(gaps):
+            boilerplate.add(key)
+
+    page_numbers = _page_number_lines(lines, min_repeats, min_gap_lines)
+    kept, seen = [], set()
+    for number, line in enumerate(lines):
+        if not line:
+            if kept and kept[-1]:
+                kept.append("")
+            continue
+        if number in page_numbers:
+            continue
+        key = _boilerplate_key(line) if len(line) <= max_line_chars else None
+        if key in boilerplate:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def _page_number_lines(lines, min_repeats, min_gap_lines):
+    """
+    Indexes of the page-number lines: every line labelled "Page", and bare numbers ("12", "- 12 -", "12/40")
+    that form a sequence n, n+1, n+2, ... of at least `min_repeats` lines spaced `min_gap_lines` or more apart.
+    """
+    found, waiting = set(), defaultdict(list)  # waiting: next page number -> sequences expecting it
+    sequences = []
+    for index, line in enumerate(lines):
+        if not line or not PAGE_NUMBER_PATTERN.match(line):
+            continue
+        if "page" in line.lower():
+            found.add(index)
+            continue
+        number = int(_DIGITS.search(line).group())
+        candidates = waiting[number]
+        # Continue the sequence whose previous number is closest, i.e. on the page before.
+        sequence = max((s for s in candidates if index - s[-1] >= min_gap_lines), key=lambda s: s[-1], default=None)
+        if sequence is None:
+            sequence = []
+            sequences.append(sequence)
+        else:
+            candidates.remove(sequence)
+        sequence.append(index)
+        waiting[number + 1].append(sequence)
+    found.update(index for sequence in sequences if len(sequence) >= min_repeats for index in sequence)
+    return found
+
+
+def _boilerplate_key(line):
+    return _DIGITS.sub("#", line) if "page" in line.lower() else line
@@ -2,147 +2,852 @@
 import psycopg2
 import pandas as pd
 import streamlit as st
+import io
+import csv
 import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from psycopg2.extras import Json, execute_values
 from datetime import datetime, timedelta
+from concurrent_reads import create_concurrent_reader_from_env
+from db_pool import create_pool_from_env, get_db_settings
+from metrics import METRICS
+from query_cache import CHANGE_CHANNEL, cached_query, create_query_cache_from_env
+
+# Tables whose changes are announced on CHANGE_CHANNEL, so cached reads from them are invalidated in every process.
+# Their triggers are created by the migrations (notify_change_trigger).
+CACHED_TABLES = ("companies", "contracts", "contract_key_terms", "kpi_summary", "partner_kpi_quarterly")
+
+RISK_LEVEL_ORDER = {"Low": 0, "Medium": 1, "High": 2}
+
+# Supporting indexes for foreign keys, the paginated contract listing and the expiring-contracts widget.
+INDEX_DEFINITIONS = [
+    "CREATE INDEX IF NOT EXISTS idx_contracts_company_id ON contracts (company_id, contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_expiration_date ON contracts (expiration_date) INCLUDE (contract_title);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_expiry_sort ON contracts ((COALESCE(expiration_date, DATE '9999-12-31')), contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_risk_score ON contracts (risk_score_display, contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_type ON contracts (contract_type, contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts (status, contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_title ON contracts (contract_title, contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_contract_key_terms_contract_id ON contract_key_terms (contract_id);",
+    "CREATE INDEX IF NOT EXISTS idx_tco_analyses_company_id ON tco_analyses (company_id);",
+    "CREATE INDEX IF NOT EXISTS idx_partners_company_id ON partners (company_id);",
+    "CREATE INDEX IF NOT EXISTS idx_partner_performance_partner_id ON partner_performance (partner_id);",
+    "CREATE INDEX IF NOT EXISTS idx_rfx_documents_company_id ON rfx_documents (company_id);",
+    "CREATE INDEX IF NOT EXISTS idx_rfx_requirements_rfx_id ON rfx_requirements (rfx_id);",
+]
+
+# Sort options of the contract listing: (sort key expression, direction). Every key is paired with
+# contract_id as a tie-breaker, so (key, contract_id) identifies a row for keyset pagination.
+CONTRACT_SORTS = {
+    "Newest first": ("c.contract_id", "DESC"),
+    "Oldest first": ("c.contract_id", "ASC"),
+    "Expiry date (soonest first)": ("COALESCE(c.expiration_date, DATE '9999-12-31')", "ASC"),
+    "Expiry date (latest first)": ("COALESCE(c.expiration_date, DATE '9999-12-31')", "DESC"),
+    "Title (A-Z)": ("c.contract_title", "ASC"),
+}
+CONTRACT_LIST_COLUMNS = ['ID', 'Contract Title', 'Counterparty', 'Type', 'Status', 'Expiry Date', 'Risk Score']
+
+# Full-text search over contracts: title (weight A), key terms (B) and the extracted text (C).
+# Generated columns keep the vectors current on every insert and update without triggers.
+# Characters of a contract's text that go into its search vector. Postgres limits a tsvector to 1 MB, and an
+# oversized value would fail the contract's INSERT; 200,000 characters stay far below it even for varied text.
+SEARCH_VECTOR_TEXT_CHARS = 200_000
+
+SEARCH_SCHEMA = [
+    "ALTER TABLE contracts ADD COLUMN IF NOT EXISTS contract_text TEXT, ADD COLUMN IF NOT EXISTS key_terms_text TEXT;",
+    "ALTER TABLE contracts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(contract_title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(key_terms_text, '')), 'B') || "
+    "setweight(to_tsvector('english', left(coalesce(contract_text, ''), 1000000)), 'C')) STORED;",
+    "CREATE INDEX IF NOT EXISTS idx_contracts_search_vector ON contracts USING GIN (search_vector);",
+    "ALTER TABLE contract_key_terms ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('english', coalesce(term_name, '') || ' ' || coalesce(term_value, ''))) STORED;",
+    "CREATE INDEX IF NOT EXISTS idx_contract_key_terms_search_vector ON contract_key_terms USING GIN (search_vector);",
+    # Trigram index for fuzzy term values, where the pg_trgm extension is installed and may be created.
+    "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN "
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+    "CREATE INDEX IF NOT EXISTS idx_contract_key_terms_value_trgm ON contract_key_terms USING GIN (term_value gin_trgm_ops); "
+    "END IF; EXCEPTION WHEN insufficient_privilege THEN RAISE NOTICE 'pg_trgm unavailable, fuzzy term search falls back to ILIKE'; END $$;",
+]
+# RFx ingestion: document order, source references and the assessment of every requirement.
+RFX_SCHEMA = [
+    "ALTER TABLE rfx_documents ADD COLUMN IF NOT EXISTS source_name TEXT, ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT NOW();",
+    "ALTER TABLE rfx_requirements ADD COLUMN IF NOT EXISTS position INTEGER, ADD COLUMN IF NOT EXISTS requirement_ref VARCHAR(50), "
+    "ADD COLUMN IF NOT EXISTS section VARCHAR(255), ADD COLUMN IF NOT EXISTS category VARCHAR(50), ADD COLUMN IF NOT EXISTS rationale TEXT, "
+    "ADD COLUMN IF NOT EXISTS assessed_by VARCHAR(10);",
+    "CREATE INDEX IF NOT EXISTS idx_rfx_requirements_rfx_position ON rfx_requirements (rfx_id, position);",
+]
+RFX_REQUIREMENT_COLUMNS = ("rfx_id", "position", "requirement_ref", "section", "requirement_text", "risk_level", "category", "rationale", "assessed_by")
+# Partner KPIs: numeric, dated facts in yearly partitions, plus monthly and quarterly rollups. Rollups keep
+# sums and counts, so averages and attainment (actual / target) can be derived from them without the facts.
+# Bulk loads refresh the rollup rows of the periods they touched (see save_partner_kpis).
+PARTNER_KPI_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kpi_definitions (kpi_id SERIAL PRIMARY KEY, kpi_name VARCHAR(100) NOT NULL UNIQUE, unit VARCHAR(20), "
+    "aggregation VARCHAR(10) NOT NULL DEFAULT 'sum' CHECK (aggregation IN ('sum', 'avg')), higher_is_better BOOLEAN NOT NULL DEFAULT TRUE);",
+    "CREATE TABLE IF NOT EXISTS partner_kpi_facts (partner_id INTEGER NOT NULL REFERENCES partners(partner_id), "
+    "kpi_id INTEGER NOT NULL REFERENCES kpi_definitions(kpi_id), period_date DATE NOT NULL, actual_value NUMERIC(18, 4) NOT NULL, "
+    "target_value NUMERIC(18, 4), loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), PRIMARY KEY (partner_id, kpi_id, period_date)) "
+    "PARTITION BY RANGE (period_date);",
+    *(f"CREATE TABLE IF NOT EXISTS partner_kpi_{grain} (partner_id INTEGER NOT NULL, kpi_id INTEGER NOT NULL, period_start DATE NOT NULL, "
+      "actual_sum NUMERIC(20, 4) NOT NULL, fact_count INTEGER NOT NULL, target_sum NUMERIC(20, 4), target_count INTEGER NOT NULL, "
+      "targeted_actual_sum NUMERIC(20, 4), PRIMARY KEY (partner_id, kpi_id, period_start));" for grain in ("monthly", "quarterly")),
+    "CREATE INDEX IF NOT EXISTS idx_partner_kpi_quarterly_period ON partner_kpi_quarterly (period_start, kpi_id);",
+    "INSERT INTO kpi_definitions (kpi_name, unit, aggregation, higher_is_better) VALUES "
+    "('Revenue (EUR)', 'EUR', 'sum', TRUE), ('Gross Margin (EUR)', 'EUR', 'sum', TRUE), ('Deals Won', 'deals', 'sum', TRUE), "
+    "('Deals Lost', 'deals', 'sum', FALSE), ('New Customers', 'customers', 'sum', TRUE), ('Pipeline Value (EUR)', 'EUR', 'avg', TRUE), "
+    "('Certified Engineers', 'engineers', 'avg', TRUE), ('Customer Satisfaction (%%)', '%%', 'avg', TRUE), ('Renewal Rate (%%)', '%%', 'avg', TRUE) "
+    "ON CONFLICT (kpi_name) DO NOTHING;",
+]
+KPI_ROLLUP_GRAINS = {"Monthly": "partner_kpi_monthly", "Quarterly": "partner_kpi_quarterly"}
+ROLLUP_UPDATE = ("ON CONFLICT (partner_id, kpi_id, period_start) DO UPDATE SET actual_sum = EXCLUDED.actual_sum, fact_count = EXCLUDED.fact_count, "
+                 "target_sum = EXCLUDED.target_sum, target_count = EXCLUDED.target_count, targeted_actual_sum = EXCLUDED.targeted_actual_sum;")
+# A KPI's value in a period: the sum for additive KPIs, the mean of its facts for snapshots like headcounts or rates.
+KPI_ACTUAL = "CASE WHEN d.aggregation = 'avg' THEN r.actual_sum / r.fact_count ELSE r.actual_sum END"
+KPI_TARGET = "CASE WHEN d.aggregation = 'avg' THEN r.target_sum / NULLIF(r.target_count, 0) ELSE r.target_sum END"
+# Attainment of one KPI (NULL without a target), capped at 200% so a single runaway KPI cannot dominate a partner's average.
+KPI_ATTAINMENT = ("CASE WHEN d.higher_is_better AND r.target_sum > 0 THEN LEAST(r.targeted_actual_sum / r.target_sum, 2) "
+                  "WHEN NOT d.higher_is_better AND r.targeted_actual_sum > 0 THEN LEAST(r.target_sum / r.targeted_actual_sum, 2) "
+                  "WHEN NOT d.higher_is_better AND r.target_sum IS NOT NULL THEN 2 END")
+PARTNER_PORTFOLIO_SORTS = {
+    "Attainment": "cur.attainment DESC",
+    "Trend": "cur.attainment - prev.attainment DESC NULLS LAST",
+}
+# The original schema. Later tables and columns are added by the migrations below, never by editing this list.
+BASE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS companies (company_id SERIAL PRIMARY KEY, company_name VARCHAR(255) NOT NULL UNIQUE, type VARCHAR(50));",
+    "CREATE TABLE IF NOT EXISTS contracts (contract_id SERIAL PRIMARY KEY, company_id INTEGER REFERENCES companies(company_id), contract_title VARCHAR(255) NOT NULL, contract_type VARCHAR(50), status VARCHAR(50), expiration_date DATE, risk_score_display VARCHAR(50));",
+    "CREATE TABLE IF NOT EXISTS contract_key_terms (term_id SERIAL PRIMARY KEY, contract_id INTEGER REFERENCES contracts(contract_id), term_name VARCHAR(100), term_value TEXT);",
+    "CREATE TABLE IF NOT EXISTS tco_analyses (tco_id SERIAL PRIMARY KEY, analysis_name VARCHAR(255), company_id INTEGER REFERENCES companies(company_id), total_cost_5_year NUMERIC(15, 2));",
+    "CREATE TABLE IF NOT EXISTS partners (partner_id SERIAL PRIMARY KEY, company_id INTEGER REFERENCES companies(company_id));",
+    "CREATE TABLE IF NOT EXISTS partner_performance (perf_id SERIAL PRIMARY KEY, partner_id INTEGER REFERENCES partners(partner_id), kpi_name VARCHAR(100), kpi_value VARCHAR(100), target_value VARCHAR(100));",
+    "CREATE TABLE IF NOT EXISTS rfx_documents (rfx_id SERIAL PRIMARY KEY, rfx_title VARCHAR(255), company_id INTEGER REFERENCES companies(company_id), status VARCHAR(50));",
+    "CREATE TABLE IF NOT EXISTS rfx_requirements (req_id SERIAL PRIMARY KEY, rfx_id INTEGER REFERENCES rfx_documents(rfx_id), requirement_text TEXT, risk_level VARCHAR(50));",
+    "CREATE TABLE IF NOT EXISTS kpi_summary (id SERIAL PRIMARY KEY, kpi_name VARCHAR(100) UNIQUE NOT NULL, kpi_value NUMERIC(10, 2), kpi_change NUMERIC(10, 2));",
+]
+# Every application table, for reset_schema. Partitions of partner_kpi_facts are dropped with it.
+APPLICATION_TABLES = ("schema_migrations", "contract_key_terms", "rfx_requirements", "partner_performance", "contracts", "partners", "rfx_documents",
+                      "companies", "tco_analyses", "kpi_summary", "contract_analysis_cache", "contract_fingerprints", "contract_lsh_buckets",
+                      "ingestion_batches", "ingestion_documents", "analysis_jobs", "job_workers", "tco_recommendations", "partner_kpi_facts",
+                      "partner_kpi_monthly", "partner_kpi_quarterly", "kpi_definitions")
+# Serializes migrations between processes starting at the same time (pg_advisory_lock key).
+MIGRATION_LOCK_ID = 4_207_311
+
+
+def notify_change_trigger(table):
+    """Statement that announces every write to `table` on CHANGE_CHANNEL, for the query caches of all processes."""
+    return (f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_{table}_notify_change') THEN "
+            f"CREATE TRIGGER trg_{table}_notify_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} FOR EACH STATEMENT "
+            "EXECUTE FUNCTION notify_table_change(); END IF; END $$;")
+
+
+# Schema migrations: (version, description, steps), applied in order and recorded in schema_migrations.
+# A step is an SQL statement or a callable(db, uow). Steps are idempotent, so databases created before
+# versioning simply record every version on their first run. Append new versions; never edit applied ones.
+MIGRATIONS = [
+    (1, "Original schema", BASE_SCHEMA),
+    (2, "AI analysis cache and near-duplicate index", [
+        "CREATE TABLE IF NOT EXISTS contract_analysis_cache (cache_key CHAR(64) PRIMARY KEY, document_hash CHAR(64) NOT NULL, contract_type VARCHAR(50), prompt_version VARCHAR(32), model_name VARCHAR(100), analysis_result JSONB NOT NULL, size_bytes INTEGER NOT NULL, hit_count INTEGER NOT NULL DEFAULT 0, created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), last_hit_at TIMESTAMPTZ NOT NULL DEFAULT NOW());",
+        "CREATE INDEX IF NOT EXISTS idx_contract_analysis_cache_last_hit ON contract_analysis_cache (last_hit_at);",
+        "CREATE TABLE IF NOT EXISTS contract_fingerprints (contract_id INTEGER PRIMARY KEY REFERENCES contracts(contract_id) ON DELETE CASCADE, contract_type VARCHAR(50), minhash BIGINT[] NOT NULL, section_hashes TEXT[] NOT NULL, analysis_result JSONB NOT NULL, indexed_at TIMESTAMPTZ NOT NULL DEFAULT NOW());",
+        "CREATE TABLE IF NOT EXISTS contract_lsh_buckets (band SMALLINT NOT NULL, bucket BIGINT NOT NULL, contract_id INTEGER NOT NULL REFERENCES contract_fingerprints(contract_id) ON DELETE CASCADE, PRIMARY KEY (band, bucket, contract_id));",
+    ]),
+    (3, "Batch ingestion", [
+        "CREATE TABLE IF NOT EXISTS ingestion_batches (batch_id SERIAL PRIMARY KEY, source TEXT NOT NULL, contract_type VARCHAR(50), status VARCHAR(30) NOT NULL DEFAULT 'running', created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), finished_at TIMESTAMPTZ);",
+        "CREATE TABLE IF NOT EXISTS ingestion_documents (document_id SERIAL PRIMARY KEY, batch_id INTEGER NOT NULL REFERENCES ingestion_batches(batch_id) ON DELETE CASCADE, source_path TEXT NOT NULL, document_hash CHAR(64), status VARCHAR(20) NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, contract_id INTEGER REFERENCES contracts(contract_id), updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), UNIQUE (batch_id, source_path));",
+        "CREATE INDEX IF NOT EXISTS idx_ingestion_documents_batch_status ON ingestion_documents (batch_id, status);",
+    ]),
+    (4, "Background job queue", [
+        "CREATE TABLE IF NOT EXISTS analysis_jobs (job_id BIGSERIAL PRIMARY KEY, job_type VARCHAR(30) NOT NULL, status VARCHAR(20) NOT NULL DEFAULT 'queued', payload JSONB NOT NULL, document BYTEA, result JSONB, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL DEFAULT 3, worker_id VARCHAR(100), run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(), created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), started_at TIMESTAMPTZ, heartbeat_at TIMESTAMPTZ, finished_at TIMESTAMPTZ);",
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_queued ON analysis_jobs (job_id) WHERE status = 'queued';",
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_running ON analysis_jobs (worker_id) WHERE status = 'running';",
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_finished_at ON analysis_jobs (finished_at);",
+        "CREATE TABLE IF NOT EXISTS job_workers (worker_id VARCHAR(100) PRIMARY KEY, hostname VARCHAR(255), pid INTEGER, threads INTEGER NOT NULL, busy_seconds DOUBLE PRECISION NOT NULL DEFAULT 0, jobs_processed INTEGER NOT NULL DEFAULT 0, started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), last_heartbeat TIMESTAMPTZ NOT NULL DEFAULT NOW());",
+        "CREATE TABLE IF NOT EXISTS tco_recommendations (recommendation_id SERIAL PRIMARY KEY, company_name VARCHAR(255), segment VARCHAR(50), tco_components TEXT, total_tco NUMERIC(15, 2), recommendation JSONB NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT NOW());",
+    ]),
+    (5, "Change notifications for the query cache", [
+        f"CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$ BEGIN PERFORM pg_notify('{CHANGE_CHANNEL}', TG_TABLE_NAME); RETURN NULL; END; $$ LANGUAGE plpgsql;",
+        *(notify_change_trigger(table) for table in ("companies", "contracts", "contract_key_terms", "kpi_summary")),
+    ]),
+    (6, "Contract listing indexes", INDEX_DEFINITIONS),
+    (7, "TCO scenario results", [
+        "ALTER TABLE tco_analyses ADD COLUMN IF NOT EXISTS method VARCHAR(20), ADD COLUMN IF NOT EXISTS scenarios INTEGER, "
+        "ADD COLUMN IF NOT EXISTS total_tco_p50 NUMERIC(15, 2), ADD COLUMN IF NOT EXISTS npv_p50 NUMERIC(15, 2), "
+        "ADD COLUMN IF NOT EXISTS result JSONB, ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT NOW();",
+    ]),
+    (8, "Contract full-text search", SEARCH_SCHEMA),
+    (9, "RFx requirement assessment", RFX_SCHEMA),
+    (10, "Partner KPI store", [*PARTNER_KPI_SCHEMA, notify_change_trigger("partner_kpi_quarterly")]),
+    (11, "Sample data", [lambda db, uow: db._insert_sample_data(uow)]),
+    (12, "Extracted text in the analysis cache", [
+        "ALTER TABLE contract_analysis_cache ADD COLUMN IF NOT EXISTS contract_text TEXT;",
+    ]),
+    (13, "Bounded contract search vectors", [
+        "ALTER TABLE contracts DROP COLUMN IF EXISTS search_vector;",
+        "ALTER TABLE contracts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(contract_title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(key_terms_text, '')), 'B') || "
+        f"setweight(to_tsvector('english', left(coalesce(contract_text, ''), {SEARCH_VECTOR_TEXT_CHARS})), 'C')) STORED;",
+        "CREATE INDEX IF NOT EXISTS idx_contracts_search_vector ON contracts USING GIN (search_vector);",
+    ]),
+]
+# Databases (host, port, name) this process has already migrated; initialize_database skips them.
+_migrated_databases = set()
+_migration_lock = threading.Lock()
+SEARCH_HEADLINE_OPTIONS = "MaxFragments=2, MinWords=6, MaxWords=18, FragmentDelimiter=' … ', StartSel=**, StopSel=**"
+
+
+def build_prefix_tsquery(text):
+    """Turns free text into a tsquery that matches documents containing every word as a prefix ('german' finds 'Germany')."""
+    words = re.findall(r"\w+", text)
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def key_terms_text(analysis_result):
+    return "; ".join(f"{term}: {value}" for term, value in (analysis_result or {}).get('key_terms', {}).items())
+
+
+def company_name_from_title(title):
+    """Derives the counterparty from a contract title like 'MSA with FutureNet Mobile'."""
+    return title.split(" with ")[-1] if " with " in title else "Unknown Company"
+
+
+def overall_risk_score(analysis_result):
+    """The highest risk level found in an analysis, 'Low' when there are no findings."""
+    risks = [risk.get('risk_level', 'Low') for risk in (analysis_result or {}).get('risk_analysis', [])]
+    return max(risks, key=lambda level: RISK_LEVEL_ORDER.get(level, 0), default="Low")
+
+
+# Keywords that make a statement unsafe to repeat after its connection dropped (see is_read_only_statement).
+_WRITE_KEYWORDS = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE|COPY|CREATE|ALTER|DROP|TRUNCATE|NEXTVAL|SETVAL|PG_NOTIFY|PG_ADVISORY_\w+|FOR\s+UPDATE)\b",
+                             re.IGNORECASE)
+
+
+def is_read_only_statement(query):
+    """Whether a statement only reads, so running it again after a dropped connection cannot apply anything twice."""
+    return query.lstrip().upper().startswith(("SELECT", "WITH")) and not _WRITE_KEYWORDS.search(query)
+
+
+def run_statement(cursor, query, params=None, fetch=None):
+    """Executes one statement on `cursor` and fetches its result, recording its latency (metrics.METRICS)."""
+    started = time.perf_counter()
+    failed = True
+    try:
+        cursor.execute(query, params or ())
+        result = cursor.fetchone() if fetch == 'one' else cursor.fetchall() if fetch == 'all' else None
+        failed = False
+        return result
+    finally:
+        if METRICS.enabled:
+            METRICS.observe_query(query, time.perf_counter() - started, failed)
+
+
+class UnitOfWork:
+    """
+    Groups several statements into one transaction on a single pooled connection.
+    Obtained from `DatabaseManager.transaction()`; nothing is visible to other sessions until it commits.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=None, fetch=None):
+        return run_statement(self.cursor, query, params, fetch)
+
+    def insert_many(self, query, rows, template=None, fetch=False):
+        """Runs a multi-row INSERT ('... VALUES %s') for all rows, in pages of 1000 rows per statement."""
+        started = time.perf_counter()
+        result = execute_values(self.cursor, query, rows, template=template, page_size=1000, fetch=fetch)
+        METRICS.observe_query(query, time.perf_counter() - started)
+        return result
+
+    def copy_rows(self, table, columns, rows):
+        """Streams rows into a table with COPY, the fastest path for large batches."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if value is None else value for value in row])
+        buffer.seek(0)
+        started = time.perf_counter()
+        self.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        METRICS.observe_query(f"COPY {table} ({', '.join(columns)}) FROM STDIN", time.perf_counter() - started)
 
 class DatabaseManager:
     """
     Manages all database operations for the Commercial Manager Assistant application.
     """
     def __init__(self):
-        """Initializes the connection to the PostgreSQL database."""
-        self.connection = None
+        """Creates the connection pool for the PostgreSQL database (configured via DB_* environment variables)."""
+        self.pool = None
+        self._query_errors = threading.local()
         try:
-            self.connection = psycopg2.connect(
-                host="localhost",
-                database="portfolio_db",
-                user="abdulkerimhasturk", # Your macOS username
-                password=""
-            )
+            self.pool = create_pool_from_env()
         except psycopg2.OperationalError as e:
             st.error(f"🔴 DB Connection Error: {e}. Is PostgreSQL running?")
             st.stop()
+        self.query_cache = create_query_cache_from_env(get_db_settings())
+        self.reader = create_concurrent_reader_from_env(self.pool.max_size)
 
     def execute_query(self, query, params=None, fetch=None):
-        """A generic method to execute database queries safely with manual commits."""
+        """
+        A generic method to execute a single query on a pooled connection; commits on success, rolls back on error.
+        Reads whose connection was dropped by the server are retried once on a fresh connection; writes are
+        never repeated, but run on a connection that was health-checked at checkout.
+        """
+        def work(conn):
+            with conn.cursor() as cursor:
+                return run_statement(cursor, query, params, fetch)
         try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(query, params or ())
-                self.connection.commit()
-                if fetch == 'one':
-                    return cursor.fetchone()
-                if fetch == 'all':
-                    return cursor.fetchall()
+            return self.pool.run(work, idempotent=is_read_only_statement(query))
         except Exception as e:
-            self.connection.rollback()
+            self._query_errors.count = getattr(self._query_errors, 'count', 0) + 1
             # Do not show duplicate errors if it's about tables not existing during setup
             if "relation" not in str(e) and "does not exist" not in str(e):
                  st.error(f"DB Query Error: {e}")
             return None
 
+    @contextmanager
+    def transaction(self):
+        """Yields a UnitOfWork whose statements commit together on success and roll back together on error."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                yield UnitOfWork(cursor)
+
+    def fetch_page_data(self, datasets):
+        """
+        Loads a page's datasets concurrently over separate pooled connections, e.g.
+        db.fetch_page_data({"expiring": db.get_expiring_contracts, "kpis": db.get_kpi_summary}).
+        Returns a PageData dict of results that also carries per-dataset and total timings.
+        """
+        return self.reader.fetch(datasets, self.query_cache)
+
+    def invalidate_cache(self, *tables):
+        """Drops this process' cached reads of the given tables right away; other processes follow via NOTIFY."""
+        if self.query_cache:
+            self.query_cache.invalidate(*(tables or CACHED_TABLES))
+
+    def query_cache_stats(self):
+        return self.query_cache.stats() if self.query_cache else None
+
+    def pool_stats(self):
+        """Returns connection pool usage (in use, idle, waiting, wait times) for monitoring."""
+        return self.pool.stats()
+
     def initialize_database(self):
-        """Creates all tables and inserts sample data if the database is empty."""
-        check_table_query = "SELECT EXISTS (SELECT FROM pg_tables WHERE schemaname = 'public' AND tablename  = 'companies');"
-        cursor = self.connection.cursor()
-        cursor.execute(check_table_query)
-        table_exists = cursor.fetchone()[0]
-        cursor.close()
-        
-        if not table_exists:
-            self.create_all_tables()
-            self.insert_sample_data()
-
-    def create_all_tables(self):
-        """Creates a comprehensive, unified schema to support all four project modules."""
-        queries = [
-            "DROP TABLE IF EXISTS contract_key_terms, rfx_requirements, partner_performance, contracts, partners, rfx_documents, companies, tco_analyses, kpi_summary CASCADE;",
-            """CREATE TABLE companies (company_id SERIAL PRIMARY KEY, company_name VARCHAR(255) NOT NULL UNIQUE, type VARCHAR(50));""",
-            """CREATE TABLE contracts (contract_id SERIAL PRIMARY KEY, company_id INTEGER REFERENCES companies(company_id), contract_title VARCHAR(255) NOT NULL, contract_type VARCHAR(50), status VARCHAR(50), expiration_date DATE, risk_score_display VARCHAR(50));""",
-            """CREATE TABLE contract_key_terms (term_id SERIAL PRIMARY KEY, contract_id INTEGER REFERENCES contracts(contract_id), term_name VARCHAR(100), term_value TEXT);""",
-            """CREATE TABLE tco_analyses (tco_id SERIAL PRIMARY KEY, analysis_name VARCHAR(255), company_id INTEGER REFERENCES companies(company_id), total_cost_5_year NUMERIC(15, 2));""",
-            """CREATE TABLE partners (partner_id SERIAL PRIMARY KEY, company_id INTEGER REFERENCES companies(company_id));""",
-            """CREATE TABLE partner_performance (perf_id SERIAL PRIMARY KEY, partner_id INTEGER REFERENCES partners(partner_id), kpi_name VARCHAR(100), kpi_value VARCHAR(100), target_value VARCHAR(100));""",
-            """CREATE TABLE rfx_documents (rfx_id SERIAL PRIMARY KEY, rfx_title VARCHAR(255), company_id INTEGER REFERENCES companies(company_id), status VARCHAR(50));""",
-            """CREATE TABLE rfx_requirements (req_id SERIAL PRIMARY KEY, rfx_id INTEGER REFERENCES rfx_documents(rfx_id), requirement_text TEXT, risk_level VARCHAR(50));""",
-            
-            # --- THIS IS THE MISSING TABLE THAT CAUSED THE ERROR ---
-            """CREATE TABLE kpi_summary (id SERIAL PRIMARY KEY, kpi_name VARCHAR(100) UNIQUE NOT NULL, kpi_value NUMERIC(10, 2), kpi_change NUMERIC(10, 2));"""
-        ]
-        for query in queries:
-            self.execute_query(query)
-
-    def insert_sample_data(self):
-        """Populates the database with sample data."""
-        self.execute_query("INSERT INTO companies (company_name, type) VALUES ('InnovateTel GmbH', 'Partner'), ('FutureNet Mobile', 'Client'), ('Global Telco Inc.', 'Prospect');")
+        """
+        Brings the schema up to date (see migrate), once per process and database: later calls return
+        without a query, so every session and every CLI can call it on startup.
+        """
+        key = tuple(get_db_settings()[name] for name in ("host", "port", "database"))
+        if key in _migrated_databases:
+            return
+        with _migration_lock:
+            if key in _migrated_databases:
+                return
+            try:
+                applied = self.migrate()
+            except Exception as e:
+                st.error(f"🔴 Schema migration failed: {e}")
+                return
+            _migrated_databases.add(key)
+        if applied:
+            self.invalidate_cache()
+
+    def migrate(self):
+        """
+        Applies the MIGRATIONS this database has not recorded yet, each in its own transaction, and returns
+        their versions. An advisory lock makes processes that start together apply them exactly once.
+        """
+        applied = []
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                uow = UnitOfWork(cursor)
+                uow.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+                try:
+                    uow.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+                                "applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW());")
+                    conn.commit()
+                    done = {row[0] for row in uow.execute("SELECT version FROM schema_migrations;", fetch='all')}
+                    for version, description, steps in MIGRATIONS:
+                        if version in done:
+                            continue
+                        for step in steps:
+                            if callable(step):
+                                step(self, uow)
+                            else:
+                                uow.execute(step)
+                        uow.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s);", (version, description))
+                        conn.commit()
+                        applied.append(version)
+                finally:
+                    conn.rollback()
+                    uow.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+        return applied
+
+    def reset_schema(self):
+        """Drops every application table and migrates the empty database back to the current schema. Deletes ALL data."""
+        self.execute_query(f"DROP TABLE IF EXISTS {', '.join(APPLICATION_TABLES)} CASCADE;")
+        _migrated_databases.clear()
+        self.initialize_database()
+
+    def _insert_sample_data(self, uow):
+        """Populates an empty database with sample data; a database that already holds companies is left alone."""
+        if uow.execute("SELECT EXISTS (SELECT 1 FROM companies);", fetch='one')[0]:
+            return
+        company_ids = dict(uow.execute(
+            "INSERT INTO companies (company_name, type) VALUES ('InnovateTel GmbH', 'Partner'), ('FutureNet Mobile', 'Client'), ('Global Telco Inc.', 'Prospect') "
+            "RETURNING company_name, company_id;", fetch='all'))
+        partner, client = company_ids['InnovateTel GmbH'], company_ids['FutureNet Mobile']
         today = datetime.now().date()
-        self.execute_query("INSERT INTO contracts (company_id, contract_title, contract_type, status, expiration_date, risk_score_display) VALUES (1, 'Reseller - InnovateTel', 'Reseller Agreement', 'Active', %s, 'Medium');", (today + timedelta(days=250),))
-        self.execute_query("INSERT INTO contracts (company_id, contract_title, contract_type, status, expiration_date, risk_score_display) VALUES (2, 'MSA - FutureNet', 'Service Agreement (MSA)', 'Active', %s, 'High');", (today + timedelta(days=80),))
-        self.execute_query("INSERT INTO partners (company_id) VALUES (1);")
-        self.execute_query("INSERT INTO rfx_documents (rfx_title, company_id, status) VALUES ('FutureNet VoNR RFP', 2, 'In Progress');")
-        
-        # Insert sample KPIs for the dashboard
-        self.execute_query("INSERT INTO kpi_summary (kpi_name, kpi_value, kpi_change) VALUES ('win_rate', 72.5, 5.2), ('avg_margin', 28.3, -1.5);")
-
-    def save_contract_and_analysis(self, title, contract_type, analysis_result):
-        """Saves a new contract and its extracted key terms to the database."""
-        company_name = title.split(" with ")[-1].replace("'", "''") if " with " in title else "Unknown Company"
-        company_id_result = self.execute_query("SELECT company_id FROM companies WHERE company_name = %s", (company_name,), fetch='one')
-        if company_id_result:
-            company_id = company_id_result[0]
-        else:
-            company_id = self.execute_query("INSERT INTO companies (company_name, type) VALUES (%s, 'Client') RETURNING company_id;", (company_name,), fetch='one')[0]
-
-        risk_score = "Low"
-        if analysis_result and 'risk_analysis' in analysis_result:
-            risks = [risk.get('risk_level', 'Low') for risk in analysis_result['risk_analysis']]
-            if "High" in risks: risk_score = "High"
-            elif "Medium" in risks: risk_score = "Medium"
-
-        contract_id = self.execute_query(
-            "INSERT INTO contracts (company_id, contract_title, contract_type, status, risk_score_display) VALUES (%s, %s, %s, 'Active', %s) RETURNING contract_id;",
-            (company_id, title, contract_type, risk_score), fetch='one'
-        )[0]
-
-        key_terms = analysis_result.get('key_terms', {})
-        for term, value in key_terms.items():
-            self.execute_query(
-                "INSERT INTO contract_key_terms (contract_id, term_name, term_value) VALUES (%s, %s, %s);",
-                (contract_id, term, str(value))
-            )
-        return contract_id
+        uow.execute(
+            "INSERT INTO contracts (company_id, contract_title, contract_type, status, expiration_date, risk_score_display) VALUES "
+            "(%s, 'Reseller - InnovateTel', 'Reseller Agreement', 'Active', %s, 'Medium'), (%s, 'MSA - FutureNet', 'Service Agreement (MSA)', 'Active', %s, 'High');",
+            (partner, today + timedelta(days=250), client, today + timedelta(days=80)))
+        uow.execute("INSERT INTO partners (company_id) VALUES (%s);", (partner,))
+        uow.execute("INSERT INTO rfx_documents (rfx_title, company_id, status) VALUES ('FutureNet VoNR RFP', %s, 'In Progress');", (client,))
+
+        # A year of monthly KPIs for the sample partner; the dashboard's win rate and margin are derived from them.
+        month = today.replace(day=1)
+        facts = []
+        for i in range(12):
+            month = (month - timedelta(days=1)).replace(day=1)
+            facts += [("InnovateTel GmbH", "Revenue (EUR)", month, 80_000 + 2_500 * (12 - i), 95_000),
+                      ("InnovateTel GmbH", "Gross Margin (EUR)", month, 22_000 + 800 * (12 - i), None),
+                      ("InnovateTel GmbH", "Deals Won", month, 3 + (12 - i) % 3, 4),
+                      ("InnovateTel GmbH", "Deals Lost", month, 2 - (12 - i) % 2, None),
+                      ("InnovateTel GmbH", "Certified Engineers", month, 6 + (12 - i) // 4, 8),
+                      ("InnovateTel GmbH", "Customer Satisfaction (%)", month, 84 + (12 - i) % 5, 90)]
+        # Migrations already run under the migration lock, so the partitions are created in the same transaction.
+        self._create_kpi_partitions(uow, {fact[2].year for fact in facts})
+        self._load_partner_kpis(uow, facts)
 
+    def _upsert_companies(self, uow, company_names, company_type="Client"):
+        """Returns {company_name: company_id}, creating missing companies (as clients by default) in one statement."""
+        # DO NOTHING leaves existing rows untouched, so repeated saves write no new company tuples; all ids are read back after.
+        names = sorted(set(company_names))
+        uow.insert_many("INSERT INTO companies (company_name, type) VALUES %s ON CONFLICT (company_name) DO NOTHING;",
+                        [(name, company_type) for name in names])
+        return dict(uow.execute("SELECT company_name, company_id FROM companies WHERE company_name = ANY(%s);", (names,), fetch='all'))
+
+    def save_contract_and_analysis(self, title, contract_type, analysis_result, contract_text=None, on_saved=None):
+        """
+        Saves a new contract, its extracted text and its key terms to the database in a single transaction.
+        `on_saved(uow, contract_id)` runs in the same transaction; if it raises, nothing is saved.
+        """
+        contract_ids = self.save_contracts_bulk([(title, contract_type, analysis_result, contract_text)],
+                                                on_saved=(lambda uow, ids: on_saved(uow, ids[0])) if on_saved else None)
+        return contract_ids[0] if contract_ids else None
+
+    def save_contracts_bulk(self, contracts, use_copy=None, on_saved=None):
+        """
+        Saves many analyzed contracts, given as (title, contract_type, analysis_result[, contract_text]) tuples, in one transaction.
+        Contract ids are reserved up front so key terms can be written with one multi-row insert, or with COPY
+        for large batches. `on_saved(uow, contract_ids)` runs before the commit. Returns the new contract ids
+        in input order, or None if nothing was saved.
+        """
+        if not contracts:
+            return []
+        contracts = [tuple(contract) + (None,) * (4 - len(contract)) for contract in contracts]
+        try:
+            with self.transaction() as uow:
+                company_ids = self._upsert_companies(uow, [company_name_from_title(title) for title, _, _, _ in contracts])
+                contract_ids = [row[0] for row in uow.execute(
+                    "SELECT nextval(pg_get_serial_sequence('contracts', 'contract_id')) FROM generate_series(1, %s);",
+                    (len(contracts),), fetch='all'
+                )]
+                uow.insert_many(
+                    "INSERT INTO contracts (contract_id, company_id, contract_title, contract_type, status, risk_score_display, contract_text, key_terms_text) VALUES %s;",
+                    [(contract_id, company_ids[company_name_from_title(title)], title, contract_type, overall_risk_score(analysis_result),
+                      contract_text, key_terms_text(analysis_result))
+                     for contract_id, (title, contract_type, analysis_result, contract_text) in zip(contract_ids, contracts)],
+                    template="(%s, %s, %s, %s, 'Active', %s, %s, %s)"
+                )
+                key_terms = [(contract_id, term, str(value))
+                             for contract_id, (_, _, analysis_result, _) in zip(contract_ids, contracts)
+                             for term, value in (analysis_result or {}).get('key_terms', {}).items()]
+                if use_copy is None:
+                    use_copy = len(key_terms) >= 5000
+                if use_copy:
+                    uow.copy_rows("contract_key_terms", ("contract_id", "term_name", "term_value"), key_terms)
+                elif key_terms:
+                    uow.insert_many("INSERT INTO contract_key_terms (contract_id, term_name, term_value) VALUES %s;", key_terms)
+                if on_saved:
+                    on_saved(uow, contract_ids)
+            self.invalidate_cache("companies", "contracts", "contract_key_terms")
+            return contract_ids
+        except Exception as e:
+            st.error(f"DB Query Error: {e}")
+            return None
+
+    def save_tco_recommendation(self, segment, tco_components, total_tco, recommendation, company_name=None, on_saved=None):
+        """
+        Stores an AI commercial model recommendation for a TCO calculation.
+        `on_saved(uow, recommendation_id)` runs in the same transaction; if it raises, nothing is saved.
+        """
+        try:
+            with self.transaction() as uow:
+                recommendation_id = uow.execute(
+                    "INSERT INTO tco_recommendations (company_name, segment, tco_components, total_tco, recommendation) VALUES (%s, %s, %s, %s, %s) RETURNING recommendation_id;",
+                    (company_name, segment, tco_components, total_tco, Json(recommendation)), fetch='one'
+                )[0]
+                if on_saved:
+                    on_saved(uow, recommendation_id)
+            return recommendation_id
+        except Exception as e:
+            st.error(f"DB Query Error: {e}")
+            return None
+
+    def save_tco_analysis(self, analysis_name, record, company_name=None):
+        """
+        Stores a TCO scenario analysis (ScenarioResult.to_record()) in tco_analyses. total_cost_5_year keeps
+        the base-case TCO; percentiles, sensitivities and inputs go into the result document.
+        """
+        row = self.execute_query(
+            "INSERT INTO tco_analyses (analysis_name, company_id, total_cost_5_year, method, scenarios, total_tco_p50, npv_p50, result) "
+            "VALUES (%s, (SELECT company_id FROM companies WHERE company_name = %s), %s, %s, %s, %s, %s, %s) RETURNING tco_id;",
+            (analysis_name, company_name, record['base_case']['total_tco'], record['method'], record['scenarios'],
+             record['percentiles']['total_tco']['p50'], record['percentiles']['npv']['p50'], Json(record)), fetch='one'
+        )
+        return row[0] if row else None
+
+    def save_rfx_document(self, title, requirements, company_name=None, source_name=None, status="In Progress", on_saved=None):
+        """
+        Saves an RFx document and its assessed requirements (dicts with ref, section, text, risk_level, category,
+        rationale, assessed_by) in one transaction; requirements are written with COPY. `on_saved(uow, rfx_id)`
+        runs before the commit. Returns the new rfx_id.
+        """
+        try:
+            with self.transaction() as uow:
+                company_id = self._upsert_companies(uow, [company_name])[company_name] if company_name else None
+                rfx_id = uow.execute("INSERT INTO rfx_documents (rfx_title, company_id, status, source_name) VALUES (%s, %s, %s, %s) RETURNING rfx_id;",
+                                     (title, company_id, status, source_name), fetch='one')[0]
+                uow.copy_rows("rfx_requirements", RFX_REQUIREMENT_COLUMNS, [
+                    (rfx_id, position, (r.get("ref") or "")[:50] or None, (r.get("section") or "")[:255] or None, r["text"], r.get("risk_level"),
+                     r.get("category"), r.get("rationale"), r.get("assessed_by"))
+                    for position, r in enumerate(requirements, start=1)])
+                if on_saved:
+                    on_saved(uow, rfx_id)
+            if company_name:
+                self.invalidate_cache("companies")
+            return rfx_id
+        except Exception as e:
+            st.error(f"DB Query Error: {e}")
+            return None
+
+    def save_partner_kpis(self, facts):
+        """
+        Bulk-loads partner KPI facts, given as (partner company name, kpi_name, period_date, actual, target or None)
+        tuples, in one transaction. Missing partners and KPI names are created, missing yearly partitions are
+        added beforehand (see ensure_kpi_partitions), and a fact for the same partner, KPI and date replaces the earlier one. The monthly and
+        quarterly rollups of the affected periods are then recomputed from their facts. Returns the number of facts loaded.
+        """
+        if not facts:
+            return 0
+        try:
+            self.ensure_kpi_partitions({fact[2].year for fact in facts})
+            with self.transaction() as uow:
+                self._load_partner_kpis(uow, facts)
+            self.invalidate_cache("companies", "partner_kpi_quarterly")
+            return len(facts)
+        except Exception as e:
+            st.error(f"DB Query Error: {e}")
+            return None
+
+    def ensure_kpi_partitions(self, years):
+        """
+        Creates the yearly partner_kpi_facts partitions that `years` are missing, in a short transaction of its own
+        under the migration advisory lock. Loads then run no DDL, whose ACCESS EXCLUSIVE lock on the parent table
+        would block dashboard reads for the whole load, and concurrent loads do not race to create the same partition.
+        """
+        missing = self.execute_query(
+            "SELECT year FROM unnest(%s::int[]) AS year WHERE to_regclass('partner_kpi_facts_' || year) IS NULL;",
+            (sorted(years),), fetch='all')
+        if missing:
+            with self.transaction() as uow:
+                uow.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+                self._create_kpi_partitions(uow, [row[0] for row in missing])
+
+    @staticmethod
+    def _create_kpi_partitions(uow, years):
+        for year in sorted(years):
+            uow.execute(f"CREATE TABLE IF NOT EXISTS partner_kpi_facts_{year} PARTITION OF partner_kpi_facts "
+                        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01');")
+
+    def _load_partner_kpis(self, uow, facts):
+        """The statements of save_partner_kpis, on the caller's unit of work; the partitions for its years must exist."""
+        company_ids = self._upsert_companies(uow, [fact[0] for fact in facts], company_type="Partner")
+        partner_ids = dict(uow.execute(
+            "WITH missing AS (INSERT INTO partners (company_id) SELECT id FROM unnest(%s) AS id "
+            "WHERE NOT EXISTS (SELECT 1 FROM partners p WHERE p.company_id = id) RETURNING company_id, partner_id) "
+            "SELECT company_id, partner_id FROM missing UNION ALL "
+            "SELECT company_id, MIN(partner_id) FROM partners WHERE company_id = ANY(%s) GROUP BY company_id;",
+            (list(company_ids.values()), list(company_ids.values())), fetch='all'))
+        kpi_ids = dict(uow.insert_many(
+            "INSERT INTO kpi_definitions (kpi_name) VALUES %s "
+            "ON CONFLICT (kpi_name) DO UPDATE SET kpi_name = EXCLUDED.kpi_name RETURNING kpi_name, kpi_id;",
+            [(name,) for name in sorted({fact[1] for fact in facts})], fetch=True))
+        uow.execute("CREATE TEMP TABLE partner_kpi_staging (partner_id INTEGER, kpi_id INTEGER, period_date DATE, "
+                    "actual_value NUMERIC(18, 4), target_value NUMERIC(18, 4)) ON COMMIT DROP;")
+        uow.copy_rows("partner_kpi_staging", ("partner_id", "kpi_id", "period_date", "actual_value", "target_value"),
+                      [(partner_ids[company_ids[company_name]], kpi_ids[kpi_name], period_date, actual, target)
+                       for company_name, kpi_name, period_date, actual, target in facts])
+        uow.execute("ANALYZE partner_kpi_staging;")
+        # The last fact wins when the load itself repeats a (partner, KPI, date).
+        uow.execute(
+            "INSERT INTO partner_kpi_facts (partner_id, kpi_id, period_date, actual_value, target_value) "
+            "SELECT DISTINCT ON (partner_id, kpi_id, period_date) partner_id, kpi_id, period_date, actual_value, target_value "
+            "FROM partner_kpi_staging ORDER BY partner_id, kpi_id, period_date, ctid DESC "
+            "ON CONFLICT (partner_id, kpi_id, period_date) DO UPDATE SET actual_value = EXCLUDED.actual_value, "
+            "target_value = EXCLUDED.target_value, loaded_at = NOW();")
+        # Months are recomputed from their facts, quarters from their months.
+        uow.execute(
+            "INSERT INTO partner_kpi_monthly (partner_id, kpi_id, period_start, actual_sum, fact_count, target_sum, target_count, targeted_actual_sum) "
+            "SELECT f.partner_id, f.kpi_id, t.period_start, SUM(f.actual_value), COUNT(*), SUM(f.target_value), COUNT(f.target_value), "
+            "SUM(f.actual_value) FILTER (WHERE f.target_value IS NOT NULL) "
+            "FROM (SELECT DISTINCT partner_id, kpi_id, date_trunc('month', period_date)::date AS period_start FROM partner_kpi_staging) t "
+            "JOIN partner_kpi_facts f ON f.partner_id = t.partner_id AND f.kpi_id = t.kpi_id "
+            "AND f.period_date >= t.period_start AND f.period_date < t.period_start + INTERVAL '1 month' "
+            "GROUP BY f.partner_id, f.kpi_id, t.period_start " + ROLLUP_UPDATE)
+        uow.execute(
+            "INSERT INTO partner_kpi_quarterly (partner_id, kpi_id, period_start, actual_sum, fact_count, target_sum, target_count, targeted_actual_sum) "
+            "SELECT m.partner_id, m.kpi_id, t.period_start, SUM(m.actual_sum), SUM(m.fact_count), SUM(m.target_sum), SUM(m.target_count), "
+            "SUM(m.targeted_actual_sum) "
+            "FROM (SELECT DISTINCT partner_id, kpi_id, date_trunc('quarter', period_date)::date AS period_start FROM partner_kpi_staging) t "
+            "JOIN partner_kpi_monthly m ON m.partner_id = t.partner_id AND m.kpi_id = t.kpi_id "
+            "AND m.period_start >= t.period_start AND m.period_start < t.period_start + INTERVAL '3 months' "
+            "GROUP BY m.partner_id, m.kpi_id, t.period_start " + ROLLUP_UPDATE)
+
+    def get_rfx_documents(self, limit=200):
+        """RFx documents, newest first, with their requirement counts per risk level."""
+        query = (
+            "SELECT d.rfx_id, d.rfx_title, co.company_name, d.status, COUNT(r.req_id), "
+            "COUNT(*) FILTER (WHERE r.risk_level = 'High'), COUNT(*) FILTER (WHERE r.risk_level = 'Medium'), "
+            "COUNT(*) FILTER (WHERE r.risk_level = 'Low'), COUNT(*) FILTER (WHERE r.req_id IS NOT NULL AND r.risk_level IS NULL) "
+            "FROM (SELECT * FROM rfx_documents ORDER BY rfx_id DESC LIMIT %s) d LEFT JOIN companies co ON d.company_id = co.company_id "
+            "LEFT JOIN rfx_requirements r ON r.rfx_id = d.rfx_id GROUP BY d.rfx_id, d.rfx_title, co.company_name, d.status ORDER BY d.rfx_id DESC;"
+        )
+        results = self.execute_query(query, (limit,), fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['ID', 'Title', 'Customer', 'Status', 'Requirements', 'High', 'Medium', 'Low', 'Not Assessed'])
+
+    def get_tco_analyses(self, limit=20):
+        query = ("SELECT t.tco_id, t.analysis_name, co.company_name, t.method, t.scenarios, t.total_cost_5_year, t.total_tco_p50, t.npv_p50, t.created_at "
+                 "FROM tco_analyses t LEFT JOIN companies co ON t.company_id = co.company_id ORDER BY t.tco_id DESC LIMIT %s;")
+        results = self.execute_query(query, (limit,), fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['ID', 'Analysis', 'Company', 'Method', 'Scenarios', 'Base-Case TCO', 'P50 TCO', 'P50 NPV', 'Created'])
+
+    @cached_query("contracts", "companies")
     def get_contracts(self):
         query = "SELECT c.contract_id, c.contract_title, co.company_name AS counterparty, c.contract_type, c.status, c.expiration_date, c.risk_score_display FROM contracts c JOIN companies co ON c.company_id = co.company_id ORDER BY c.contract_id DESC;"
         results = self.execute_query(query, fetch='all')
         if not results: return pd.DataFrame()
-        return pd.DataFrame(results, columns=['ID', 'Contract Title', 'Counterparty', 'Type', 'Status', 'Expiry Date', 'Risk Score'])
+        return pd.DataFrame(results, columns=CONTRACT_LIST_COLUMNS)
+
+    @cached_query("contracts", "companies")
+    def get_contracts_page(self, filters=None, sort="Newest first", after=None, page_size=50):
+        """
+        Returns one page of the contract listing and the cursor of the next page (None on the last page).
+
+        Pages are addressed by keyset rather than OFFSET: `after` is the (sort value, contract_id) of the
+        last row of the previous page, so every page is an index range scan however deep it is.
+        Supported filters: counterparty, contract_type, status, risk_scores (list), expires_from, expires_to.
+        """
+        filters = filters or {}
+        sort_expression, direction = CONTRACT_SORTS[sort]
+        conditions, params = [], []
+        if filters.get('counterparty'):
+            conditions.append("co.company_name = %s"); params.append(filters['counterparty'])
+        if filters.get('contract_type'):
+            conditions.append("c.contract_type = %s"); params.append(filters['contract_type'])
+        if filters.get('status'):
+            conditions.append("c.status = %s"); params.append(filters['status'])
+        if filters.get('risk_scores'):
+            conditions.append("c.risk_score_display = ANY(%s)"); params.append(list(filters['risk_scores']))
+        if filters.get('expires_from'):
+            conditions.append("c.expiration_date >= %s"); params.append(filters['expires_from'])
+        if filters.get('expires_to'):
+            conditions.append("c.expiration_date <= %s"); params.append(filters['expires_to'])
+        if after is not None:
+            comparison = "<" if direction == "DESC" else ">"
+            if sort_expression == "c.contract_id":
+                conditions.append(f"c.contract_id {comparison} %s"); params.append(after[1])
+            else:
+                conditions.append(f"({sort_expression}, c.contract_id) {comparison} (%s, %s)"); params.extend(after)
+
+        query = (
+            "SELECT c.contract_id, c.contract_title, co.company_name AS counterparty, c.contract_type, c.status, c.expiration_date, c.risk_score_display, "
+            f"{sort_expression} AS sort_value FROM contracts c JOIN companies co ON c.company_id = co.company_id "
+            + (f"WHERE {' AND '.join(conditions)} " if conditions else "")
+            + f"ORDER BY {sort_expression} {direction}, c.contract_id {direction} LIMIT %s;"
+        )
+        results = self.execute_query(query, (*params, page_size + 1), fetch='all') or []
+        next_cursor = (results[page_size - 1][-1], results[page_size - 1][0]) if len(results) > page_size else None
+        return pd.DataFrame([row[:-1] for row in results[:page_size]], columns=CONTRACT_LIST_COLUMNS), next_cursor
+
+    def search_contracts(self, text, limit=20):
+        """
+        Ranks contracts matching every word of `text` in their title, key terms or extracted text, e.g.
+        "German law Net 60". Returns a DataFrame with the rank and highlighted snippets of the best matches.
+        Every match found through the GIN index is ranked, so results depend on relevance only.
+        """
+        tsquery = build_prefix_tsquery(text)
+        if not tsquery:
+            return pd.DataFrame()
+        # Match through the GIN index, rank all matches, and build snippets only for the returned rows.
+        query = (
+            "WITH q AS (SELECT to_tsquery('english', %s) AS query), "
+            "ranked AS (SELECT c.contract_id, ts_rank_cd(c.search_vector, q.query) AS rank FROM contracts c, q "
+            "WHERE c.search_vector @@ q.query ORDER BY rank DESC, c.contract_id DESC LIMIT %s) "
+            "SELECT r.contract_id, c.contract_title, co.company_name, c.contract_type, c.expiration_date, ROUND(r.rank::numeric, 4), "
+            f"ts_headline('english', left(coalesce(c.contract_text, ''), {SEARCH_VECTOR_TEXT_CHARS}), q.query, %s), "
+            "ts_headline('english', coalesce(c.key_terms_text, ''), q.query, 'HighlightAll=true, StartSel=**, StopSel=**') "
+            "FROM ranked r JOIN contracts c ON c.contract_id = r.contract_id JOIN companies co ON c.company_id = co.company_id, q "
+            "ORDER BY r.rank DESC, r.contract_id DESC;"
+        )
+        results = self.execute_query(query, (tsquery, limit, SEARCH_HEADLINE_OPTIONS), fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['ID', 'Contract Title', 'Counterparty', 'Type', 'Expiry Date', 'Rank', 'Snippet', 'Key Terms'])
+
+    def search_key_terms(self, value, term_name=None, limit=50):
+        """
+        Finds key term values similar to `value` (e.g. 'Net 60' also finds 'Net 60 days'), using trigram
+        similarity where pg_trgm is installed and prefix full-text matching otherwise.
+        """
+        if self.has_trigram_search():
+            query = (
+                "SELECT k.contract_id, c.contract_title, k.term_name, k.term_value, ROUND(similarity(k.term_value, %s)::numeric, 3) AS score "
+                "FROM contract_key_terms k JOIN contracts c ON c.contract_id = k.contract_id "
+                "WHERE k.term_value %% %s AND (%s IS NULL OR k.term_name = %s) ORDER BY score DESC, k.contract_id DESC LIMIT %s;"
+            )
+            params = (value, value, term_name, term_name, limit)
+        else:
+            tsquery = build_prefix_tsquery(value)
+            if not tsquery:
+                return pd.DataFrame()
+            # Without trigrams every match scores alike, so the newest matches are returned first.
+            query = (
+                "SELECT k.contract_id, c.contract_title, k.term_name, k.term_value, "
+                "ROUND(ts_rank_cd(k.search_vector, to_tsquery('english', %s))::numeric, 3) AS score "
+                "FROM contract_key_terms k JOIN contracts c ON c.contract_id = k.contract_id "
+                "WHERE k.search_vector @@ to_tsquery('english', %s) AND (%s IS NULL OR k.term_name = %s) "
+                "ORDER BY k.contract_id DESC LIMIT %s;"
+            )
+            params = (tsquery, tsquery, term_name, term_name, limit)
+        results = self.execute_query(query, params, fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['ID', 'Contract Title', 'Term', 'Value', 'Score'])
 
+    def has_trigram_search(self):
+        if not hasattr(self, '_has_trigram'):
+            row = self.execute_query("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');", fetch='one')
+            self._has_trigram = bool(row and row[0])
+        return self._has_trigram
+
+    @cached_query("companies")
+    def get_counterparties(self):
+        results = self.execute_query("SELECT company_name FROM companies ORDER BY company_name;", fetch='all')
+        return [row[0] for row in results or []]
+
+    @cached_query("contracts")
     def get_expiring_contracts(self, days=90):
-        query = "SELECT contract_title, expiration_date FROM contracts WHERE expiration_date BETWEEN NOW() AND NOW() + INTERVAL '%s days' ORDER BY expiration_date ASC;"
+        # Compares the DATE column with dates (not NOW()), so the expiration_date index applies.
+        query = "SELECT contract_title, expiration_date FROM contracts WHERE expiration_date > CURRENT_DATE AND expiration_date <= CURRENT_DATE + %s ORDER BY expiration_date ASC;"
         results = self.execute_query(query, (days,), fetch='all')
         if not results: return pd.DataFrame()
         return pd.DataFrame(results, columns=['contract_title', 'expiration_date'])
         
+    @cached_query("partner_kpi_quarterly")
     def get_kpi_summary(self):
-        """Fetches dashboard KPIs and returns a correctly structured dictionary even on failure."""
-        results = self.execute_query("SELECT kpi_name, kpi_value, kpi_change FROM kpi_summary;", fetch='all')
-        # --- THIS IS THE SECOND FIX ---
-        # We now return a properly structured dictionary if the query fails, preventing the TypeError
-        if not results:
-            return {
-                'win_rate': {'value': 0, 'change': 0},
-                'avg_margin': {'value': 0, 'change': 0}
-            }
-        return {row[0]: {'value': row[1], 'change': row[2]} for row in results}
+        """
+        Win rate (deals won / decided deals) and average deal margin (gross margin / revenue) across all partners
+        in the latest quarter with data for each, with the change in points from the quarter before.
+        """
+        query = (
+            "SELECT r.period_start, SUM(r.actual_sum) FILTER (WHERE d.kpi_name = 'Deals Won'), SUM(r.actual_sum) FILTER (WHERE d.kpi_name = 'Deals Lost'), "
+            "SUM(r.actual_sum) FILTER (WHERE d.kpi_name = 'Gross Margin (EUR)'), SUM(r.actual_sum) FILTER (WHERE d.kpi_name = 'Revenue (EUR)') "
+            "FROM partner_kpi_quarterly r JOIN kpi_definitions d ON d.kpi_id = r.kpi_id "
+            "WHERE d.kpi_name IN ('Deals Won', 'Deals Lost', 'Gross Margin (EUR)', 'Revenue (EUR)') "
+            "GROUP BY r.period_start ORDER BY r.period_start DESC LIMIT 8;"
+        )
+        results = self.execute_query(query, fetch='all') or []
+        rates = [{'win_rate': won / (won + lost) * 100 if won is not None and lost is not None and won + lost else None,
+                  'avg_margin': margin / revenue * 100 if margin is not None and revenue else None}
+                 for _, won, lost, margin, revenue in results]
+        summary = {}
+        for kpi in ('win_rate', 'avg_margin'):
+            values = [rate[kpi] for rate in rates if rate[kpi] is not None]
+            summary[kpi] = {'value': round(values[0], 1) if values else 0,
+                            'change': round(values[0] - values[1], 1) if len(values) > 1 else 0}
+        return summary
+
+    def get_partners(self):
+        """[(company_id, partner name)] of every partner, by name."""
+        results = self.execute_query(
+            "SELECT DISTINCT co.company_id, co.company_name FROM partners p JOIN companies co ON p.company_id = co.company_id ORDER BY co.company_name;",
+            fetch='all')
+        return [tuple(row) for row in results or []]
+
+    @cached_query("partner_kpi_quarterly", "companies")
+    def get_partner_portfolio(self, sort="Attainment", quarter=None, limit=None):
+        """
+        Ranks partners for one quarter (default: the latest with data) by their average KPI attainment or by its
+        trend, the change from the previous quarter. Reads only the quarterly rollup, never the facts.
+        """
+        query = (
+            "WITH q AS (SELECT COALESCE(%s::date, MAX(period_start)) AS cur, (COALESCE(%s::date, MAX(period_start)) - INTERVAL '3 months')::date AS prev "
+            "FROM partner_kpi_quarterly), "
+            f"attainment AS (SELECT r.partner_id, r.period_start, AVG({KPI_ATTAINMENT}) AS attainment, COUNT(*) AS kpis "
+            "FROM partner_kpi_quarterly r JOIN kpi_definitions d ON d.kpi_id = r.kpi_id, q "
+            "WHERE r.period_start IN (q.cur, q.prev) AND r.target_sum IS NOT NULL GROUP BY r.partner_id, r.period_start) "
+            f"SELECT RANK() OVER (ORDER BY {PARTNER_PORTFOLIO_SORTS[sort]}), co.company_id, co.company_name, "
+            "to_char(cur.period_start, 'YYYY-\"Q\"Q'), ROUND(cur.attainment * 100, 1), ROUND((cur.attainment - prev.attainment) * 100, 1), cur.kpis "
+            "FROM attainment cur JOIN q ON cur.period_start = q.cur "
+            "LEFT JOIN attainment prev ON prev.partner_id = cur.partner_id AND prev.period_start = q.prev "
+            "JOIN partners p ON p.partner_id = cur.partner_id JOIN companies co ON co.company_id = p.company_id "
+            "ORDER BY 1, co.company_name LIMIT %s;"
+        )
+        results = self.execute_query(query, (quarter, quarter, limit), fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['Rank', 'Company ID', 'Partner', 'Quarter', 'Attainment (%)', 'Trend (pts)', 'KPIs with Target'])
 
     def get_partner_performance(self, partner_company_id):
-        query = "SELECT pp.kpi_name, pp.kpi_value, pp.target_value FROM partner_performance pp JOIN partners p ON pp.partner_id = p.partner_id WHERE p.company_id = %s;"
+        """A partner's KPIs in its latest quarter with data: actual, target, attainment and the change from the quarter before."""
+        query = (
+            f"WITH kpis AS (SELECT d.kpi_name, d.unit, r.period_start, {KPI_ACTUAL} AS actual, {KPI_TARGET} AS target, {KPI_ATTAINMENT} AS attainment, "
+            "LAG(" + KPI_ACTUAL + ") OVER (PARTITION BY r.partner_id, r.kpi_id ORDER BY r.period_start) AS previous, "
+            "LAG(r.period_start) OVER (PARTITION BY r.partner_id, r.kpi_id ORDER BY r.period_start) AS previous_start "
+            "FROM partner_kpi_quarterly r JOIN kpi_definitions d ON d.kpi_id = r.kpi_id JOIN partners p ON p.partner_id = r.partner_id "
+            "WHERE p.company_id = %s) "
+            "SELECT kpi_name, unit, to_char(period_start, 'YYYY-\"Q\"Q'), ROUND(actual, 2), ROUND(target, 2), ROUND(attainment * 100, 1), "
+            "CASE WHEN previous_start = (period_start - INTERVAL '3 months')::date THEN ROUND((actual - previous) / NULLIF(previous, 0) * 100, 1) END "
+            "FROM kpis WHERE period_start = (SELECT MAX(period_start) FROM kpis) ORDER BY kpi_name;"
+        )
+        results = self.execute_query(query, (partner_company_id,), fetch='all')
+        if not results: return pd.DataFrame()
+        return pd.DataFrame(results, columns=['KPI', 'Unit', 'Quarter', 'Actual', 'Target', 'Attainment (%)', 'Change vs. Previous Quarter (%)'])
+
+    def get_partner_kpi_history(self, partner_company_id, grain="Monthly"):
+        """A partner's KPI actuals and targets per month or quarter, from the rollups."""
+        table = KPI_ROLLUP_GRAINS[grain]
+        query = (
+            f"SELECT r.period_start, d.kpi_name, ROUND({KPI_ACTUAL}, 2), ROUND({KPI_TARGET}, 2) "
+            f"FROM {table} r JOIN kpi_definitions d ON d.kpi_id = r.kpi_id JOIN partners p ON p.partner_id = r.partner_id "
+            "WHERE p.company_id = %s ORDER BY d.kpi_name, r.period_start;"
+        )
         results = self.execute_query(query, (partner_company_id,), fetch='all')
         if not results: return pd.DataFrame()
-        return pd.DataFrame(results, columns=['KPI', 'Actual Value', 'Target'])
+        return pd.DataFrame(results, columns=['Period', 'KPI', 'Actual', 'Target'])
 
-    def get_rfx_requirements(self, rfx_id):
-        query = "SELECT requirement_text, risk_level FROM rfx_requirements WHERE rfx_id = %s;"
-        results = self.execute_query(query, (rfx_id,), fetch='all')
+    def get_rfx_requirements(self, rfx_id, risk_levels=None):
+        """An RFx document's requirements in document order, optionally only those at the given risk levels."""
+        query = (
+            "SELECT requirement_ref, requirement_text, COALESCE(risk_level, 'Not assessed'), category, rationale, assessed_by, section "
+            "FROM rfx_requirements WHERE rfx_id = %s AND (%s IS NULL OR COALESCE(risk_level, 'Not assessed') = ANY(%s)) "
+            "ORDER BY position NULLS LAST, req_id;"
+        )
+        risk_levels = list(risk_levels) if risk_levels else None
+        results = self.execute_query(query, (rfx_id, risk_levels, risk_levels), fetch='all')
         if not results: return pd.DataFrame()
-        return pd.DataFrame(results, columns=['Requirement', 'Assessed Risk Level'])
+        return pd.DataFrame(results, columns=['Ref', 'Requirement', 'Assessed Risk Level', 'Category', 'Rationale', 'Assessed By', 'Section'])
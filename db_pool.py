@@ -0,0 +1,235 @@
+# db_pool.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+
+def get_db_settings():
+    """Reads the PostgreSQL connection settings from the environment, falling back to the local defaults."""
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "5432")),
+        "database": os.getenv("DB_NAME", "portfolio_db"),
+        "user": os.getenv("DB_USER", "abdulkerimhasturk"),
+        "password": os.getenv("DB_PASSWORD", ""),
+    }
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are checked out per query or per unit of work, so concurrent Streamlit
+    sessions no longer share (and roll back) a single connection. Idle connections are
+    health-checked before reuse and transparently replaced when the server dropped them;
+    `run` also retries read-only work once when its connection drops under it.
+    """
+    def __init__(self, min_size=1, max_size=10, timeout=30.0, health_check_after=30.0, **connect_kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = []  # list of (connection, last_used_monotonic)
+        self._size = 0
+        self._closed = False
+
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _is_healthy(self, conn, last_used, verify=False):
+        if conn.closed:
+            return False
+        if not verify and time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self, timeout=None, verify=False):
+        """
+        Checks out a connection, blocking until one is free or the timeout expires.
+        With `verify`, a reused connection is health-checked however recently it was used.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(f"Timed out after {timeout:.1f}s waiting for a database connection")
+                waited = True
+                self._waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, last_used, verify):
+                self._discard(conn)
+                conn = self._connect()
+                with self._lock:
+                    self._reconnects += 1
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+        wait_time = time.monotonic() - started
+        with self._lock:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time_total += wait_time
+            self._wait_time_max = max(self._wait_time_max, wait_time)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Returns a connection to the pool; broken or discarded connections are closed instead."""
+        if not conn.closed and not discard:
+            try:
+                # Never hand a connection with an open transaction to the next caller.
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        with self._lock:
+            self._in_use -= 1
+            if conn.closed or discard or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None, verify=False):
+        """Checks out a connection for a unit of work: commits on success, rolls back on error."""
+        conn = self.getconn(timeout, verify)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            broken = conn.closed
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self.putconn(conn, discard=broken)
+            raise
+        else:
+            self.putconn(conn)
+
+    def run(self, work, timeout=None, idempotent=False):
+        """
+        Runs `work(conn)` as a unit of work and returns its result, surviving connections the server dropped
+        (e.g. by a restart or failover within the health check interval). Work that is not `idempotent` is
+        never repeated, since a drop during or after COMMIT leaves its outcome unknown; instead its connection
+        is health-checked at checkout, so a dropped one is replaced before any statement is sent. Idempotent
+        work (reads) skips that check and runs once more on a verified connection if the connection drops under it.
+        """
+        if not idempotent:
+            with self.connection(timeout, verify=True) as conn:
+                return work(conn)
+        conn = None
+        try:
+            with self.connection(timeout) as conn:
+                return work(conn)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if conn is None or not conn.closed:
+                raise  # not a dropped connection (e.g. a pool timeout or a cancelled statement)
+        with self._lock:
+            self._reconnects += 1
+        with self.connection(timeout, verify=True) as conn:
+            return work(conn)
+
+    def stats(self):
+        """Returns a snapshot of pool usage for monitoring under load."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "avg_wait_ms": round(1000 * self._wait_time_total / self._checkouts, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(1000 * self._wait_time_max, 3),
+            }
+
+    def close(self):
+        """Closes all idle connections; checked-out connections are closed when returned."""
+        with self._lock:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._size -= 1
+                self._discard(conn)
+            self._idle = []
+            self._lock.notify_all()
+
+
+def create_pool_from_env():
+    """Builds the application's connection pool from DB_* environment variables."""
+    return ConnectionPool(
+        min_size=int(os.getenv("DB_POOL_MIN", "1")),
+        max_size=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+        **get_db_settings(),
+    )
@@ -0,0 +1,324 @@
+# ingestion.py
+"""
+Headless batch ingestion of contract PDFs from a directory or a .zip/.tar(.gz) archive.
+
+Every document runs through extraction, AI analysis and DatabaseManager persistence in a bounded-concurrency
+pipeline. Per-document state is recorded in `ingestion_documents`, so an interrupted batch resumes where it stopped.
+
+Usage: python ingestion.py PATH [--type MSA] [--concurrency 4] [--max-attempts 3] [--no-resume]
+                                [--mock-llm] [--mock-latency 0.5]
+"""
+import argparse
+import os
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from analysis_cache import hash_document
+from contract_analysis import DEFAULT_MODEL, analyze_contract
+from prompts import get_contract_analysis_prompt_version
+
+CONTRACT_TYPES = ["Reseller Agreement", "MSA", "NDA", "Partnership Agreement"]
+ARCHIVE_SEPARATOR = "::"
+
+
+class ContractIngestor:
+    """
+    Runs the single-contract flow shared by the upload form, batch ingestion and background workers:
+    analysis cache lookup, text extraction, near-duplicate aware analysis, persistence and indexing.
+    """
+    def __init__(self, db, client, model=DEFAULT_MODEL, analysis_cache=None, similarity_index=None, extract_text=None, config=None):
+        self.db = db
+        self.client = client
+        self.model = model
+        self.analysis_cache = analysis_cache
+        self.similarity_index = similarity_index
+        self.extract_text = extract_text
+        self.config = config
+
+    def ingest(self, file_bytes, title, contract_type, stream_listener=None, on_saved=None):
+        """
+        Analyzes and saves one contract; returns the contract id, the analysis and how it was obtained.
+        `stream_listener` receives findings while the API response streams in (see streaming_json);
+        `on_saved(uow, contract_id)` runs in the contract's save transaction.
+        """
+        document_hash = hash_document(file_bytes)
+        prompt_version = get_contract_analysis_prompt_version(contract_type)
+        cache_key, cached = None, None
+        if self.analysis_cache:
+            cache_key = self.analysis_cache.make_key(document_hash, contract_type, prompt_version, self.model)
+            cached = self.analysis_cache.get(cache_key)
+        analysis_result, contract_text = cached or (None, None)
+        from_cache = analysis_result is not None
+
+        reuse_info = None
+        if not contract_text:
+            # A hit stores its text with the analysis; only misses (and entries cached without text) parse the PDF.
+            contract_text = self.extract_text(file_bytes)
+            if not contract_text:
+                raise ValueError("No text could be extracted from the PDF")
+        if not from_cache:
+            analysis_result, reuse_info = analyze_contract(self.client, contract_text, contract_type, self.model, self.similarity_index, self.config, stream_listener)
+        if self.analysis_cache and (not from_cache or not cached[1]):
+            self.analysis_cache.put(cache_key, document_hash, contract_type, prompt_version, self.model, analysis_result, contract_text)
+
+        def index_and_notify(uow, contract_id):
+            # Indexing shares the save transaction, so a contract is never stored without its fingerprint.
+            if self.similarity_index:
+                self.similarity_index.add(contract_id, contract_type, contract_text, analysis_result, uow)
+            if on_saved:
+                on_saved(uow, contract_id)
+
+        contract_id = self.db.save_contract_and_analysis(title, contract_type, analysis_result, contract_text, on_saved=index_and_notify)
+        if contract_id is None:
+            raise RuntimeError("The contract could not be saved")
+        return {"contract_id": contract_id, "analysis_result": analysis_result, "from_cache": from_cache,
+                "reuse_info": reuse_info, "document_hash": document_hash}
+
+
+# --- Document discovery ---
+
+def _is_archive(path):
+    return zipfile.is_zipfile(path) or (os.path.isfile(path) and tarfile.is_tarfile(path))
+
+
+def discover_documents(source):
+    """Lists the PDFs in a directory tree or archive as source paths (archive members as 'archive::member')."""
+    source = os.path.abspath(source)
+    if os.path.isdir(source):
+        found = [os.path.join(root, name) for root, _, names in os.walk(source) for name in names if name.lower().endswith(".pdf")]
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            found = [f"{source}{ARCHIVE_SEPARATOR}{name}" for name in archive.namelist() if name.lower().endswith(".pdf")]
+    elif _is_archive(source):
+        with tarfile.open(source) as archive:
+            found = [f"{source}{ARCHIVE_SEPARATOR}{member.name}" for member in archive.getmembers() if member.isfile() and member.name.lower().endswith(".pdf")]
+    else:
+        raise ValueError(f"{source} is neither a directory nor a .zip/.tar archive")
+    return sorted(found)
+
+
+def read_document(source_path):
+    """Reads the bytes of a discovered document, opening archives per read so worker threads never share a handle."""
+    if ARCHIVE_SEPARATOR in source_path:
+        archive_path, member = source_path.split(ARCHIVE_SEPARATOR, 1)
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as archive:
+                return archive.read(member)
+        with tarfile.open(archive_path) as archive:
+            return archive.extractfile(member).read()
+    with open(source_path, "rb") as f:
+        return f.read()
+
+
+def resolve_source(path, root):
+    """
+    Resolves a source path given relative to (or inside) `root`, refusing anything that leads outside it,
+    through '..' or symlinks. Used for paths typed into the app, which must not read arbitrary server files.
+    """
+    if not root:
+        raise ValueError("Batch ingestion from the app is disabled: set INGESTION_ROOT to the directory it may read")
+    root = os.path.realpath(root)
+    source = os.path.realpath(os.path.join(root, path.strip()))
+    if os.path.commonpath([root, source]) != root:
+        raise ValueError(f"{path} is outside the ingestion root {root}")
+    if not os.path.exists(source):
+        raise ValueError(f"{path} does not exist under {root}")
+    return source
+
+
+def batch_progress(db, batch_id):
+    """Returns document counts per status for a batch."""
+    rows = db.execute_query(
+        "SELECT status, COUNT(*) FROM ingestion_documents WHERE batch_id = %s GROUP BY status;", (batch_id,), fetch='all'
+    ) or []
+    counts = {"pending": 0, "processing": 0, "done": 0, "failed": 0}
+    counts.update({status: count for status, count in rows})
+    counts["total"] = sum(counts[status] for status in ("pending", "processing", "done", "failed"))
+    return counts
+
+
+def title_from_path(source_path):
+    """Derives a contract title from the file name, e.g. 'MSA_with_FutureNet_Mobile.pdf' -> 'MSA with FutureNet Mobile'."""
+    name = os.path.basename(source_path.split(ARCHIVE_SEPARATOR)[-1])
+    return os.path.splitext(name)[0].replace("_", " ").strip()[:255]
+
+
+def infer_contract_type(title, default):
+    lowered = title.lower()
+    for keyword, contract_type in (("nda", "NDA"), ("non-disclosure", "NDA"), ("msa", "MSA"), ("master service", "MSA"),
+                                   ("reseller", "Reseller Agreement"), ("partner", "Partnership Agreement")):
+        if keyword in lowered:
+            return contract_type
+    return default
+
+
+# --- Pipeline ---
+
+class BatchIngestionPipeline:
+    """
+    Ingests many documents with bounded concurrency, retrying failures with exponential backoff.
+    State lives in `ingestion_batches`/`ingestion_documents`; documents left 'processing' by a crash,
+    or 'failed' in an earlier run, are picked up again when the batch is resumed.
+    """
+    def __init__(self, db, ingestor, concurrency=4, max_attempts=3, retry_backoff=2.0):
+        self.db = db
+        self.ingestor = ingestor
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+    def start_batch(self, source, contract_type="MSA", resume=True):
+        """Registers a batch for a source (reusing its unfinished batch when resuming) and returns the batch id."""
+        source = os.path.abspath(source)
+        row = None
+        if resume:
+            row = self.db.execute_query(
+                "SELECT batch_id FROM ingestion_batches WHERE source = %s AND status <> 'completed' ORDER BY batch_id DESC LIMIT 1;",
+                (source,), fetch='one'
+            )
+        if row:
+            batch_id = row[0]
+            self.db.execute_query("UPDATE ingestion_batches SET status = 'running', finished_at = NULL WHERE batch_id = %s;", (batch_id,))
+        else:
+            batch_id = self.db.execute_query(
+                "INSERT INTO ingestion_batches (source, contract_type) VALUES (%s, %s) RETURNING batch_id;",
+                (source, contract_type), fetch='one'
+            )[0]
+
+        documents = discover_documents(source)
+        for start in range(0, len(documents), 1000):
+            page = documents[start:start + 1000]
+            values = ", ".join(["(%s, %s)"] * len(page))
+            self.db.execute_query(
+                f"INSERT INTO ingestion_documents (batch_id, source_path) VALUES {values} ON CONFLICT (batch_id, source_path) DO NOTHING;",
+                [value for path in page for value in (batch_id, path)]
+            )
+        # Crash recovery: anything left mid-flight or failed by an earlier run is retried.
+        self.db.execute_query(
+            "UPDATE ingestion_documents SET status = 'pending', attempts = 0 WHERE batch_id = %s AND status IN ('processing', 'failed');",
+            (batch_id,)
+        )
+        return batch_id
+
+    def progress(self, batch_id):
+        return batch_progress(self.db, batch_id)
+
+    def _process(self, document_id, source_path, contract_type):
+        title = title_from_path(source_path)
+        doc_type = infer_contract_type(title, contract_type)
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            self.db.execute_query(
+                "UPDATE ingestion_documents SET status = 'processing', attempts = attempts + 1, updated_at = NOW() WHERE document_id = %s;",
+                (document_id,)
+            )
+            try:
+                file_bytes = read_document(source_path)
+                # The document is marked done in the contract's own transaction, so a crash can never leave
+                # a saved contract whose document is retried (and saved again) on resume.
+                self.ingestor.ingest(file_bytes, title, doc_type, on_saved=lambda uow, contract_id: uow.execute(
+                    "UPDATE ingestion_documents SET status = 'done', contract_id = %s, document_hash = %s, last_error = NULL, updated_at = NOW() WHERE document_id = %s;",
+                    (contract_id, hash_document(file_bytes), document_id)))
+                return True
+            except Exception as e:
+                last_error = f"{type(e).__name__}: {e}"
+                if attempt < self.max_attempts:
+                    time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+        self.db.execute_query(
+            "UPDATE ingestion_documents SET status = 'failed', last_error = %s, updated_at = NOW() WHERE document_id = %s;",
+            (last_error[:2000], document_id)
+        )
+        return False
+
+    def run(self, batch_id, progress_callback=None):
+        """Processes every pending document of a batch and returns a summary with throughput."""
+        batch = self.db.execute_query("SELECT contract_type FROM ingestion_batches WHERE batch_id = %s;", (batch_id,), fetch='one')
+        contract_type = batch[0] if batch else "MSA"
+        pending = self.db.execute_query(
+            "SELECT document_id, source_path FROM ingestion_documents WHERE batch_id = %s AND status = 'pending' ORDER BY document_id;",
+            (batch_id,), fetch='all'
+        ) or []
+        counts = self.progress(batch_id)
+        lock = threading.Lock()
+        processed = {"done": 0, "failed": 0}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self._process, document_id, source_path, contract_type) for document_id, source_path in pending]
+            for future in as_completed(futures):
+                with lock:
+                    processed["done" if future.result() else "failed"] += 1
+                    if progress_callback:
+                        elapsed = time.perf_counter() - started
+                        finished = processed["done"] + processed["failed"]
+                        progress_callback({
+                            "total": counts["total"], "already_done": counts["done"], "to_process": len(pending),
+                            "processed": finished, "succeeded": processed["done"], "failed": processed["failed"],
+                            "elapsed_s": elapsed, "docs_per_s": finished / elapsed if elapsed else 0.0,
+                        })
+
+        elapsed = time.perf_counter() - started
+        final = self.progress(batch_id)
+        self.db.execute_query(
+            "UPDATE ingestion_batches SET status = %s, finished_at = NOW() WHERE batch_id = %s;",
+            ("completed" if final["failed"] == 0 else "completed_with_errors", batch_id)
+        )
+        return {"batch_id": batch_id, **final, "processed": len(pending), "elapsed_s": round(elapsed, 2),
+                "docs_per_s": round(len(pending) / elapsed, 2) if elapsed else 0.0}
+
+
+def main():
+    from dotenv import load_dotenv
+    import anthropic
+    from analysis_cache import create_analysis_cache_from_env
+    from database import DatabaseManager
+    from pdf_extraction import create_extraction_engine_from_env
+    from similarity import create_similarity_index_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory or .zip/.tar archive of contract PDFs")
+    parser.add_argument("--type", default="MSA", choices=CONTRACT_TYPES, help="contract type when the file name does not reveal it")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--no-resume", action="store_true", help="start a new batch even if an unfinished one exists for this source")
+    parser.add_argument("--mock-llm", action="store_true", help="serve analyses from the local Anthropic stand-in (mock_llm_server.py)")
+    parser.add_argument("--mock-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.mock_llm:
+        from mock_llm_server import MockLLMServer
+        server = MockLLMServer(port=0, latency=args.mock_latency).start_in_background()
+        client = anthropic.Anthropic(api_key="mock-key", base_url=server.base_url)
+    else:
+        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+
+    db = DatabaseManager()
+    db.initialize_database()
+    engine = create_extraction_engine_from_env()
+    max_chars = os.getenv('PDF_MAX_CHARS')
+    ingestor = ContractIngestor(
+        db, client, os.getenv('ANTHROPIC_MODEL', DEFAULT_MODEL),
+        analysis_cache=create_analysis_cache_from_env(db),
+        similarity_index=create_similarity_index_from_env(db),
+        extract_text=lambda file_bytes: engine.extract_text(file_bytes, max_chars=int(max_chars) if max_chars else None),
+    )
+    pipeline = BatchIngestionPipeline(db, ingestor, concurrency=args.concurrency, max_attempts=args.max_attempts)
+    batch_id = pipeline.start_batch(args.source, args.type, resume=not args.no_resume)
+
+    def report(progress):
+        print(f"\r[batch {batch_id}] {progress['processed']}/{progress['to_process']} processed "
+              f"({progress['failed']} failed, {progress['already_done']} done earlier) - {progress['docs_per_s']:.2f} docs/s", end="", flush=True)
+
+    summary = pipeline.run(batch_id, progress_callback=report)
+    print()
+    print(f"Batch {batch_id}: {summary['done']}/{summary['total']} done, {summary['failed']} failed, "
+          f"{summary['processed']} processed in {summary['elapsed_s']}s ({summary['docs_per_s']} docs/s)")
+    engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# job_queue.py
+import psycopg2
+from psycopg2.extras import Json
+
+JOB_CONTRACT_ANALYSIS = "contract_analysis"
+JOB_TCO_RECOMMENDATION = "tco_recommendation"
+JOB_RFX_ASSESSMENT = "rfx_assessment"
+JOB_BATCH_INGESTION = "batch_ingestion"
+NOTIFY_CHANNEL = "analysis_jobs"
+
+
+class JobOwnershipLost(RuntimeError):
+    """Raised inside a result's save transaction when the job was requeued and handed to another worker."""
+
+
+class JobQueue:
+    """
+    A PostgreSQL-backed queue of AI analysis jobs.
+
+    Pages enqueue jobs and poll their status; worker processes (worker.py) claim them with
+    FOR UPDATE SKIP LOCKED, so any number of workers can pull from the same table without
+    blocking each other. Results are written to the domain tables whether or not the
+    requesting session is still open.
+    """
+    def __init__(self, db, max_attempts=3, stale_after_seconds=300):
+        self.db = db
+        self.max_attempts = max_attempts
+        self.stale_after_seconds = stale_after_seconds
+
+    # --- Producer side ---
+
+    def _enqueue(self, job_type, payload, document=None):
+        row = self.db.execute_query(
+            "INSERT INTO analysis_jobs (job_type, payload, document, max_attempts) VALUES (%s, %s, %s, %s) RETURNING job_id;",
+            (job_type, Json(payload), psycopg2.Binary(document) if document is not None else None, self.max_attempts), fetch='one'
+        )
+        self.db.execute_query(f"NOTIFY {NOTIFY_CHANNEL};")
+        return row[0] if row else None
+
+    def enqueue_contract_analysis(self, file_bytes, title, contract_type):
+        return self._enqueue(JOB_CONTRACT_ANALYSIS, {"title": title, "contract_type": contract_type}, file_bytes)
+
+    def enqueue_tco_recommendation(self, segment, tco_components, total_tco, company_name=None):
+        return self._enqueue(JOB_TCO_RECOMMENDATION, {"segment": segment, "tco_components": tco_components,
+                                                      "total_tco": total_tco, "company_name": company_name})
+
+    def enqueue_rfx_assessment(self, file_bytes, filename, title, company_name=None):
+        return self._enqueue(JOB_RFX_ASSESSMENT, {"filename": filename, "title": title, "company_name": company_name}, file_bytes)
+
+    def enqueue_batch_ingestion(self, source, contract_type, concurrency=4):
+        return self._enqueue(JOB_BATCH_INGESTION, {"source": source, "contract_type": contract_type, "concurrency": concurrency})
+
+    def get_job(self, job_id):
+        """Returns a job's status, result and error (without the uploaded document), or None."""
+        row = self.db.execute_query(
+            "SELECT job_id, job_type, status, payload, result, error, attempts, created_at, started_at, finished_at FROM analysis_jobs WHERE job_id = %s;",
+            (job_id,), fetch='one'
+        )
+        if not row:
+            return None
+        keys = ["job_id", "job_type", "status", "payload", "result", "error", "attempts", "created_at", "started_at", "finished_at"]
+        return dict(zip(keys, row))
+
+    def recent_jobs(self, job_type=None, limit=10):
+        rows = self.db.execute_query(
+            "SELECT job_id, job_type, status, payload, result, error, created_at, finished_at FROM analysis_jobs "
+            "WHERE %s IS NULL OR job_type = %s ORDER BY job_id DESC LIMIT %s;",
+            (job_type, job_type, limit), fetch='all'
+        ) or []
+        keys = ["job_id", "job_type", "status", "payload", "result", "error", "created_at", "finished_at"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    # --- Worker side ---
+
+    def claim(self, worker_id):
+        """Atomically claims the oldest runnable job; returns (job_id, job_type, payload, document) or None."""
+        row = self.db.execute_query(
+            "UPDATE analysis_jobs SET status = 'running', worker_id = %s, attempts = attempts + 1, started_at = NOW(), heartbeat_at = NOW() "
+            "WHERE job_id = (SELECT job_id FROM analysis_jobs WHERE status = 'queued' AND run_after <= NOW() ORDER BY job_id FOR UPDATE SKIP LOCKED LIMIT 1) "
+            "RETURNING job_id, job_type, payload, document;",
+            (worker_id,), fetch='one'
+        )
+        if not row:
+            return None
+        job_id, job_type, payload, document = row
+        return job_id, job_type, payload, bytes(document) if document is not None else None
+
+    def ownership_check(self, job_id, worker_id):
+        """
+        Returns an on_saved hook for DatabaseManager's save methods. Inside the save transaction it confirms that
+        `worker_id` still runs the job, and refreshes its heartbeat so the job is not requeued before the commit.
+        If the job was handed to another worker, it raises JobOwnershipLost and nothing is saved.
+        """
+        def check(uow, _record_id):
+            if not uow.execute("UPDATE analysis_jobs SET heartbeat_at = NOW() WHERE job_id = %s AND worker_id = %s AND status = 'running' RETURNING job_id;",
+                               (job_id, worker_id), fetch='one'):
+                raise JobOwnershipLost(f"Job #{job_id} is no longer run by {worker_id}")
+        return check
+
+    def complete(self, job_id, worker_id, result):
+        """Stores the job's result if `worker_id` still runs it; returns False when another worker took it over."""
+        # The uploaded PDF is no longer needed once its analysis is stored.
+        row = self.db.execute_query(
+            "UPDATE analysis_jobs SET status = 'succeeded', result = %s, error = NULL, document = NULL, finished_at = NOW() "
+            "WHERE job_id = %s AND worker_id = %s AND status = 'running' RETURNING job_id;",
+            (Json(result), job_id, worker_id), fetch='one'
+        )
+        return row is not None
+
+    def fail(self, job_id, worker_id, error, retry_delay_seconds=10):
+        """
+        Requeues the job with a delay, or marks it failed once it ran out of attempts. Returns False, and
+        changes nothing, when `worker_id` no longer runs the job.
+        """
+        row = self.db.execute_query(
+            "UPDATE analysis_jobs SET error = %s, worker_id = NULL, "
+            "status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "run_after = NOW() + make_interval(secs => %s * attempts), "
+            "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END "
+            "WHERE job_id = %s AND worker_id = %s AND status = 'running' RETURNING job_id;",
+            (error[:2000], retry_delay_seconds, job_id, worker_id), fetch='one'
+        )
+        return row is not None
+
+    def heartbeat(self, worker_id, busy_seconds, jobs_processed, threads, hostname, pid):
+        """Refreshes the worker's liveness row and the heartbeat of the jobs it is running."""
+        self.db.execute_query(
+            "INSERT INTO job_workers (worker_id, hostname, pid, threads, busy_seconds, jobs_processed) VALUES (%s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (worker_id) DO UPDATE SET busy_seconds = EXCLUDED.busy_seconds, jobs_processed = EXCLUDED.jobs_processed, last_heartbeat = NOW();",
+            (worker_id, hostname, pid, threads, busy_seconds, jobs_processed)
+        )
+        self.db.execute_query("UPDATE analysis_jobs SET heartbeat_at = NOW() WHERE worker_id = %s AND status = 'running';", (worker_id,))
+
+    def requeue_stale(self):
+        """
+        Returns jobs whose worker stopped heart-beating (e.g. crashed) to the queue, or marks them failed once
+        they used up their attempts, so a job that keeps killing its worker is not retried forever.
+        """
+        row = self.db.execute_query(
+            "WITH stale AS (UPDATE analysis_jobs SET worker_id = NULL, "
+            "status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "error = CASE WHEN attempts < max_attempts THEN error ELSE 'Worker stopped responding on the last attempt' END, "
+            "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END "
+            "WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s) RETURNING 1) SELECT COUNT(*) FROM stale;",
+            (self.stale_after_seconds,), fetch='one'
+        )
+        return row[0] if row else 0
+
+    # --- Monitoring ---
+
+    def stats(self, window_minutes=60):
+        """Returns queue depth, job latency percentiles over the window and worker utilization."""
+        # One round-trip for all three aggregates; the dashboard loads this next to its other datasets.
+        row = self.db.execute_query(
+            "WITH depth AS (SELECT COUNT(*) FILTER (WHERE status = 'queued') AS queued, COUNT(*) FILTER (WHERE status = 'running') AS running "
+            "FROM analysis_jobs), "
+            "latency AS (SELECT COUNT(*) AS finished, "
+            "percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at)) AS p50, "
+            "percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at)) AS p95, "
+            "AVG(EXTRACT(EPOCH FROM started_at - created_at)) AS wait, "
+            "COUNT(*) FILTER (WHERE status = 'failed') AS failed "
+            "FROM analysis_jobs WHERE finished_at > NOW() - make_interval(mins => %s)), "
+            "workers AS (SELECT COUNT(*) AS active, COALESCE(SUM(threads), 0) AS threads, "
+            "COALESCE(SUM(busy_seconds) / NULLIF(SUM(threads * EXTRACT(EPOCH FROM last_heartbeat - started_at)), 0), 0) AS utilization "
+            "FROM job_workers WHERE last_heartbeat > NOW() - INTERVAL '30 seconds') "
+            "SELECT depth.*, latency.*, workers.* FROM depth, latency, workers;",
+            (window_minutes,), fetch='one'
+        ) or (0, 0, 0, None, None, None, 0, 0, 0, 0)
+        depth, latency, workers = row[:2], row[2:7], row[7:]
+        return {
+            "queued": depth[0], "running": depth[1],
+            "finished_recently": latency[0], "failed_recently": latency[4],
+            "latency_p50_s": round(float(latency[1]), 2) if latency[1] is not None else None,
+            "latency_p95_s": round(float(latency[2]), 2) if latency[2] is not None else None,
+            "avg_queue_wait_s": round(float(latency[3]), 2) if latency[3] is not None else None,
+            "active_workers": workers[0], "worker_threads": int(workers[1]),
+            "worker_utilization": round(min(float(workers[2]), 1.0), 3),
+        }
+
+    def has_active_workers(self):
+        row = self.db.execute_query("SELECT EXISTS (SELECT 1 FROM job_workers WHERE last_heartbeat > NOW() - INTERVAL '30 seconds');", fetch='one')
+        return bool(row and row[0])
@@ -0,0 +1,337 @@
+# metrics.py
+"""
+In-process performance instrumentation: query latency histograms keyed by normalized SQL, LLM latency,
+token usage (including prompt cache reads and the tokens preprocessing saved) and cost per call site and
+per call, page render times, and a slow-query log. Everything is exported in
+the Prometheus text format, from an optional HTTP endpoint (METRICS_PORT) and on the admin page.
+
+Configured through METRICS_* environment variables (see configure_metrics_from_env). With
+METRICS_ENABLED=false every record call returns after a single attribute check.
+"""
+import bisect
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+MAX_QUERY_SERIES = 500  # distinct normalized statements tracked before further ones are counted as "other"
+# USD per million input / output tokens, matched by model name prefix.
+MODEL_PRICES = {
+    "claude-3-opus": (15.0, 75.0), "claude-3-sonnet": (3.0, 15.0), "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-7-sonnet": (3.0, 15.0), "claude-3-haiku": (0.25, 1.25), "claude-3-5-haiku": (0.8, 4.0),
+}
+CACHE_WRITE_PRICE_FACTOR = 1.25  # prompt cache writes and reads, relative to the input token price
+CACHE_READ_PRICE_FACTOR = 0.1
+
+slow_query_log = logging.getLogger("slow_queries")
+llm_usage_log = logging.getLogger("llm_usage")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"VALUES\s*(\([^()]*\)\s*,?\s*)+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Reduces a statement to its shape: literals become ?, multi-row VALUES lists collapse, whitespace is squeezed."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    query = _VALUE_LISTS.sub("VALUES (...) ", query)
+    query = _LITERALS.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";")[:300]
+
+
+def model_prices(model):
+    """(input, output) USD per million tokens for `model`; LLM_PRICE_INPUT_PER_MTOK / LLM_PRICE_OUTPUT_PER_MTOK override."""
+    if os.getenv("LLM_PRICE_INPUT_PER_MTOK") or os.getenv("LLM_PRICE_OUTPUT_PER_MTOK"):
+        return float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0")), float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "0"))
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return MODEL_PRICES["claude-3-sonnet"]
+
+
+class Histogram:
+    """A Prometheus-style histogram: cumulative bucket counts, sum and count."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates a quantile from the buckets (the upper bound of the bucket holding it)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        total, rows = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+
+class MetricsRegistry:
+    """Thread-safe store of all recorded metrics; one per process (METRICS)."""
+    def __init__(self, enabled=True, slow_query_seconds=0.25, slow_log_size=200, recent_call_size=200):
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_seconds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.recent_llm_calls = deque(maxlen=recent_call_size)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = {}  # normalized SQL -> Histogram
+            self.query_errors = {}
+            self.llm_calls = {}  # (call_site, model) -> {"latency": Histogram, "input_tokens", "cache_read_tokens", ..., "errors"}
+            self.pages = {}  # page -> Histogram
+            self.slow_queries.clear()
+            self.recent_llm_calls.clear()
+
+    # --- Recording ---
+
+    def observe_query(self, query, seconds, failed=False):
+        if not self.enabled:
+            return
+        key = normalize_sql(query)
+        with self._lock:
+            if key not in self.queries and len(self.queries) >= MAX_QUERY_SERIES:
+                key = "other"
+            histogram = self.queries.get(key)
+            if histogram is None:
+                histogram = self.queries[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            if failed:
+                self.query_errors[key] = self.query_errors.get(key, 0) + 1
+            if seconds >= self.slow_query_seconds:
+                self.slow_queries.append({"at": time.time(), "seconds": round(seconds, 4), "query": key})
+        if seconds >= self.slow_query_seconds:
+            slow_query_log.warning("slow query (%.0f ms): %s", seconds * 1000, key)
+
+    def observe_llm_call(self, call_site, model, seconds, input_tokens=0, output_tokens=0, failed=False,
+                         cache_read_tokens=0, cache_write_tokens=0, tokens_saved=0):
+        """
+        Records one call. `input_tokens` are the uncached input tokens (the API reports cache reads and writes
+        separately); `tokens_saved` are the tokens preprocessing removed before the request was sent.
+        """
+        if not self.enabled:
+            return
+        input_price, output_price = model_prices(model)
+        cost = (input_tokens * input_price + cache_write_tokens * input_price * CACHE_WRITE_PRICE_FACTOR
+                + cache_read_tokens * input_price * CACHE_READ_PRICE_FACTOR + output_tokens * output_price) / 1_000_000
+        record = {"at": time.time(), "call_site": call_site, "model": model, "seconds": round(seconds, 3), "input_tokens": input_tokens,
+                  "cache_read_tokens": cache_read_tokens, "cache_write_tokens": cache_write_tokens, "output_tokens": output_tokens,
+                  "tokens_saved": tokens_saved, "cache_read_ratio": cache_read_ratio(input_tokens, cache_read_tokens, cache_write_tokens),
+                  "cost_usd": round(cost, 6), "failed": failed}
+        with self._lock:
+            stats = self.llm_calls.get((call_site, model))
+            if stats is None:
+                stats = self.llm_calls[(call_site, model)] = {
+                    "latency": Histogram(LLM_BUCKETS), "input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0,
+                    "output_tokens": 0, "tokens_saved": 0, "cost_usd": 0.0, "errors": 0}
+            stats["latency"].observe(seconds)
+            stats["input_tokens"] += input_tokens
+            stats["cache_read_tokens"] += cache_read_tokens
+            stats["cache_write_tokens"] += cache_write_tokens
+            stats["output_tokens"] += output_tokens
+            stats["tokens_saved"] += tokens_saved
+            stats["cost_usd"] += cost
+            stats["errors"] += int(failed)
+            self.recent_llm_calls.append(record)
+        self._local.last_llm_call = record
+        llm_usage_log.info("%s: %d input tokens (%d cache read, %d cache write, %.0f%% from cache), %d saved by preprocessing, %d output",
+                           call_site, input_tokens + cache_read_tokens + cache_write_tokens, cache_read_tokens, cache_write_tokens,
+                           record["cache_read_ratio"] * 100, tokens_saved, output_tokens)
+
+    def last_llm_call(self, since=None):
+        """The most recent call recorded on this thread (optionally only if it started after the `since` timestamp), or None."""
+        record = getattr(self._local, "last_llm_call", None)
+        if record is None or (since is not None and record["at"] - record["seconds"] < since):
+            return None
+        return record
+
+    def observe_page(self, page, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.pages.get(page)
+            if histogram is None:
+                histogram = self.pages[page] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time_page(self, page):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_page(page, time.perf_counter() - started)
+
+    @contextmanager
+    def llm_call(self, call_site, model, tokens_saved=0):
+        """
+        Times an Anthropic Messages API call and records its token usage and cost:
+        with METRICS.llm_call("tco_recommendation", model) as call: call.message = client.messages.create(...)
+        """
+        call = LLMCall()
+        if not self.enabled:
+            yield call
+            return
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield call
+            failed = False
+        finally:
+            usage = getattr(call.message, "usage", None)
+            self.observe_llm_call(call_site, model, time.perf_counter() - started, getattr(usage, "input_tokens", 0) or 0,
+                                  getattr(usage, "output_tokens", 0) or 0, failed, getattr(usage, "cache_read_input_tokens", 0) or 0,
+                                  getattr(usage, "cache_creation_input_tokens", 0) or 0, tokens_saved)
+
+    # --- Reporting ---
+
+    def query_summary(self):
+        with self._lock:
+            return sorted((
+                {"query": key, "calls": h.count, "total_ms": round(h.sum * 1000, 1), "avg_ms": round(h.sum / h.count * 1000, 2),
+                 "p95_ms": round(h.quantile(0.95) * 1000, 1), "max_ms": round(h.max * 1000, 1), "errors": self.query_errors.get(key, 0)}
+                for key, h in self.queries.items()
+            ), key=lambda row: row["total_ms"], reverse=True)
+
+    def llm_summary(self):
+        with self._lock:
+            return [
+                {"call_site": call_site, "model": model, "calls": s["latency"].count, "avg_s": round(s["latency"].sum / s["latency"].count, 2),
+                 "p95_s": round(s["latency"].quantile(0.95), 2), "input_tokens": s["input_tokens"], "cache_read_tokens": s["cache_read_tokens"],
+                 "cache_write_tokens": s["cache_write_tokens"], "output_tokens": s["output_tokens"], "tokens_saved": s["tokens_saved"],
+                 "cache_read_ratio": cache_read_ratio(s["input_tokens"], s["cache_read_tokens"], s["cache_write_tokens"]),
+                 "cost_usd": round(s["cost_usd"], 4), "errors": s["errors"]}
+                for (call_site, model), s in self.llm_calls.items()
+            ]
+
+    def page_summary(self):
+        with self._lock:
+            return [{"page": page, "renders": h.count, "avg_ms": round(h.sum / h.count * 1000, 1),
+                     "p95_ms": round(h.quantile(0.95) * 1000, 1), "max_ms": round(h.max * 1000, 1)} for page, h in self.pages.items()]
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            _histogram_lines(lines, "cma_db_query_duration_seconds", "Database statement latency by normalized SQL.",
+                             {(("query", key),): h for key, h in self.queries.items()})
+            lines += ["# HELP cma_db_query_errors_total Failed database statements by normalized SQL.", "# TYPE cma_db_query_errors_total counter"]
+            lines += [f'cma_db_query_errors_total{{query="{_escape(key)}"}} {count}' for key, count in self.query_errors.items()]
+            _histogram_lines(lines, "cma_llm_request_duration_seconds", "LLM request latency by call site.",
+                             {(("call_site", site), ("model", model)): s["latency"] for (site, model), s in self.llm_calls.items()})
+            for name, field, help_text in (("cma_llm_input_tokens_total", "input_tokens", "Uncached LLM input tokens by call site."),
+                                           ("cma_llm_cache_read_tokens_total", "cache_read_tokens", "LLM input tokens read from the prompt cache by call site."),
+                                           ("cma_llm_cache_write_tokens_total", "cache_write_tokens", "LLM input tokens written to the prompt cache by call site."),
+                                           ("cma_llm_tokens_saved_total", "tokens_saved", "LLM input tokens removed by prompt preprocessing by call site."),
+                                           ("cma_llm_output_tokens_total", "output_tokens", "LLM output tokens by call site."),
+                                           ("cma_llm_cost_usd_total", "cost_usd", "Estimated LLM cost in USD by call site."),
+                                           ("cma_llm_errors_total", "errors", "Failed LLM requests by call site.")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f'{name}{{call_site="{_escape(site)}",model="{_escape(model)}"}} {s[field]}' for (site, model), s in self.llm_calls.items()]
+            _histogram_lines(lines, "cma_page_render_duration_seconds", "Streamlit page render time.",
+                             {(("page", page),): h for page, h in self.pages.items()})
+        return "\n".join(lines) + "\n"
+
+    # --- Export ---
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serves /metrics in the Prometheus text format from a daemon thread; only on localhost unless another host is given."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        return server
+
+
+def cache_read_ratio(input_tokens, cache_read_tokens, cache_write_tokens):
+    """Share of a request's input tokens that were read from the prompt cache."""
+    total = input_tokens + cache_read_tokens + cache_write_tokens
+    return round(cache_read_tokens / total, 3) if total else 0.0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _histogram_lines(lines, name, help_text, series):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series.items():
+        label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+        lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+
+
+class LLMCall:
+    """Handle yielded by MetricsRegistry.llm_call; set `message` to the API response to record its token usage."""
+    __slots__ = ("message",)
+
+    def __init__(self):
+        self.message = None
+
+
+def configure_metrics_from_env(registry=None):
+    """
+    Applies METRICS_ENABLED and METRICS_SLOW_QUERY_MS to the process-wide registry and serves it on
+    METRICS_PORT when set, bound to METRICS_HOST (default 127.0.0.1; the endpoint has no authentication,
+    so exposing it on other interfaces is opt-in). Called once per process after the environment has been loaded.
+    """
+    registry = registry or METRICS
+    registry.enabled = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+    registry.slow_query_seconds = float(os.getenv("METRICS_SLOW_QUERY_MS", "250")) / 1000
+    port = os.getenv("METRICS_PORT")
+    if registry.enabled and port:
+        try:
+            registry.start_http_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+        except OSError:
+            pass  # another process (e.g. a second worker) already serves this port
+    return registry
+
+
+METRICS = MetricsRegistry()
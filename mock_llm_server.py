@@ -0,0 +1,273 @@
+# mock_llm_server.py
+"""
+A local stand-in for the Anthropic Messages API, for offline development and benchmarking.
+
+It answers POST /v1/messages with schema-valid JSON for the prompts in prompts.py after a configurable
+latency plus an optional time per output token (streamed as server-sent events when the request sets
+"stream": true), and can inject rate-limit
+errors. Prompt caching is emulated: a prefix marked with cache_control that is long enough is reported as
+a cache write on first use and as a cache read for five minutes after each use. POST
+/v1/messages/count_tokens is answered too. Point the app at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8765.
+
+Usage: python mock_llm_server.py [--port 8765] [--latency 0.5] [--jitter 0.2] [--output-token-latency 0.0] [--error-rate 0.0]
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CLAUSE_CATEGORIES = [
+    "Service Level Agreements (SLAs)", "Liability Caps & Indemnification", "Intellectual Property (IP) Rights",
+    "Data Protection & Privacy", "Termination Provisions", "Exclusivity Clauses",
+]
+RISK_LEVELS = ["Low", "Medium", "High"]
+MIN_CACHEABLE_TOKENS = 1024  # the API's minimum prompt cache prefix for Sonnet and Opus models
+CACHE_TTL_S = 300
+
+
+def _find(pattern, text, default="Not Found"):
+    match = re.search(pattern, text, re.IGNORECASE)
+    return match.group(0).strip() if match else default
+
+
+def contract_analysis_response(prompt, rng):
+    """Builds a contract analysis in the shape requested by get_contract_analysis_prompt, reading obvious terms from the text."""
+    contract = re.search(r"Contract Text:\s*---(.*?)\n\s*---", prompt, re.DOTALL)
+    text = contract.group(1) if contract else ""
+    risks = [
+        {"clause_category": category, "risk_level": rng.choice(RISK_LEVELS),
+         "summary": f"Synthetic assessment of the {category.lower()} provisions."}
+        for category in rng.sample(CLAUSE_CATEGORIES, rng.randint(2, len(CLAUSE_CATEGORIES)))
+    ]
+    key_terms = {
+        "Renewal Term": _find(r"renews automatically for \d+ year\(?s?\)?", text),
+        "Notice Period for Non-Renewal": _find(r"\d+ days written notice", text),
+        "Payment Terms": _find(r"Net \d+", text),
+        "Governing Law & Jurisdiction": _find(r"laws of [A-Z][\w ]+", text),
+    }
+    return {"risk_analysis": risks, "key_terms": key_terms}
+
+
+def tco_pricing_response(prompt, rng):
+    """Builds a recommendation in the shape requested by get_tco_pricing_prompt."""
+    return {
+        "tco_insight": "Annual operational costs, mainly personnel, dominate the five-year TCO.",
+        "recommended_model": rng.choice(["Tiered-Feature Subscription", "Usage-Based Pricing", "Hybrid Model"]),
+        "pricing_strategy": f"Start at EUR {rng.randint(8, 40) * 1000:,} per month with volume tiers.",
+        "value_propositions": ["Lower operational overhead", "Faster time to market", "Predictable costs"],
+    }
+
+
+def partner_insight_response(prompt, rng):
+    """Builds a partner performance review for get_partner_insight_prompt."""
+    return {
+        "summary": "Revenue is on target while certified engineer headcount trails the plan.",
+        "strengths": ["Quarterly revenue above target", "High renewal rate"],
+        "concerns": ["Certified engineers below target", "Pipeline coverage under 3x"],
+        "recommendations": [f"Fund {rng.randint(2, 6)} additional certifications this quarter", "Run a joint pipeline review"],
+    }
+
+
+def rfx_risk_response(prompt, rng):
+    """Assesses every "[id] requirement" line of an RFx batch (get_rfx_risk_messages); obviously onerous wording scores High."""
+    requirements = re.findall(r"^\[(\d+)\] (.+)$", prompt, re.MULTILINE)
+    return {"requirements": [
+        {"id": int(requirement_id),
+         "risk_level": "High" if re.search(r"unlimited|indemnif|escrow|without indexation|99\.999", text, re.IGNORECASE) else rng.choice(RISK_LEVELS[:2]),
+         "category": rng.choice(["Commercial", "Legal", "Technical", "Delivery", "Compliance"]),
+         "rationale": "Synthetic assessment of the requirement."}
+        for requirement_id, text in requirements
+    ]}
+
+
+def build_reply(prompt):
+    """Returns the reply text for a prompt; deterministic for a given prompt."""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    if '"risk_analysis", "key_terms"' in prompt:
+        return json.dumps(contract_analysis_response(prompt, rng))
+    if '"tco_insight"' in prompt:
+        return json.dumps(tco_pricing_response(prompt, rng))
+    if "partner performance data" in prompt:
+        return json.dumps(partner_insight_response(prompt, rng))
+    if "RFx requirements" in prompt:
+        return json.dumps(rfx_risk_response(prompt, rng))
+    return json.dumps({"summary": "Synthetic response from the local Anthropic stand-in."})
+
+
+def prompt_text(body):
+    """Concatenates the text of the system prompt and all message content blocks."""
+    parts = []
+    system = body.get("system")
+    for block in ([system] if isinstance(system, str) else system or []):
+        parts.append(block if isinstance(block, str) else block.get("text", ""))
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        for block in ([content] if isinstance(content, str) else content):
+            parts.append(block if isinstance(block, str) else block.get("text", ""))
+    return "\n".join(parts)
+
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def cached_prefix(body):
+    """The text up to and including the last block marked with cache_control (system blocks, then messages), or None."""
+    blocks = [] if isinstance(body.get("system"), str) else list(body.get("system") or [])
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        blocks += [{"text": content}] if isinstance(content, str) else content
+    marked = [i for i, block in enumerate(blocks) if isinstance(block, dict) and block.get("cache_control")]
+    if not marked:
+        return None
+    return "\n".join(block.get("text", "") if isinstance(block, dict) else block for block in blocks[:marked[-1] + 1])
+
+
+class MockMessagesHandler(BaseHTTPRequestHandler):
+    server_version = "MockAnthropic/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/").endswith("/v1/messages/count_tokens"):
+            self._send_json(200, {"input_tokens": count_tokens(prompt_text(body))})
+            return
+        if not self.path.rstrip("/").endswith("/v1/messages"):
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        settings = self.server
+        if settings.error_rate and random.random() < settings.error_rate:
+            self._send_json(429, {"type": "error", "error": {"type": "rate_limit_error", "message": "Mock rate limit"}}, {"retry-after": "1"})
+            return
+        prompt = prompt_text(body)
+        reply = build_reply(prompt)
+        latency = max(0.0, random.gauss(settings.latency, settings.jitter)) + settings.output_token_latency * count_tokens(reply)
+        with settings.lock:
+            settings.requests_served += 1
+        message = {
+            "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {**settings.input_usage(body, prompt), "output_tokens": count_tokens(reply)},
+        }
+        if body.get("stream"):
+            self._stream_message(message, latency)
+            return
+        time.sleep(latency)
+        self._send_json(200, message)
+
+    def _send_event(self, event, payload):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream_message(self, message, latency, chunk_chars=24):
+        """
+        Replies with server-sent events like the real streaming API. A fifth of the latency passes before
+        the first token and the rest is spread over the text deltas, so early fields arrive early.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        text, usage = message["content"][0]["text"], message["usage"]
+        time.sleep(latency * 0.2)
+        self._send_event("message_start", {"type": "message_start", "message": {
+            **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}}})
+        self._send_event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for chunk in chunks:
+            self._send_event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}})
+            time.sleep(latency * 0.8 / max(len(chunks), 1))
+        self._send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._send_event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                           "usage": {"output_tokens": usage["output_tokens"]}})
+        self._send_event("message_stop", {"type": "message_stop"})
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, latency=0.5, jitter=0.1, error_rate=0.0, verbose=False, output_token_latency=0.0):
+        super().__init__((host, port), MockMessagesHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.output_token_latency = output_token_latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.prompt_cache = {}  # prefix hash -> expiry time
+
+    def input_usage(self, body, prompt):
+        """Input token usage of a request, split into uncached, cache-read and cache-write tokens like the real API."""
+        total = count_tokens(prompt)
+        usage = {"input_tokens": total, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        prefix = cached_prefix(body)
+        if prefix is None or count_tokens(prefix) < MIN_CACHEABLE_TOKENS:
+            return usage
+        key = hashlib.sha256(f"{body.get('model')}\n{prefix}".encode("utf-8")).hexdigest()
+        now = time.time()
+        with self.lock:
+            hit = self.prompt_cache.get(key, 0) > now
+            self.prompt_cache[key] = now + CACHE_TTL_S
+        prefix_tokens = min(count_tokens(prefix), total)
+        usage["cache_read_input_tokens" if hit else "cache_creation_input_tokens"] = prefix_tokens
+        usage["input_tokens"] = total - prefix_tokens
+        return usage
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_in_background(self):
+        """Serves requests from a daemon thread and returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the latency in seconds")
+    parser.add_argument("--output-token-latency", type=float, default=0.0, help="additional seconds per generated output token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    server = MockLLMServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.verbose, args.output_token_latency)
+    print(f"Mock Anthropic API listening on {server.base_url} (latency {args.latency}s ± {args.jitter}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
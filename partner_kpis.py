@@ -0,0 +1,80 @@
+# partner_kpis.py
+"""
+Bulk loading of partner KPI facts from CSV, e.g. a monthly export from the partner portal or CRM.
+
+One row per partner, KPI and period: partner,kpi,period,actual[,target]. Periods are dates
+(2025-03-31) or months (2025-03, stored as the first of the month). Values may use thousands separators.
+Rows are loaded with DatabaseManager.save_partner_kpis, which also refreshes the monthly and quarterly rollups.
+
+Usage: python partner_kpis.py kpis.csv [more.csv ...]
+"""
+import argparse
+import csv
+import io
+import re
+from datetime import date, datetime
+
+MONTH_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})$")
+COLUMN_NAMES = {
+    "partner": ("partner", "partner name", "company", "company name"),
+    "kpi": ("kpi", "kpi name", "metric"),
+    "period": ("period", "date", "month", "period date"),
+    "actual": ("actual", "value", "actual value", "kpi value"),
+    "target": ("target", "target value"),
+}
+
+
+def parse_period(value):
+    value = value.strip()
+    month = MONTH_PATTERN.match(value)
+    if month:
+        return date(int(month.group(1)), int(month.group(2)), 1)
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
+
+def parse_number(value):
+    value = (value or "").strip().replace(",", "").replace("%", "").replace("€", "")
+    return float(value) if value else None
+
+
+def read_kpi_csv(data):
+    """(partner, kpi_name, period_date, actual, target) tuples from CSV text; raises ValueError naming the first bad row."""
+    reader = csv.DictReader(io.StringIO(data))
+    headers = {(name or "").strip().lower(): name for name in reader.fieldnames or []}
+    columns = {key: next((headers[name] for name in names if name in headers), None) for key, names in COLUMN_NAMES.items()}
+    missing = [key for key in ("partner", "kpi", "period", "actual") if columns[key] is None]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    facts = []
+    for line, row in enumerate(reader, start=2):
+        try:
+            actual = parse_number(row[columns["actual"]])
+            if actual is None:
+                continue
+            facts.append((row[columns["partner"]].strip(), row[columns["kpi"]].strip(), parse_period(row[columns["period"]]), actual,
+                          parse_number(row[columns["target"]]) if columns["target"] else None))
+        except (ValueError, AttributeError) as e:
+            raise ValueError(f"Row {line}: {e}") from e
+    return facts
+
+
+def main():
+    from dotenv import load_dotenv
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="CSV files with partner,kpi,period,actual[,target] columns")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = DatabaseManager()
+    db.initialize_database()
+    for path in args.files:
+        with open(path, encoding="utf-8-sig") as f:
+            facts = read_kpi_csv(f.read())
+        loaded = db.save_partner_kpis(facts)
+        print(f"{path}: {loaded or 0:,} KPI values loaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# pdf_extraction.py
+import atexit
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import PyPDF2
+
+
+class PageTextCache:
+    """A thread-safe LRU cache of extracted page text keyed by (document hash, page index), bounded by total characters."""
+    def __init__(self, max_chars=50_000_000):
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, document_hash, page_index):
+        with self._lock:
+            text = self._entries.get((document_hash, page_index))
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((document_hash, page_index))
+            self.hits += 1
+            return text
+
+    def contains(self, document_hash, page_index):
+        """Checks for a cached page without touching the LRU order or the hit/miss counters."""
+        with self._lock:
+            return (document_hash, page_index) in self._entries
+
+    def put(self, document_hash, page_index, text):
+        with self._lock:
+            key = (document_hash, page_index)
+            if key in self._entries:
+                self._chars -= len(self._entries.pop(key))
+            self._entries[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "pages": len(self._entries), "chars": self._chars}
+
+
+# --- Worker process side ---
+_worker_document = (None, None)  # (document_hash, PdfReader) of the last document this worker opened
+
+
+def _extract_page_batch(path, document_hash, page_indices):
+    global _worker_document
+    if _worker_document[0] != document_hash:
+        with open(path, "rb") as f:
+            _worker_document = (document_hash, PyPDF2.PdfReader(BytesIO(f.read())))
+    reader = _worker_document[1]
+    return [(index, reader.pages[index].extract_text() or "") for index in page_indices]
+
+
+class PDFExtractionEngine:
+    """
+    Extracts PDF text page by page through a generator.
+
+    Uncached pages are fanned out in batches to a shared process pool (created lazily and reused
+    across documents), results are yielded in page order as they complete, and extraction stops early
+    once `max_chars` characters have been produced. Page text is cached by document hash and page index,
+    so re-reading a document only extracts pages that were not seen before.
+    """
+    def __init__(self, workers=None, batch_size=8, parallel_threshold=24, cache=None):
+        self.workers = workers or max(1, min(8, (os.cpu_count() or 2) - 1))
+        self.batch_size = batch_size
+        self.parallel_threshold = parallel_threshold
+        self.cache = cache if cache is not None else PageTextCache()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # "spawn" keeps workers safe to start from Streamlit's script threads.
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(self.shutdown)
+            return self._executor
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def iter_pages(self, file_bytes, max_chars=None):
+        """Yields (page_index, text) in page order, stopping once `max_chars` characters have been yielded."""
+        document_hash = hashlib.sha256(file_bytes).hexdigest()
+        reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+        page_count = len(reader.pages)
+        produced = 0
+
+        missing = [index for index in range(page_count) if not self.cache.contains(document_hash, index)]
+        if len(missing) < self.parallel_threshold or self.workers == 1:
+            pages = self._iter_sequential(reader, document_hash, page_count)
+        else:
+            del reader  # workers open their own copy; don't keep the parsed document alive here
+            pages = self._iter_parallel(file_bytes, document_hash, page_count, missing)
+
+        for index, text in pages:
+            yield index, text
+            produced += len(text)
+            if max_chars is not None and produced >= max_chars:
+                pages.close()
+                return
+
+    def _iter_sequential(self, reader, document_hash, page_count):
+        for index in range(page_count):
+            text = self.cache.get(document_hash, index)
+            if text is None:
+                text = reader.pages[index].extract_text() or ""
+                self.cache.put(document_hash, index, text)
+            yield index, text
+
+    def _iter_parallel(self, file_bytes, document_hash, page_count, missing):
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_bytes)
+            executor = self._get_executor()
+            batches = deque(missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size))
+            in_flight = deque()
+            ready = {}
+            max_in_flight = self.workers * 2  # bounded look-ahead keeps memory flat for huge documents
+            missing_set = set(missing)
+            try:
+                for index in range(page_count):
+                    text = ready.pop(index, None)
+                    if text is None and index not in missing_set:
+                        text = self.cache.get(document_hash, index)
+                        if text is None:  # evicted since the initial scan; extract it again
+                            batches.appendleft([index])
+                            missing_set.add(index)
+                    while text is None:
+                        while batches and len(in_flight) < max_in_flight:
+                            in_flight.append(executor.submit(_extract_page_batch, path, document_hash, batches.popleft()))
+                        for page_index, page_text in in_flight.popleft().result():
+                            self.cache.put(document_hash, page_index, page_text)
+                            ready[page_index] = page_text
+                        text = ready.pop(index, None)
+                    yield index, text
+            finally:
+                for future in in_flight:
+                    future.cancel()
+                for future in in_flight:
+                    if not future.cancelled():
+                        future.exception()  # wait, so the temp file is not removed under a running worker
+        finally:
+            os.remove(path)
+
+    def extract_text(self, file_bytes, max_chars=None):
+        """Returns the document text (pages separated by newlines), truncated to `max_chars` if given."""
+        text = "\n".join(page_text for _, page_text in self.iter_pages(file_bytes, max_chars))
+        return text[:max_chars] if max_chars is not None else text
+
+
+def create_extraction_engine_from_env():
+    """Builds the extraction engine with settings from PDF_EXTRACT_* environment variables."""
+    workers = os.getenv("PDF_EXTRACT_WORKERS")
+    return PDFExtractionEngine(
+        workers=int(workers) if workers else None,
+        cache=PageTextCache(max_chars=int(os.getenv("PDF_PAGE_CACHE_MAX_CHARS", "50000000"))),
+    )
@@ -0,0 +1,81 @@
+# prompt_budget.py
+"""
+Counts the input tokens of an LLM request before it is sent and enforces a per-request budget.
+
+Tokens are estimated locally by default (no network round-trip); PROMPT_TOKEN_COUNTING=api asks the
+Messages API's token counting endpoint instead, for exact numbers on single requests. Configured through
+PROMPT_* environment variables (see create_prompt_budget_from_env).
+"""
+import math
+import os
+
+CHARS_PER_TOKEN = 3.5  # conservative for English contract prose, so estimates err on the high side
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised before sending a request whose input would exceed the configured token budget."""
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class PromptRequest:
+    """A prepared request: the system prefix and messages to send, their input token count and the tokens preprocessing saved."""
+    def __init__(self, system, messages, input_tokens, tokens_saved=0):
+        self.system = system
+        self.messages = messages
+        self.input_tokens = input_tokens
+        self.tokens_saved = tokens_saved
+
+    @classmethod
+    def from_text(cls, prompt):
+        """Wraps a plain prompt as a single user message without a system prefix."""
+        return cls(None, [{"role": "user", "content": prompt}], estimate_tokens(prompt))
+
+    def api_kwargs(self):
+        """The `system` and `messages` arguments for client.messages.create / stream."""
+        return {"messages": self.messages, **({"system": self.system} if self.system else {})}
+
+
+class PromptBudget:
+    """Token counting and the per-request input budget (`max_input_tokens`; None disables the check)."""
+    def __init__(self, max_input_tokens=None, count_with_api=False):
+        self.max_input_tokens = max_input_tokens
+        self.count_with_api = count_with_api
+
+    def allows(self, *texts):
+        """Whether texts of this combined size fit the budget, by local estimate; used to plan chunking before requests are built."""
+        return not self.max_input_tokens or sum(estimate_tokens(text) for text in texts) <= self.max_input_tokens
+
+    def count(self, system, messages, client=None, model=None):
+        """Input tokens of a request: from the API when configured and a client is given, otherwise estimated."""
+        if self.count_with_api and client is not None:
+            import anthropic
+            try:
+                return client.messages.count_tokens(model=model, messages=messages, **({"system": system} if system else {})).input_tokens
+            except anthropic.APIError:
+                pass  # counting is best effort; fall back to the estimate
+        texts = [block["text"] for block in system or []]
+        texts += [message["content"] for message in messages if isinstance(message["content"], str)]
+        return sum(estimate_tokens(text) for text in texts)
+
+    def prepare(self, system, messages, client=None, model=None, tokens_saved=0):
+        """Counts a request's tokens and returns it as a PromptRequest; raises TokenBudgetExceeded when it is over budget."""
+        input_tokens = self.count(system, messages, client, model)
+        if self.max_input_tokens and input_tokens > self.max_input_tokens:
+            raise TokenBudgetExceeded(
+                f"Request needs {input_tokens:,} input tokens, over the budget of {self.max_input_tokens:,} (PROMPT_MAX_INPUT_TOKENS).")
+        return PromptRequest(system, messages, input_tokens, tokens_saved)
+
+
+def create_prompt_budget_from_env():
+    """
+    Builds the budget from PROMPT_MAX_INPUT_TOKENS (default 50,000; 0 disables the check)
+    and PROMPT_TOKEN_COUNTING ("estimate" or "api").
+    """
+    max_input_tokens = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "50000"))
+    return PromptBudget(
+        max_input_tokens=max_input_tokens or None,
+        count_with_api=os.getenv("PROMPT_TOKEN_COUNTING", "estimate").lower() == "api",
+    )
@@ -1,69 +1,135 @@
 # prompts.py
+import hashlib
 
-def get_contract_analysis_prompt(contract_text, contract_type):
+# The static instructions are sent as a system prefix and the variable data goes in the user message.
+
+CONTRACT_ANALYSIS_INSTRUCTIONS = """
+You are a meticulous AI Legal Assistant specializing in telecommunications contracts for a Commercial Manager.
+Your task is to analyze the following '{contract_type}' and provide a structured risk and key terms report.
+
+Based on your expertise in telecom agreements, perform the following analysis and provide the output in a valid JSON format only.
+
+1.  **Risk Analysis**: Identify and score critical risk factors. Focus specifically on:
+    - **Service Level Agreements (SLAs)**: Are the performance guarantees and penalty structures clear and reasonable?
+    - **Liability Caps & Indemnification**: Is the limitation of damages clear? Are the indemnification clauses balanced?
+    - **Intellectual Property (IP) Rights**: How is the ownership and licensing of software and technology handled?
+    - **Data Protection & Privacy**: Does it comply with relevant regulations (e.g., GDPR)?
+    - **Termination Provisions**: Are the notice periods and termination fees clearly defined and fair?
+    - **Exclusivity Clauses**: Are there any geographic or product-based exclusivity terms?
+
+2.  **Key Commercial Terms Extraction**: Extract the following specific terms from the contract text. If a term is not present, indicate "Not Found".
+    - **Renewal Term**: e.g., "Auto-renews for 1 year"
+    - **Notice Period for Non-Renewal**: e.g., "90 days"
+    - **Payment Terms**: e.g., "Net 30"
+    - **Governing Law & Jurisdiction**: e.g., "State of New York, USA"
+
+Structure your JSON response with these exact keys: "risk_analysis", "key_terms".
+For "risk_analysis", each item should have "clause_category", "risk_level" (Low, Medium, High), and "summary".
+For "key_terms", use the term name as the key.
+""".strip()
+
+def _system_prefix(instructions):
     """
-    Creates a detailed, role-specific prompt for AI contract analysis,
-    focusing on telecom industry risks as per the research report.
+    The system blocks for static instructions. They are not marked for prompt caching: the API only caches
+    prefixes of at least 1,024 tokens (Sonnet and Opus models), which these instructions do not reach, and
+    the data that follows them (contract text, TCO figures, requirement batches) differs between calls.
     """
-    return f"""
-    You are a meticulous AI Legal Assistant specializing in telecommunications contracts for a Commercial Manager.
-    Your task is to analyze the following '{contract_type}' and provide a structured risk and key terms report.
-
-    Contract Text:
-    ---
-    {contract_text}
-    ---
-
-    Based on your expertise in telecom agreements, perform the following analysis and provide the output in a valid JSON format only.
-
-    1.  **Risk Analysis**: Identify and score critical risk factors. Focus specifically on:
-        - **Service Level Agreements (SLAs)**: Are the performance guarantees and penalty structures clear and reasonable?
-        - **Liability Caps & Indemnification**: Is the limitation of damages clear? Are the indemnification clauses balanced?
-        - **Intellectual Property (IP) Rights**: How is the ownership and licensing of software and technology handled?
-        - **Data Protection & Privacy**: Does it comply with relevant regulations (e.g., GDPR)?
-        - **Termination Provisions**: Are the notice periods and termination fees clearly defined and fair?
-        - **Exclusivity Clauses**: Are there any geographic or product-based exclusivity terms?
-
-    2.  **Key Commercial Terms Extraction**: Extract the following specific terms from the contract text. If a term is not present, indicate "Not Found".
-        - **Renewal Term**: e.g., "Auto-renews for 1 year"
-        - **Notice Period for Non-Renewal**: e.g., "90 days"
-        - **Payment Terms**: e.g., "Net 30"
-        - **Governing Law & Jurisdiction**: e.g., "State of New York, USA"
-
-    Structure your JSON response with these exact keys: "risk_analysis", "key_terms".
-    For "risk_analysis", each item should have "clause_category", "risk_level" (Low, Medium, High), and "summary".
-    For "key_terms", use the term name as the key.
+    return [{"type": "text", "text": instructions}]
+
+def get_contract_analysis_messages(contract_text, contract_type, excerpt=None):
+    """
+    Returns (system, messages) for a contract analysis request: the instructions for the contract type as the
+    system prefix and the contract as the user message.
+    `excerpt` is an optional (part, total) tuple used when a long contract is analyzed in chunks.
     """
+    excerpt_note = ""
+    if excerpt:
+        excerpt_note = f"The text below is excerpt {excerpt[0]} of {excerpt[1]} of the contract. Report only what this excerpt contains.\n\n"
+    user_message = f"{excerpt_note}Contract Text:\n---\n{contract_text}\n---"
+    return (_system_prefix(CONTRACT_ANALYSIS_INSTRUCTIONS.format(contract_type=contract_type)),
+            [{"role": "user", "content": user_message}])
 
-def get_tco_pricing_prompt(segment, tco_components, historical_data_summary):
+def get_contract_analysis_prompt(contract_text, contract_type, excerpt=None):
+    """The contract analysis request as a single text (system prefix followed by the user message)."""
+    return _as_text(*get_contract_analysis_messages(contract_text, contract_type, excerpt))
+
+def get_contract_analysis_prompt_version(contract_type):
     """
-    Creates a comprehensive prompt for AI-driven TCO and pricing strategy recommendations,
-    incorporating business context as per the research report.
+    Returns a short fingerprint of the contract analysis instructions.
+    It changes automatically whenever the prompt template is edited, so cached analyses are not reused across prompt versions.
     """
-    return f"""
-    You are a Strategic Commercial Advisor to a "Commercial Manager Assistant" tool.
-    Your goal is to provide a pricing and TCO strategy for a software-based mobile network solution targeting the '{segment}' customer segment.
+    template = get_contract_analysis_prompt("{contract_text}", contract_type)
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
 
-    **Input Data:**
-    - **TCO Components Provided**: {tco_components}
-    - **Summary of Historical Deals for this Segment**: {historical_data_summary}
+TCO_PRICING_INSTRUCTIONS = """
+You are a Strategic Commercial Advisor to a "Commercial Manager Assistant" tool.
+Your goal is to provide a pricing and TCO strategy for a software-based mobile network solution targeting the customer segment named in the user message,
+using the TCO components and the summary of historical deals given there.
 
-    **Your Task:**
-    Based on the provided data, generate a strategic recommendation in a valid JSON format.
+**Your Task:**
+Based on the provided data, generate a strategic recommendation in a valid JSON format.
 
-    1.  **TCO Analysis Insight**: Provide a brief, one-sentence insight based on the provided TCO components. What is the likely key cost driver?
-    2.  **Recommended Commercial Model**: Based on the customer segment and TCO structure, recommend one primary commercial model from these options: "Tiered-Feature Subscription", "Usage-Based Pricing", or "Hybrid Model". Provide a brief justification.
-    3.  **Suggested Pricing Strategy**: Propose a starting price point or structure for the recommended model.
-    4.  **Key Value Propositions**: List three key value propositions to emphasize during negotiation that justify the price and align with the customer's likely priorities.
+1.  **TCO Analysis Insight**: Provide a brief, one-sentence insight based on the provided TCO components. What is the likely key cost driver?
+2.  **Recommended Commercial Model**: Based on the customer segment and TCO structure, recommend one primary commercial model from these options: "Tiered-Feature Subscription", "Usage-Based Pricing", or "Hybrid Model". Provide a brief justification.
+3.  **Suggested Pricing Strategy**: Propose a starting price point or structure for the recommended model.
+4.  **Key Value Propositions**: List three key value propositions to emphasize during negotiation that justify the price and align with the customer's likely priorities.
 
-    Structure your JSON response with these exact keys: "tco_insight", "recommended_model", "pricing_strategy", "value_propositions".
+Structure your JSON response with these exact keys: "tco_insight", "recommended_model", "pricing_strategy", "value_propositions".
+""".strip()
+
+def get_tco_pricing_messages(segment, tco_components, historical_data_summary):
+    """Returns (system, messages) for a TCO and pricing recommendation request."""
+    user_message = (f"**Customer Segment**: {segment}\n"
+                    f"**TCO Components Provided**: {tco_components}\n"
+                    f"**Summary of Historical Deals for this Segment**: {historical_data_summary or 'None available'}")
+    return (_system_prefix(TCO_PRICING_INSTRUCTIONS),
+            [{"role": "user", "content": user_message}])
+
+def get_tco_pricing_prompt(segment, tco_components, historical_data_summary):
+    """
+    Creates a comprehensive prompt for AI-driven TCO and pricing strategy recommendations,
+    incorporating business context as per the research report.
     """
+    return _as_text(*get_tco_pricing_messages(segment, tco_components, historical_data_summary))
+
+def _as_text(system, messages):
+    return "\n\n".join([block["text"] for block in system] + [message["content"] for message in messages])
 
 # Placeholders for future enhancements
 def get_partner_insight_prompt():
     """Placeholder prompt for partner performance analysis."""
     return "Analyze the provided partner performance data and provide strategic recommendations."
 
-def get_rfx_risk_prompt():
-    """Placeholder prompt for RFx risk assessment."""
-    return "Analyze the provided RFx requirements and identify key commercial, technical, and legal risks."
\ No newline at end of file
+RFX_RISK_INSTRUCTIONS = """
+You are a Bid Manager's risk analyst for a supplier of software-based mobile network solutions (cloud-native core,
+VoNR/IMS, OSS/BSS) responding to tenders from telecom operators and enterprises.
+The user message lists RFx requirements, one per line, each prefixed with its id in square brackets.
+Assess each requirement on its own for the risk it poses to the supplier if accepted as written, and reply in a valid JSON format only.
+
+For each requirement provide:
+- "id": the id from the square brackets, as a number.
+- "risk_level": "Low", "Medium" or "High".
+- "category": one of "Commercial", "Legal", "Technical", "Delivery", "Compliance".
+- "rationale": one sentence naming the clause, figure or obligation that drives the risk, or why the requirement is routine.
+
+High risk includes unlimited liability or uncapped indemnities, fixed multi-year prices without indexation, most favoured
+customer clauses, assignment of platform IP or source code, termination for convenience without compensation, availability
+above 99.999%, features not on the roadmap, fixed go-live dates with liquidated damages, and data sovereignty obligations
+without a local hosting option. Standard product capabilities, certifications the supplier holds, confidentiality and
+requirements about the format of the response or company information are Low.
+"Should" or "may" leaves room for an alternative and usually lowers the level; "at no additional cost", "unlimited" or
+"without limitation" usually raises it. When a requirement combines several aspects, use the highest risk it contains.
+
+Structure your JSON response as {"requirements": [...]} with one object per requirement id, in the order given,
+and include every id exactly once. Reply with the JSON object only, without markdown fences or commentary.
+""".strip()
+
+def get_rfx_risk_messages(requirements):
+    """Returns (system, messages) assessing a batch of requirements, given as (id, requirement text) pairs."""
+    lines = "\n".join(f"[{requirement_id}] {' '.join(text.split())}" for requirement_id, text in requirements)
+    return (_system_prefix(RFX_RISK_INSTRUCTIONS),
+            [{"role": "user", "content": f"RFx requirements to assess:\n{lines}"}])
+
+def get_rfx_risk_prompt(requirements):
+    """The RFx risk assessment request for a batch of (id, requirement text) pairs as a single text."""
+    return _as_text(*get_rfx_risk_messages(requirements))
\ No newline at end of file
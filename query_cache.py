@@ -0,0 +1,226 @@
+# query_cache.py
+import copy
+import functools
+import os
+import pickle
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import psycopg2
+
+CHANGE_CHANNEL = "table_changes"
+
+
+def _estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class QueryCache:
+    """
+    A read-through cache for DatabaseManager read methods, keyed by method and arguments.
+
+    Each entry remembers the version of every table it was read from. Writes bump table versions,
+    either directly (mutators of this process) or through Postgres NOTIFY from table triggers, which
+    keeps several app and worker processes coherent. Entries also expire after `ttl_seconds`, and the
+    least recently used ones are evicted once `max_entries` or `max_bytes` is exceeded.
+    """
+    def __init__(self, ttl_seconds=60.0, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, versions, stored_at, size, load_seconds)
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._render = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.time_saved_s = 0.0
+        self.listening = False
+        self._stop = threading.Event()
+
+    # --- Versions ---
+
+    def _snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def invalidate(self, *tables):
+        """Marks every cached result read from one of `tables` as stale."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # --- Lookups ---
+
+    def get_or_load(self, key, tables, load):
+        """
+        Returns the cached value for `key`, or calls `load()` and caches its result. `load` returns
+        (value, cacheable); failed reads should not be cached. Callers get a private copy either way.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, versions, stored_at, size, load_seconds = entry
+                if versions == self._snapshot(tables) and now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.time_saved_s += load_seconds
+                    self._count_render(True, load_seconds)
+                    return copy.deepcopy(value)
+                self._drop(key)
+            self.misses += 1
+            # Taken before the read: a write that commits while it runs leaves the new entry stale.
+            versions = self._snapshot(tables)
+            listening = self.listening
+
+        started = time.perf_counter()
+        value, cacheable = load()
+        load_seconds = time.perf_counter() - started
+        with self._lock:
+            self._count_render(False, 0.0)
+        if cacheable and listening:
+            size = _estimate_size(value)
+            if size <= self.max_bytes:
+                with self._lock:
+                    if key in self._entries:
+                        self._drop(key)
+                    self._entries[key] = (copy.deepcopy(value), versions, time.monotonic(), size, load_seconds)
+                    self._bytes += size
+                    self._evict()
+        return value
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[3]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    # --- Reporting ---
+
+    def _count_render(self, hit, saved):
+        counters = getattr(self._render, "counters", None)
+        if counters is not None:
+            counters["hits" if hit else "misses"] += 1
+            counters["time_saved_s"] += saved
+
+    def begin_render(self):
+        """Starts per-render counters for the calling thread (each Streamlit session reruns on its own thread)."""
+        self._render.counters = {"hits": 0, "misses": 0, "time_saved_s": 0.0}
+
+    def render_counters(self):
+        return getattr(self._render, "counters", None)
+
+    def attach_render(self, counters):
+        """Counts the calling thread's lookups into another thread's render, e.g. for concurrent page data loads."""
+        self._render.counters = counters
+
+    def render_stats(self):
+        counters = getattr(self._render, "counters", None) or {"hits": 0, "misses": 0, "time_saved_s": 0.0}
+        lookups = counters["hits"] + counters["misses"]
+        return {**counters, "hit_rate": round(counters["hits"] / lookups, 3) if lookups else None}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None, "time_saved_s": round(self.time_saved_s, 3),
+                "evictions": self.evictions, "invalidations": self.invalidations, "listening": self.listening,
+            }
+
+    # --- Cross-process invalidation ---
+
+    def start_listener(self, connect_kwargs, poll_interval=5.0):
+        """
+        Follows table change notifications on a dedicated connection in a daemon thread. Results are only
+        cached while the listener is connected, and everything is dropped after a reconnect, since
+        notifications may have been missed in between.
+        """
+        threading.Thread(target=self._listen_loop, args=(connect_kwargs, poll_interval), daemon=True, name="query-cache-listener").start()
+        return self
+
+    def _listen_loop(self, connect_kwargs, poll_interval):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**connect_kwargs)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANGE_CHANNEL};")
+                self.clear()
+                self.listening = True
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], poll_interval) != ([], [], []):
+                        conn.poll()
+                        tables = {notify.payload for notify in conn.notifies}
+                        conn.notifies.clear()
+                        if tables:
+                            self.invalidate(*tables)
+            except psycopg2.Error:
+                self.listening = False
+                self._stop.wait(poll_interval)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _freeze(value):
+    """Turns filter dicts and lists into hashable cache key parts."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached_query(*tables):
+    """
+    Serves a DatabaseManager read method from `self.query_cache`, keyed by method name and arguments.
+    Results are not cached when a query of the call failed (see DatabaseManager.execute_query).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "query_cache", None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+
+            def load():
+                self._query_errors.count = 0
+                value = method(self, *args, **kwargs)
+                return value, self._query_errors.count == 0
+
+            return cache.get_or_load((method.__name__, _freeze(args), _freeze(kwargs)), tables, load)
+        return wrapper
+    return decorator
+
+
+def create_query_cache_from_env(connect_kwargs):
+    """Builds the query cache from QUERY_CACHE_* environment variables; returns None when disabled."""
+    if os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    cache = QueryCache(
+        ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "60")),
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256")),
+        max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    )
+    return cache.start_listener(connect_kwargs)
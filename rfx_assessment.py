@@ -0,0 +1,313 @@
+# rfx_assessment.py
+"""
+RFx ingestion and risk assessment for documents with thousands of requirement lines.
+
+An RFx (PDF, text or CSV compliance matrix) is split into requirements. Obvious low-risk lines, such as
+submission formalities and requests for company information, are scored by local rules. The remaining
+distinct requirements are packed into batched prompts, many requirements per call, and sent with bounded
+concurrency. The results are written to `rfx_requirements` in one bulk transaction.
+
+Usage: python rfx_assessment.py FILE --title "FutureNet VoNR RFP" [--company "FutureNet Mobile"]
+                                [--mock-llm] [--mock-latency 0.5]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import time
+
+import anthropic
+
+from contract_analysis import DEFAULT_MODEL, RETRYABLE_ERRORS, retry_delay
+from contract_text import strip_page_boilerplate
+from metrics import METRICS
+from prompt_budget import create_prompt_budget_from_env
+from prompts import get_rfx_risk_messages
+
+RISK_LEVELS = ("Low", "Medium", "High")
+RISK_CATEGORIES = ("Commercial", "Legal", "Technical", "Delivery", "Compliance", "Administrative")
+
+# "REQ-012 ...", "SR.4.2 ...", "3.2.1 ...", "12) ..." open a numbered requirement or heading; bullets open an unnumbered one.
+# A bare number needs a "." or ")" after it, so wrapped lines starting with a figure ("30 days ...") continue their block.
+NUMBERED_LINE = re.compile(r"^(?P<ref>[A-Z]{1,6}[-_.]?\d+(?:[.-]\d+)*(?=[.):]?\s)|\d{1,3}(?:\.\d{1,3}){1,4}(?=[.):]?\s)|\d{1,3}(?=[.)]\s))"
+                           r"[.):]?\s+(?P<text>\S.*)$")
+BULLET_LINE = re.compile(r"^(?:[-•*▪◦–]|\(?[a-z]\)|\(?[ivx]{1,4}\))\s+(?P<text>\S.*)$")
+NORMATIVE = re.compile(r"\b(?:shall|must|required|requires?|mandatory|should|is expected to|will be expected to)\b", re.IGNORECASE)
+SENTENCE_BREAK = re.compile(r"(?<=[.;])\s+(?=[A-Z(])")
+
+# Lines matching one of these are scored Low locally, unless they also match ESCALATION.
+LOW_RISK_RULES = [
+    ("submission formalities", re.compile(
+        r"\b(?:responses?|proposals?|bids?|tenders?|offers?|submissions?)\b.{0,80}\b(?:format|language|english|pdf|font|page limit|copies|"
+        r"electronic(?:ally)?|portal|deadline|due date|signed|numbered)\b", re.IGNORECASE)),
+    ("bidder information", re.compile(
+        r"\b(?:company (?:profile|overview|name|registration)|contact (?:person|details|information)|organi[sz]ation(?:al)? chart|"
+        r"annual reports?|financial statements|certificate of incorporation|customer references?|reference (?:customers|sites)|case stud(?:y|ies))\b",
+        re.IGNORECASE)),
+    ("clarification process", re.compile(
+        r"\b(?:clarifications?|questions?|queries)\b.{0,80}\b(?:e-?mail|portal|submitted|deadline|in writing)\b", re.IGNORECASE)),
+    ("optional", re.compile(
+        r"^(?:the )?(?:bidders?|suppliers?|vendors?|tenderers?|contractors?|respondents?) (?:may|can|is (?:encouraged|invited) to)\b", re.IGNORECASE)),
+    ("documentation language", re.compile(
+        r"\b(?:documentation|manuals?|user guides?|training materials?)\b.{0,60}\b(?:provided|available|delivered|supplied)\b.{0,40}"
+        r"\b(?:english|electronic|pdf)\b", re.IGNORECASE)),
+    ("acknowledgement", re.compile(r"\b(?:acknowledges?|confirms?)\b.{0,40}\b(?:receipt|read and understood|understood)\b", re.IGNORECASE)),
+]
+ESCALATION = re.compile(
+    r"liabilit|indemn|penalt|liquidated damages|service credit|escrow|exclusiv|most favou?red|unlimited|uncapped|fixed price|"
+    r"without indexation|terminat|warrant|guarantee|source code|intellectual property|data protection|gdpr|sovereign|lawful intercept|"
+    r"insurance|audit|step-in|at no (?:additional )?cost|free of charge|99\.9", re.IGNORECASE)
+
+
+class RFxAssessmentConfig:
+    """Batching and concurrency settings for RFx assessment, read from RFX_* environment variables."""
+    def __init__(self, batch_size=None, batch_chars=None, concurrency=None, max_retries=None, max_tokens=4096, budget=None):
+        self.batch_size = batch_size or int(os.getenv("RFX_BATCH_SIZE", "40"))
+        self.batch_chars = batch_chars or int(os.getenv("RFX_BATCH_CHARS", "12000"))
+        self.concurrency = concurrency or int(os.getenv("RFX_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("RFX_MAX_RETRIES", "5"))
+        self.max_tokens = max_tokens
+        self.budget = budget or create_prompt_budget_from_env()
+
+
+# --- Parsing ---
+
+def requirement(text, ref=None, section=None):
+    return {"ref": ref, "section": section, "text": " ".join(text.split())[:4000]}
+
+
+def parse_requirements(text):
+    """
+    Splits RFx text into requirements in document order. Numbered and bulleted items start a new block, as
+    does a normative sentence after one that ended a line; other lines continue the block. A block with normative wording ("shall", "must", ...) is a requirement;
+    unnumbered prose with several such sentences yields one requirement per sentence. Short blocks without
+    normative wording are taken as headings and recorded as the section of the requirements that follow.
+    """
+    blocks, current = [], None
+    for line in strip_page_boilerplate(text).splitlines():
+        if not line:
+            current = None
+            continue
+        numbered, bullet = NUMBERED_LINE.match(line), BULLET_LINE.match(line)
+        new_sentence = current is not None and current["lines"][-1][-1] in ".;:" and line[0].isupper() and NORMATIVE.search(line)
+        if numbered or bullet or current is None or new_sentence:
+            current = {"ref": numbered.group("ref") if numbered else None,
+                       "lines": [(numbered or bullet).group("text") if numbered or bullet else line]}
+            blocks.append(current)
+        else:
+            current["lines"].append(line)
+
+    requirements, section = [], None
+    for block in blocks:
+        body = " ".join(block["lines"])
+        if not NORMATIVE.search(body):
+            if len(body) <= 100 and not body.endswith("."):
+                section = f"{block['ref']} {body}" if block["ref"] else body
+            continue
+        if block["ref"]:
+            requirements.append(requirement(body, block["ref"], section))
+        else:
+            requirements.extend(requirement(sentence, None, section) for sentence in SENTENCE_BREAK.split(body) if NORMATIVE.search(sentence))
+    return requirements
+
+
+def parse_requirements_csv(data):
+    """Reads a compliance matrix exported as CSV: requirement text from a "requirement"/"description" column, with optional id and section."""
+    rows = list(csv.DictReader(io.StringIO(data)))
+    if not rows:
+        return []
+    columns = [c for c in rows[0] if c]
+    ref_column = next((c for c in columns if re.search(r"(?:^|\W)(?:id|ref|no|nr|number)(?:\W|$)", c.lower())), None)
+    others = [c for c in columns if c != ref_column]
+
+    def column(*names):
+        return next((c for c in others if any(name in c.lower() for name in names)), None)
+    text_column = column("requirement", "description", "text") or (others or columns)[0]
+    section_column = column("section", "chapter", "category")
+    return [requirement(row[text_column], row.get(ref_column) or None if ref_column else None,
+                        row.get(section_column) if section_column else None)
+            for row in rows if (row.get(text_column) or "").strip()]
+
+
+def read_rfx_document(file_bytes, filename, extract_text):
+    """Parses an uploaded RFx: CSV compliance matrices by column, PDFs through `extract_text`, anything else as UTF-8 text."""
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return parse_requirements_csv(file_bytes.decode("utf-8-sig"))
+    text = extract_text(file_bytes) if name.endswith(".pdf") else file_bytes.decode("utf-8", "replace")
+    return parse_requirements(text or "")
+
+
+# --- Assessment ---
+
+def prefilter(requirement_text):
+    """Scores an obviously routine requirement locally; returns None when the requirement needs the LLM."""
+    if ESCALATION.search(requirement_text):
+        return None
+    for name, pattern in LOW_RISK_RULES:
+        if pattern.search(requirement_text):
+            return {"risk_level": "Low", "category": "Administrative", "rationale": f"Routine requirement ({name}).", "assessed_by": "rule"}
+    return None
+
+
+def make_batches(items, batch_size, batch_chars):
+    """Packs (id, text) items into batches of at most `batch_size` items and `batch_chars` characters."""
+    batches, current, size = [], [], 0
+    for item in items:
+        if current and (len(current) >= batch_size or size + len(item[1]) > batch_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += len(item[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_assessments(message_text, expected_ids):
+    """{id: assessment} for the well-formed entries of a batch reply; ids that are missing or malformed are left out."""
+    try:
+        entries = json.loads(message_text).get("requirements", [])
+    except (ValueError, AttributeError):
+        return {}
+    assessments = {}
+    for entry in entries:
+        try:
+            requirement_id = int(entry.get("id"))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if requirement_id in expected_ids and entry.get("risk_level") in RISK_LEVELS:
+            category = entry.get("category")
+            assessments[requirement_id] = {"risk_level": entry["risk_level"], "category": category if category in RISK_CATEGORIES else None,
+                                           "rationale": str(entry.get("rationale") or "")[:1000], "assessed_by": "llm"}
+    return assessments
+
+
+async def _assess_batch(async_client, batch, model, semaphore, config):
+    request = config.budget.prepare(*get_rfx_risk_messages(batch))
+    for attempt in range(config.max_retries + 1):
+        async with semaphore:
+            try:
+                with METRICS.llm_call("rfx_assessment", model) as call:
+                    call.message = await async_client.messages.create(model=model, max_tokens=config.max_tokens, **request.api_kwargs())
+                return parse_assessments(call.message.content[0].text, {requirement_id for requirement_id, _ in batch})
+            except RETRYABLE_ERRORS as error:
+                if attempt == config.max_retries:
+                    raise
+                delay = retry_delay(error, attempt)
+        await asyncio.sleep(delay)  # sleep outside the semaphore so other batches keep the slot busy
+
+
+async def assess_with_llm_async(async_client, items, model=DEFAULT_MODEL, config=None):
+    """
+    Assesses (id, text) items in concurrent batches. Items a reply leaves out (e.g. a truncated reply) are
+    sent once more in batches of half the size. Returns ({id: assessment}, number of calls).
+    """
+    config = config or RFxAssessmentConfig()
+    semaphore = asyncio.Semaphore(config.concurrency)
+    assessments, calls, pending, batch_size = {}, 0, list(items), config.batch_size
+    for _ in range(2):
+        batches = make_batches(pending, batch_size, config.batch_chars)
+        for result in await asyncio.gather(*[_assess_batch(async_client, batch, model, semaphore, config) for batch in batches]):
+            assessments.update(result)
+        calls += len(batches)
+        pending = [item for item in pending if item[0] not in assessments]
+        if not pending:
+            break
+        batch_size = max(1, batch_size // 2)
+    return assessments, calls
+
+
+def assess_requirements(client, requirements, model=DEFAULT_MODEL, config=None):
+    """
+    Scores every requirement in place (risk_level, category, rationale, assessed_by) and returns statistics.
+    Rules score the routine lines; identical requirement texts are sent to the LLM once. Requirements the
+    LLM did not assess keep risk_level None.
+    """
+    config = config or RFxAssessmentConfig()
+    started = time.perf_counter()
+    distinct = {}  # lower-cased text -> (id, text) sent to the LLM
+    for item in requirements:
+        item.update(prefilter(item["text"]) or {"risk_level": None, "category": None, "rationale": None, "assessed_by": None})
+        if item["assessed_by"] is None and item["text"].lower() not in distinct:
+            distinct[item["text"].lower()] = (len(distinct) + 1, item["text"])
+
+    assessments, calls = {}, 0
+    if distinct:
+        async def run():
+            async with anthropic.AsyncAnthropic(api_key=client.api_key, base_url=client.base_url, max_retries=0) as async_client:
+                return await assess_with_llm_async(async_client, list(distinct.values()), model, config)
+        assessments, calls = asyncio.run(run())
+        for item in requirements:
+            requirement_id = distinct[item["text"].lower()][0] if item["assessed_by"] is None else None
+            if requirement_id in assessments:
+                item.update(assessments[requirement_id])
+
+    elapsed = time.perf_counter() - started
+    return {"requirements": len(requirements), "prefiltered": sum(1 for r in requirements if r["assessed_by"] == "rule"),
+            "sent_to_llm": len(distinct), "llm_calls": calls, "unassessed": sum(1 for r in requirements if r["risk_level"] is None),
+            "elapsed_s": round(elapsed, 2), "requirements_per_s": round(len(requirements) / elapsed, 1) if elapsed else None}
+
+
+class RFxIngestor:
+    """Parses, assesses and saves one RFx document; shared by the RFx page, background workers and the command line."""
+    def __init__(self, db, client, model=DEFAULT_MODEL, extract_text=None, config=None):
+        self.db = db
+        self.client = client
+        self.model = model
+        self.extract_text = extract_text
+        self.config = config
+
+    def ingest(self, file_bytes, filename, title, company_name=None, on_saved=None):
+        """Returns the new rfx_id and assessment stats; `on_saved(uow, rfx_id)` runs in the save transaction."""
+        requirements = read_rfx_document(file_bytes, filename, self.extract_text)
+        if not requirements:
+            raise ValueError("No requirements were found in the document")
+        stats = assess_requirements(self.client, requirements, self.model, self.config)
+        rfx_id = self.db.save_rfx_document(title, requirements, company_name, source_name=filename, on_saved=on_saved)
+        if rfx_id is None:
+            raise RuntimeError("The RFx could not be saved")
+        return {"rfx_id": rfx_id, "stats": stats}
+
+
+def main():
+    from dotenv import load_dotenv
+    from database import DatabaseManager
+    from pdf_extraction import create_extraction_engine_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="RFx document: PDF, text or CSV compliance matrix")
+    parser.add_argument("--title", required=True)
+    parser.add_argument("--company", help="issuing customer")
+    parser.add_argument("--mock-llm", action="store_true", help="serve assessments from the local Anthropic stand-in (mock_llm_server.py)")
+    parser.add_argument("--mock-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.mock_llm:
+        from mock_llm_server import MockLLMServer
+        server = MockLLMServer(port=0, latency=args.mock_latency).start_in_background()
+        client = anthropic.Anthropic(api_key="mock-key", base_url=server.base_url)
+    else:
+        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+
+    db = DatabaseManager()
+    db.initialize_database()
+    engine = create_extraction_engine_from_env()
+    try:
+        with open(args.file, "rb") as f:
+            outcome = RFxIngestor(db, client, os.getenv('ANTHROPIC_MODEL', DEFAULT_MODEL), extract_text=engine.extract_text).ingest(
+                f.read(), os.path.basename(args.file), args.title, args.company)
+    finally:
+        engine.shutdown()
+    stats = outcome["stats"]
+    print(f"RFx {outcome['rfx_id']}: {stats['requirements']} requirements, {stats['prefiltered']} scored by rules, "
+          f"{stats['sent_to_llm']} assessed in {stats['llm_calls']} LLM calls, {stats['unassessed']} unassessed "
+          f"({stats['elapsed_s']}s, {stats['requirements_per_s']} requirements/s)")
+
+
+if __name__ == "__main__":
+    main()
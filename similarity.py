@@ -0,0 +1,115 @@
+# similarity.py
+import hashlib
+import os
+import re
+
+import numpy as np
+from psycopg2.extras import Json
+
+from contract_text import section_fingerprint, split_into_sections
+
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard similarity almost always share a bucket
+SHINGLE_SIZE = 5
+
+# Fixed seed so signatures stay comparable across processes and restarts.
+_rng = np.random.default_rng(20240229)
+_HASH_A = _rng.integers(0, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+_HASH_B = _rng.integers(0, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """Returns the distinct 32-bit hashes of the word k-shingles of a text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < k:
+        words = words + [""] * (k - len(words))
+    shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+
+def minhash_signature(text, batch_size=4096):
+    """Computes a MinHash signature using vectorized multiply-shift hashing over the shingle set."""
+    hashes = shingle_hashes(text)
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(hashes), batch_size):
+        batch = hashes[start:start + batch_size, None]
+        permuted = (batch * _HASH_A + _HASH_B) >> np.uint64(32)
+        signature = np.minimum(signature, permuted.min(axis=0))
+    return signature.astype(np.int64)
+
+
+def lsh_buckets(signature):
+    """Hashes each band of a signature into a signed 64-bit bucket id."""
+    rows = NUM_PERMUTATIONS // NUM_BANDS
+    buckets = []
+    for band in range(NUM_BANDS):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def estimate_similarity(signature_a, signature_b):
+    """Estimates the Jaccard similarity of two documents from their MinHash signatures."""
+    return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+
+
+class SimilarityIndex:
+    """
+    A MinHash/LSH index over saved contracts, stored in PostgreSQL.
+
+    Each indexed contract keeps its signature, its section fingerprints and its full analysis result.
+    Lookups only compare against contracts sharing at least one LSH bucket, so matching stays
+    sub-linear in the number of stored contracts.
+    """
+    def __init__(self, db, threshold=0.8, max_candidates=20):
+        self.db = db
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+
+    def add(self, contract_id, contract_type, contract_text, analysis_result, uow=None):
+        """
+        Indexes a saved contract so later uploads can reuse its analysis.
+        The fingerprint and its LSH buckets are written in one transaction: `uow` when given (e.g. the
+        contract's save transaction), otherwise a new one. Raises if the writes fail.
+        """
+        if uow is None:
+            with self.db.transaction() as uow:
+                return self.add(contract_id, contract_type, contract_text, analysis_result, uow)
+        signature = minhash_signature(contract_text)
+        section_hashes = [section_fingerprint(section) for section in split_into_sections(contract_text)]
+        uow.execute(
+            "INSERT INTO contract_fingerprints (contract_id, contract_type, minhash, section_hashes, analysis_result) VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT (contract_id) DO UPDATE SET minhash = EXCLUDED.minhash, section_hashes = EXCLUDED.section_hashes, analysis_result = EXCLUDED.analysis_result;",
+            (contract_id, contract_type, signature.tolist(), section_hashes, Json(analysis_result))
+        )
+        uow.insert_many("INSERT INTO contract_lsh_buckets (band, bucket, contract_id) VALUES %s ON CONFLICT DO NOTHING;",
+                        [(band, bucket, contract_id) for band, bucket in lsh_buckets(signature)])
+
+    def find_match(self, contract_type, contract_text):
+        """
+        Returns the closest indexed contract of the same type whose estimated similarity reaches the threshold,
+        as a dict with its id, similarity, section fingerprints and stored analysis; None if there is no match.
+        """
+        signature = minhash_signature(contract_text)
+        buckets = lsh_buckets(signature)
+        conditions = " OR ".join(["(b.band = %s AND b.bucket = %s)"] * len(buckets))
+        candidates = self.db.execute_query(
+            f"SELECT f.contract_id, f.minhash, f.section_hashes, f.analysis_result FROM contract_fingerprints f "
+            f"JOIN (SELECT b.contract_id, COUNT(*) AS shared FROM contract_lsh_buckets b WHERE {conditions} GROUP BY b.contract_id) c "
+            f"ON c.contract_id = f.contract_id WHERE f.contract_type = %s ORDER BY c.shared DESC LIMIT %s;",
+            [value for bucket in buckets for value in bucket] + [contract_type, self.max_candidates], fetch='all'
+        )
+        best = None
+        for contract_id, minhash, section_hashes, analysis_result in candidates or []:
+            similarity = estimate_similarity(signature, minhash)
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"contract_id": contract_id, "similarity": similarity, "section_hashes": section_hashes, "analysis_result": analysis_result}
+        return best
+
+
+def create_similarity_index_from_env(db):
+    """Builds the similarity index with the match threshold from SIMILARITY_THRESHOLD."""
+    return SimilarityIndex(db, threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.8")))
@@ -0,0 +1,214 @@
+# streaming_json.py
+import json
+import threading
+import time
+from collections import deque
+
+from metrics import METRICS
+from prompt_budget import PromptRequest
+
+WHITESPACE = " \t\r\n"
+SCALAR_DELIMITERS = ",}] \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "name", "start", "expect", "key", "index")
+
+    def __init__(self, kind, name, start):
+        self.kind = kind          # 'object' or 'array'
+        self.name = name          # key or index of this container in its parent
+        self.start = start        # buffer offset of the opening bracket
+        self.expect = "key_or_end" if kind == "object" else "value_or_end"
+        self.key = None
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON document that arrives in arbitrary text fragments.
+
+    `feed()` returns (path, value) events for every value that has been completely received at a
+    depth of at most `max_depth`, e.g. (('risk_analysis', 0), {...}) as soon as the first risk object
+    closes, or (('tco_insight',), "...") once that string ends. Any prose before the first '{' or '['
+    is skipped. The completed root value is reported with the empty path ().
+    """
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []
+        self.started = False
+        self.done = False
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        while not self.done and self._step(events):
+            pass
+        return events
+
+    def _path(self, frame):
+        return tuple(f.name for f in self.stack[1:]) + ((frame.key if frame.kind == "object" else frame.index),)
+
+    def _scan_string(self, start):
+        """Returns the offset just past the closing quote of the string starting at `start`, or None if it is incomplete."""
+        i = start + 1
+        while True:
+            i = self.buffer.find('"', i)
+            if i == -1:
+                return None
+            backslashes = 0
+            j = i - 1
+            while self.buffer[j] == "\\":
+                backslashes += 1
+                j -= 1
+            if backslashes % 2 == 0:
+                return i + 1
+            i += 1
+
+    def _value_done(self, frame, raw, events):
+        path = self._path(frame)
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(raw)))
+        if frame.kind == "array":
+            frame.index += 1
+        frame.expect = "comma_or_end"
+
+    def _close(self, events):
+        frame = self.stack.pop()
+        raw = self.buffer[frame.start:self.pos + 1]
+        self.pos += 1
+        if not self.stack:
+            self.done = True
+            events.append(((), json.loads(raw)))
+        else:
+            self._value_done(self.stack[-1], raw, events)
+
+    def _start_value(self, frame, events):
+        c = self.buffer[self.pos]
+        if c in "{[":
+            name = frame.key if frame.kind == "object" else frame.index
+            self.stack.append(_Frame("object" if c == "{" else "array", name, self.pos))
+            self.pos += 1
+            return True
+        if c == '"':
+            end = self._scan_string(self.pos)
+            if end is None:
+                return False
+            raw, self.pos = self.buffer[self.pos:end], end
+            self._value_done(frame, raw, events)
+            return True
+        end = self.pos
+        while end < len(self.buffer) and self.buffer[end] not in SCALAR_DELIMITERS:
+            end += 1
+        if end == len(self.buffer):
+            return False  # the number or literal may continue in the next fragment
+        raw, self.pos = self.buffer[self.pos:end], end
+        self._value_done(frame, raw, events)
+        return True
+
+    def _step(self, events):
+        if not self.started:
+            starts = [i for i in (self.buffer.find("{", self.pos), self.buffer.find("[", self.pos)) if i != -1]
+            if not starts:
+                self.pos = len(self.buffer)
+                return False
+            self.pos = min(starts)
+            self.stack.append(_Frame("object" if self.buffer[self.pos] == "{" else "array", None, self.pos))
+            self.pos += 1
+            self.started = True
+            return True
+
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+            self.pos += 1
+        if self.pos >= len(self.buffer):
+            return False
+        frame = self.stack[-1]
+        c = self.buffer[self.pos]
+
+        if frame.expect == "comma_or_end":
+            if c == ",":
+                frame.expect = "key" if frame.kind == "object" else "value"
+                self.pos += 1
+            elif c in "}]":
+                self._close(events)
+            else:
+                raise ValueError(f"Unexpected {c!r} at offset {self.pos}")
+            return True
+        if frame.kind == "object":
+            if frame.expect in ("key_or_end", "key"):
+                if c == "}" and frame.expect == "key_or_end":
+                    self._close(events)
+                    return True
+                end = self._scan_string(self.pos) if c == '"' else -1
+                if end == -1:
+                    raise ValueError(f"Expected an object key at offset {self.pos}")
+                if end is None:
+                    return False
+                frame.key = json.loads(self.buffer[self.pos:end])
+                self.pos = end
+                frame.expect = "colon"
+                return True
+            if frame.expect == "colon":
+                if c != ":":
+                    raise ValueError(f"Expected ':' at offset {self.pos}")
+                self.pos += 1
+                frame.expect = "value"
+                return True
+            return self._start_value(frame, events)
+        if c == "]" and frame.expect == "value_or_end":
+            self._close(events)
+            return True
+        return self._start_value(frame, events)
+
+
+# --- Streaming API calls ---
+
+STREAM_TIMINGS = deque(maxlen=500)
+_timings_lock = threading.Lock()
+
+
+def stream_json_completion(client, model, max_tokens, prompt, listener=None, call_site="default", finding_keys=None):
+    """
+    Streams a completion whose reply is a JSON document, forwarding each completed field or list item to
+    `listener.on_item(path, value)` while it arrives. Returns (full_text, timing), where timing records the
+    time to the first finding (the first item under one of `finding_keys`, or any item) against total latency.
+    `prompt` is a PromptRequest (see prompt_budget) or plain prompt text.
+    """
+    request = PromptRequest.from_text(prompt) if isinstance(prompt, str) else prompt
+    parser = IncrementalJSONParser(max_depth=2)
+    parts = []
+    started = time.perf_counter()
+    first_finding = None
+    with METRICS.llm_call(call_site, model, request.tokens_saved) as call, \
+            client.messages.stream(model=model, max_tokens=max_tokens, **request.api_kwargs()) as stream:
+        for text in stream.text_stream:
+            parts.append(text)
+            for path, value in parser.feed(text):
+                if not path:
+                    continue
+                if first_finding is None and (finding_keys is None or path[0] in finding_keys):
+                    first_finding = time.perf_counter() - started
+                if listener:
+                    listener.on_item(path, value)
+        call.message = stream.get_final_message()
+    total = time.perf_counter() - started
+    timing = {"call_site": call_site, "time_to_first_finding_s": round(first_finding, 3) if first_finding is not None else None,
+              "total_s": round(total, 3), "chars": sum(len(part) for part in parts)}
+    with _timings_lock:
+        STREAM_TIMINGS.append(timing)
+    if listener and hasattr(listener, "on_finished"):
+        listener.on_finished(timing)
+    return "".join(parts), timing
+
+
+def stream_timing_summary(call_site):
+    """Averages time-to-first-finding and total latency over the recorded streaming calls of a call site."""
+    with _timings_lock:
+        timings = [t for t in STREAM_TIMINGS if t["call_site"] == call_site and t["time_to_first_finding_s"] is not None]
+    if not timings:
+        return None
+    avg_first = sum(t["time_to_first_finding_s"] for t in timings) / len(timings)
+    avg_total = sum(t["total_s"] for t in timings) / len(timings)
+    return {"calls": len(timings), "avg_time_to_first_finding_s": round(avg_first, 3), "avg_total_s": round(avg_total, 3),
+            "first_finding_share": round(avg_first / avg_total, 3) if avg_total else None}
@@ -0,0 +1,29 @@
+# tco_analysis.py
+import json
+
+from contract_analysis import DEFAULT_MODEL
+from metrics import METRICS
+from prompt_budget import create_prompt_budget_from_env
+from prompts import get_tco_pricing_messages
+from streaming_json import stream_json_completion
+
+
+def format_tco_components(acquisition, annual_ops, total_tco):
+    """Formats the calculator's cost breakdown the way the pricing prompt expects it."""
+    return f"Acquisition: €{acquisition}, Annual Ops: €{annual_ops}, 5-Year TCO: €{total_tco:,.0f}"
+
+
+def request_tco_recommendation(client, segment, tco_components, model=DEFAULT_MODEL, historical_data_summary="", stream_listener=None, budget=None):
+    """
+    Asks the AI for a commercial model recommendation and parses the JSON reply.
+    With a `stream_listener`, each recommendation field is passed on as soon as it is complete.
+    """
+    budget = budget or create_prompt_budget_from_env()
+    request = budget.prepare(*get_tco_pricing_messages(segment, tco_components, historical_data_summary), client, model)
+    if stream_listener is not None:
+        message, _ = stream_json_completion(client, model, 1024, request, stream_listener, "tco_recommendation")
+    else:
+        with METRICS.llm_call("tco_recommendation", model) as call:
+            call.message = client.messages.create(model=model, max_tokens=1024, **request.api_kwargs())
+        message = call.message.content[0].text
+    return json.loads(message)
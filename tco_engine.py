@@ -0,0 +1,205 @@
+# tco_engine.py
+"""
+Vectorized TCO scenario engine: evaluates thousands to millions of what-if combinations of cost components,
+contract length, discount rate and annual cost escalation in NumPy passes.
+
+Model: acquisition costs (licensing, migration) are paid up front; annual operational costs (cloud,
+maintenance, personnel) are paid at the end of each contract year and grow by `escalation` per year.
+Total TCO is the undiscounted sum; NPV discounts every year at `discount_rate`. With a 5-year term and no
+escalation or discounting this reduces to the calculator's c1 + c2 + 5 * (c3 + c4 + c5).
+"""
+import time
+
+import numpy as np
+
+ACQUISITION_COMPONENTS = ("licensing", "migration")
+ANNUAL_COMPONENTS = ("cloud", "maintenance", "personnel")
+PARAMETERS = ACQUISITION_COMPONENTS + ANNUAL_COMPONENTS + ("years", "discount_rate", "escalation")
+PARAMETER_LABELS = {
+    "licensing": "Software Licensing", "migration": "Migration & Integration", "cloud": "Cloud Infrastructure",
+    "maintenance": "Maintenance & Support", "personnel": "Personnel", "years": "Contract Length (years)",
+    "discount_rate": "Discount Rate", "escalation": "Annual Cost Escalation",
+}
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+DEFAULT_BLOCK_SIZE = 250_000  # scenarios evaluated per pass; bounds the (scenarios x years) working set
+MAX_GRID_SCENARIOS = 5_000_000  # a grid's input columns alone take 64 bytes per scenario
+
+
+class Range:
+    """
+    An uncertain input: `base` is the point estimate, `low`/`high` bound it. Monte Carlo runs draw from a
+    triangular (default), uniform or normal distribution; grids take evenly spaced points between low and high.
+    """
+    def __init__(self, low, base, high, distribution="triangular"):
+        if not low <= base <= high:
+            raise ValueError(f"Expected low <= base <= high, got {low}, {base}, {high}")
+        self.low, self.base, self.high = float(low), float(base), float(high)
+        self.distribution = distribution
+
+    @property
+    def is_fixed(self):
+        return self.low == self.high
+
+    def sample(self, rng, size):
+        if self.is_fixed:
+            return np.full(size, self.base)
+        if self.distribution == "uniform":
+            return rng.uniform(self.low, self.high, size)
+        if self.distribution == "normal":
+            # low/high are read as the 2.5th/97.5th percentiles
+            return np.clip(rng.normal(self.base, (self.high - self.low) / 3.92, size), self.low, self.high)
+        return rng.triangular(self.low, self.base, self.high, size)
+
+    def grid(self, points):
+        return np.array([self.base]) if self.is_fixed else np.linspace(self.low, self.high, points)
+
+    def to_dict(self):
+        return {"low": self.low, "base": self.base, "high": self.high, "distribution": self.distribution}
+
+
+def as_range(value):
+    return value if isinstance(value, Range) else Range(value, value, value)
+
+
+def evaluate(licensing, migration, cloud, maintenance, personnel, years, discount_rate, escalation):
+    """
+    Computes (total_tco, npv) for arrays of scenarios in one vectorized pass. All arguments broadcast to a
+    common 1-D shape; fractional contract lengths are rounded to whole years.
+    """
+    acquisition = np.asarray(licensing, dtype=np.float64) + migration
+    annual = np.asarray(cloud, dtype=np.float64) + maintenance + personnel
+    years = np.rint(years).astype(np.int64)
+    acquisition, annual, years, discount_rate, escalation = np.broadcast_arrays(
+        acquisition, annual, years, np.asarray(discount_rate, dtype=np.float64), np.asarray(escalation, dtype=np.float64)
+    )
+    t = np.arange(1, max(int(years.max(initial=1)), 1) + 1, dtype=np.float64)
+    # (scenarios x years): escalated annual costs, zeroed after each scenario's contract end
+    yearly = annual[:, None] * (1.0 + escalation[:, None]) ** (t - 1.0)
+    yearly *= t <= years[:, None]
+    total_tco = acquisition + yearly.sum(axis=1)
+    npv = acquisition + (yearly / (1.0 + discount_rate[:, None]) ** t).sum(axis=1)
+    return total_tco, npv
+
+
+def _evaluate_blocks(columns, count, block_size):
+    total_tco, npv = np.empty(count), np.empty(count)
+    for start in range(0, count, block_size):
+        end = min(start + block_size, count)
+        total_tco[start:end], npv[start:end] = evaluate(**{name: values[start:end] for name, values in columns.items()})
+    return total_tco, npv
+
+
+class ScenarioResult:
+    """The evaluated scenarios of one run, with summary statistics and one-at-a-time sensitivities."""
+    def __init__(self, method, inputs, columns, total_tco, npv, base_case, sensitivities, elapsed_s):
+        self.method = method
+        self.inputs = inputs
+        self.columns = columns
+        self.total_tco = total_tco
+        self.npv = npv
+        self.base_case = base_case
+        self.sensitivities = sensitivities
+        self.elapsed_s = elapsed_s
+
+    @property
+    def scenarios(self):
+        return len(self.total_tco)
+
+    def percentiles(self):
+        """Percentiles, mean and standard deviation of total TCO and NPV."""
+        summary = {}
+        for name, values in (("total_tco", self.total_tco), ("npv", self.npv)):
+            stats = dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(values, PERCENTILES).round(2).tolist()))
+            stats.update(mean=round(float(values.mean()), 2), std=round(float(values.std()), 2),
+                         min=round(float(values.min()), 2), max=round(float(values.max()), 2))
+            summary[name] = stats
+        return summary
+
+    def histogram(self, metric="total_tco", bins=40):
+        counts, edges = np.histogram(getattr(self, metric), bins=bins)
+        return counts, edges
+
+    def to_record(self):
+        """A JSON-serializable summary for persistence (the scenario arrays themselves are not stored)."""
+        return {
+            "method": self.method, "scenarios": self.scenarios, "elapsed_s": round(self.elapsed_s, 4),
+            "inputs": {name: value.to_dict() for name, value in self.inputs.items()},
+            "base_case": self.base_case, "percentiles": self.percentiles(), "sensitivities": self.sensitivities,
+        }
+
+
+class TCOScenarioEngine:
+    """
+    Runs grid and Monte Carlo analyses over TCO inputs. Every input is a number or a Range, e.g.
+    TCOScenarioEngine(licensing=Range(120_000, 150_000, 200_000), migration=45_000, ..., years=Range(3, 5, 7)).
+    """
+    def __init__(self, licensing, migration, cloud, maintenance, personnel, years=5, discount_rate=0.0, escalation=0.0,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        values = (licensing, migration, cloud, maintenance, personnel, years, discount_rate, escalation)
+        self.inputs = {name: as_range(value) for name, value in zip(PARAMETERS, values)}
+        self.block_size = block_size
+
+    def base_case(self):
+        total_tco, npv = evaluate(**{name: np.array([value.base]) for name, value in self.inputs.items()})
+        return {"total_tco": round(float(total_tco[0]), 2), "npv": round(float(npv[0]), 2)}
+
+    def sensitivities(self, metric="npv"):
+        """
+        Tornado analysis: swings each varied input to its low and high bound with all others at base, all in one
+        vectorized pass. Returns rows sorted by swing, largest first.
+        """
+        varied = [name for name, value in self.inputs.items() if not value.is_fixed]
+        if not varied:
+            return []
+        columns = {name: np.full(2 * len(varied), value.base) for name, value in self.inputs.items()}
+        for i, name in enumerate(varied):
+            columns[name][2 * i] = self.inputs[name].low
+            columns[name][2 * i + 1] = self.inputs[name].high
+        total_tco, npv = evaluate(**columns)
+        values = npv if metric == "npv" else total_tco
+        base = self.base_case()[metric]
+        rows = [{"parameter": name, "label": PARAMETER_LABELS[name], "low_input": self.inputs[name].low, "high_input": self.inputs[name].high,
+                 "at_low": round(float(values[2 * i]), 2), "at_high": round(float(values[2 * i + 1]), 2),
+                 "swing": round(float(abs(values[2 * i + 1] - values[2 * i])), 2), "base": base}
+                for i, name in enumerate(varied)]
+        return sorted(rows, key=lambda row: row["swing"], reverse=True)
+
+    def monte_carlo(self, scenarios=100_000, seed=None):
+        """Samples every input independently from its distribution."""
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        columns = {name: value.sample(rng, scenarios) for name, value in self.inputs.items()}
+        total_tco, npv = _evaluate_blocks(columns, scenarios, self.block_size)
+        return self._result("monte_carlo", columns, total_tco, npv, started)
+
+    def grid(self, points=5):
+        """Evaluates the full cartesian grid of `points` values per varied input (points ** varied scenarios)."""
+        count = grid_size(self.inputs, points)
+        if count > MAX_GRID_SCENARIOS:
+            raise ValueError(f"A grid of {count:,} scenarios exceeds the limit of {MAX_GRID_SCENARIOS:,}; use fewer points or Monte Carlo")
+        started = time.perf_counter()
+        axes = [value.grid(points) for value in self.inputs.values()]
+        if self.inputs["years"].low != self.inputs["years"].high:
+            axes[PARAMETERS.index("years")] = np.unique(np.rint(axes[PARAMETERS.index("years")]))
+        mesh = np.meshgrid(*axes, indexing="ij", copy=False)
+        columns = {name: axis.ravel() for name, axis in zip(PARAMETERS, mesh)}
+        total_tco, npv = _evaluate_blocks(columns, count, self.block_size)
+        return self._result("grid", columns, total_tco, npv, started)
+
+    def _result(self, method, columns, total_tco, npv, started):
+        return ScenarioResult(method, self.inputs, columns, total_tco, npv, self.base_case(), self.sensitivities(),
+                              time.perf_counter() - started)
+
+
+def grid_size(inputs, points):
+    """The number of scenarios grid(points) would evaluate, to check before running it."""
+    sizes = []
+    for name, value in inputs.items():
+        value = as_range(value)
+        if value.is_fixed:
+            sizes.append(1)
+        elif name == "years":
+            sizes.append(len(np.unique(np.rint(value.grid(points)))))
+        else:
+            sizes.append(points)
+    return int(np.prod(sizes))
@@ -0,0 +1,31 @@
+# tests/test_contract_text.py
+from contract_text import strip_page_boilerplate
+
+
+def contract_pages(pages=4, lines_per_page=15):
+    lines = []
+    for page in range(1, pages + 1):
+        lines += [f"Clause {page}.{line} The supplier shall provide the services." for line in range(1, lines_per_page)]
+        lines.append(str(page))
+    return lines
+
+
+def test_page_numbers_in_sequence_are_dropped():
+    text = "\n".join(contract_pages())
+    prepared = strip_page_boilerplate(text)
+    assert all(line not in prepared.splitlines() for line in ("1", "2", "3", "4"))
+    assert "Clause 4.14 The supplier shall provide the services." in prepared
+
+
+def test_labelled_page_numbers_are_dropped_anywhere():
+    assert strip_page_boilerplate("Definitions\nPage 7\nTerm") == "Definitions\nTerm"
+
+
+def test_standalone_numbers_in_a_table_survive():
+    table = ["Volume tiers", "Tier", "Sites", "1", "250", "2", "1000", "3", "5000", "Unit price", "12", "9"]
+    lines = contract_pages()
+    lines[5:5] = table
+    prepared = strip_page_boilerplate("\n".join(lines)).splitlines()
+    start = prepared.index("Volume tiers")
+    assert prepared[start:start + len(table)] == table
+    assert all(line not in prepared[start + len(table):] for line in ("1", "2", "3", "4"))
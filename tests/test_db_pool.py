@@ -0,0 +1,83 @@
+# tests/test_db_pool.py
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from db_pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.drop_on_execute:
+            self.conn.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self, drop_on_execute=False, drop_on_commit=False):
+        self.closed = 0
+        self.drop_on_execute = drop_on_execute
+        self.drop_on_commit = drop_on_commit
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.drop_on_commit:
+            self.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def rollback(self):
+        if self.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def pool_of(*connections):
+    pending = list(connections)
+    pool = ConnectionPool(min_size=0, max_size=2)
+    pool._connect = lambda: pending.pop(0)
+    return pool
+
+
+def test_write_dropped_at_commit_is_not_repeated():
+    pool = pool_of(FakeConnection(drop_on_commit=True), FakeConnection())
+    calls = []
+    with pytest.raises(psycopg2.OperationalError):
+        pool.run(lambda conn: calls.append(conn))
+    assert len(calls) == 1
+    assert pool.stats()["size"] == 0
+
+
+def test_idempotent_read_is_retried_once_on_a_fresh_connection():
+    dropped, fresh = FakeConnection(drop_on_execute=True), FakeConnection()
+    pool = pool_of(dropped, fresh)
+
+    def read(conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        return conn
+
+    assert pool.run(read, idempotent=True) is fresh
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_idempotent_read_dropped_at_commit_is_retried():
+    pool = pool_of(FakeConnection(drop_on_commit=True), FakeConnection())
+    calls = []
+    pool.run(lambda conn: calls.append(conn), idempotent=True)
+    assert len(calls) == 2
@@ -0,0 +1,55 @@
+# tests/test_ingestion.py
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("anthropic")
+
+from ingestion import ContractIngestor
+
+ANALYSIS = {"risk_analysis": [], "key_terms": {"Payment Terms": "Net 30"}}
+
+
+class FakeCache:
+    def __init__(self, entry):
+        self.entry = entry
+        self.stored = []
+
+    @staticmethod
+    def make_key(document_hash, contract_type, prompt_version, model_name):
+        return document_hash
+
+    def get(self, cache_key):
+        return self.entry
+
+    def put(self, *args):
+        self.stored.append(args)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.saved = []
+
+    def save_contract_and_analysis(self, title, contract_type, analysis_result, contract_text=None, on_saved=None):
+        self.saved.append((title, analysis_result, contract_text))
+        return len(self.saved)
+
+
+def refuse_extraction(file_bytes):
+    raise AssertionError("extract_text must not be called on a cache hit")
+
+
+def test_cache_hit_skips_pdf_parsing_and_keeps_the_cached_text():
+    db, cache = FakeDatabase(), FakeCache((ANALYSIS, "Payment is due within 30 days."))
+    outcome = ContractIngestor(db, client=None, analysis_cache=cache, extract_text=refuse_extraction).ingest(b"%PDF", "MSA with Acme", "MSA")
+    assert outcome["from_cache"]
+    assert db.saved == [("MSA with Acme", ANALYSIS, "Payment is due within 30 days.")]
+    assert cache.stored == []
+
+
+def test_cache_hit_without_stored_text_extracts_once_and_backfills_the_entry():
+    db, cache = FakeDatabase(), FakeCache((ANALYSIS, None))
+    calls = []
+    extract = lambda file_bytes: calls.append(file_bytes) or "Payment is due within 30 days."
+    outcome = ContractIngestor(db, client=None, analysis_cache=cache, extract_text=extract).ingest(b"%PDF", "MSA with Acme", "MSA")
+    assert outcome["from_cache"] and calls == [b"%PDF"]
+    assert cache.stored[0][-1] == "Payment is due within 30 days."
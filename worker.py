@@ -0,0 +1,186 @@
+# worker.py
+"""
+Background worker pool for AI analysis jobs queued by the Streamlit pages.
+
+Runs as its own process, next to `streamlit run app.py`. Each worker thread claims jobs from the
+`analysis_jobs` table with FOR UPDATE SKIP LOCKED, so several worker processes can share one queue.
+Workers wake up on NOTIFY and otherwise poll every few seconds.
+
+Usage: python worker.py [--threads 4] [--poll-interval 2.0]
+"""
+import argparse
+import os
+import select
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+import psycopg2
+
+from ingestion import BatchIngestionPipeline, resolve_source
+from job_queue import JOB_BATCH_INGESTION, JOB_CONTRACT_ANALYSIS, JOB_RFX_ASSESSMENT, JOB_TCO_RECOMMENDATION, NOTIFY_CHANNEL, JobQueue
+from tco_analysis import request_tco_recommendation
+
+
+class WorkerPool:
+    """Runs `threads` job-processing threads plus a heartbeat/reaper thread and a NOTIFY listener."""
+    def __init__(self, db, queue, ingestor, client, model, threads=4, poll_interval=2.0, heartbeat_interval=5.0, rfx_ingestor=None):
+        self.db = db
+        self.queue = queue
+        self.ingestor = ingestor
+        self.rfx_ingestor = rfx_ingestor
+        self.client = client
+        self.model = model
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self.jobs_processed = 0
+
+    def handle(self, job_type, payload, document, on_saved=None):
+        """
+        Executes one job and returns its result; domain results are persisted here, with `on_saved(uow, record_id)`
+        running in their save transaction.
+        """
+        if job_type == JOB_CONTRACT_ANALYSIS:
+            outcome = self.ingestor.ingest(document, payload["title"], payload["contract_type"], on_saved=on_saved)
+            return {"contract_id": outcome["contract_id"], "analysis_result": outcome["analysis_result"],
+                    "from_cache": outcome["from_cache"], "reuse_info": outcome["reuse_info"]}
+        if job_type == JOB_TCO_RECOMMENDATION:
+            recommendation = request_tco_recommendation(self.client, payload["segment"], payload["tco_components"], self.model)
+            recommendation_id = self.db.save_tco_recommendation(
+                payload["segment"], payload["tco_components"], payload["total_tco"], recommendation, payload.get("company_name"), on_saved=on_saved
+            )
+            if recommendation_id is None:
+                raise RuntimeError("The recommendation could not be saved")
+            return {"recommendation_id": recommendation_id, "recommendation": recommendation}
+        if job_type == JOB_RFX_ASSESSMENT:
+            return self.rfx_ingestor.ingest(document, payload["filename"], payload["title"], payload.get("company_name"), on_saved=on_saved)
+        if job_type == JOB_BATCH_INGESTION:
+            # Checked again here: the worker may have a different INGESTION_ROOT than the app that queued the job.
+            # A requeued batch resumes, so documents finished by an earlier run are not ingested twice.
+            pipeline = BatchIngestionPipeline(self.db, self.ingestor, concurrency=payload["concurrency"])
+            batch_id = pipeline.start_batch(resolve_source(payload["source"], os.getenv("INGESTION_ROOT")), payload["contract_type"])
+            return pipeline.run(batch_id)
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            job_id, job_type, payload, document = job
+            started = time.monotonic()
+            # Results are only saved, and the job only completed or failed, while this worker still owns the job;
+            # after a requeue the new owner's run is the one that counts.
+            try:
+                result = self.handle(job_type, payload, document, on_saved=self.queue.ownership_check(job_id, self.worker_id))
+                owned = self.queue.complete(job_id, self.worker_id, result)
+            except Exception as e:
+                traceback.print_exc()
+                owned = self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+            if not owned:
+                print(f"Job #{job_id} was handed to another worker; discarded this run's outcome")
+            with self._lock:
+                self.busy_seconds += time.monotonic() - started
+                self.jobs_processed += owned
+
+    def _heartbeat_loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                busy, processed = self.busy_seconds, self.jobs_processed
+            self.queue.heartbeat(self.worker_id, busy, processed, self.threads, socket.gethostname(), os.getpid())
+            requeued = self.queue.requeue_stale()
+            if requeued:
+                print(f"Requeued or failed {requeued} stale job(s)")
+                self._wakeup.set()
+            self._stop.wait(self.heartbeat_interval)
+
+    def _listen_loop(self, connect_kwargs):
+        """Wakes idle workers as soon as a page enqueues a job, instead of waiting for the next poll."""
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(**connect_kwargs)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL};")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval) != ([], [], []):
+                        conn.poll()
+                        if conn.notifies:
+                            conn.notifies.clear()
+                            self._wakeup.set()
+            except psycopg2.Error:
+                self._stop.wait(self.poll_interval)  # fall back to polling until the listener reconnects
+
+    def run(self, connect_kwargs):
+        threads = [threading.Thread(target=self._heartbeat_loop, daemon=True),
+                   threading.Thread(target=self._listen_loop, args=(connect_kwargs,), daemon=True)]
+        threads += [threading.Thread(target=self._work_loop, daemon=True, name=f"job-worker-{i}") for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        print(f"Worker {self.worker_id} started with {self.threads} thread(s)")
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(1.0)
+        except KeyboardInterrupt:
+            print("Stopping workers...")
+        self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+def main():
+    from dotenv import load_dotenv
+    import anthropic
+    from analysis_cache import create_analysis_cache_from_env
+    from contract_analysis import DEFAULT_MODEL
+    from database import DatabaseManager
+    from db_pool import get_db_settings
+    from ingestion import ContractIngestor
+    from metrics import configure_metrics_from_env
+    from pdf_extraction import create_extraction_engine_from_env
+    from rfx_assessment import RFxIngestor
+    from similarity import create_similarity_index_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WORKER_THREADS", "4")))
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure_metrics_from_env()
+    client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+    model = os.getenv('ANTHROPIC_MODEL', DEFAULT_MODEL)
+    db = DatabaseManager()
+    db.initialize_database()
+    engine = create_extraction_engine_from_env()
+    max_chars = os.getenv('PDF_MAX_CHARS')
+    extract_text = lambda file_bytes: engine.extract_text(file_bytes, max_chars=int(max_chars) if max_chars else None)
+    ingestor = ContractIngestor(
+        db, client, model,
+        analysis_cache=create_analysis_cache_from_env(db),
+        similarity_index=create_similarity_index_from_env(db),
+        extract_text=extract_text,
+    )
+    rfx_ingestor = RFxIngestor(db, client, model, extract_text=extract_text)
+    pool = WorkerPool(db, JobQueue(db), ingestor, client, model, threads=args.threads, poll_interval=args.poll_interval,
+                      rfx_ingestor=rfx_ingestor)
+    try:
+        pool.run(get_db_settings())
+    finally:
+        engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()